@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serial vs process-pool batch emission calculation on a synthetic portfolio.
+
+    cd backend
+    python benchmarks/bench_parallel_batch.py --rows 1000000
+
+Serial time is measured on --serial-sample rows and extrapolated, so the 1M-row run
+doesn't take minutes before the parallel runs start.
+
+"columns" mode ships only the summary columns back from the workers and should scale
+close to linearly with the worker count. "full results" mode ships every calculation
+step as a dict; the parent process has to unpickle those, which caps its speedup.
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_app.calculation_engine import CalculationEngine  # noqa: E402
+from fastapi_app.finance_models import FinanceEmissionBatchItem  # noqa: E402
+from fastapi_app.parallel_executor import ParallelBatchExecutor  # noqa: E402
+
+FORMULAS = [
+    ("1a-listed-equity", "listed", lambda r: {"outstanding_amount": r.uniform(1e5, 1e8), "evic": r.uniform(1e9, 1e11), "verified_emissions": r.uniform(1e3, 1e6)}),
+    ("1b-listed-equity", "listed", lambda r: {"outstanding_amount": r.uniform(1e5, 1e8), "total_assets": r.uniform(1e9, 1e11), "evic": r.uniform(1e9, 1e11), "unverified_emissions": r.uniform(1e3, 1e6)}),
+    ("2a-listed-equity", "listed", lambda r: {"outstanding_amount": r.uniform(1e5, 1e8), "total_assets": r.uniform(1e9, 1e11), "evic": r.uniform(1e9, 1e11), "energy_consumption": r.uniform(1e3, 1e6), "emission_factor": r.uniform(0.1, 1.0)}),
+]
+
+
+def synthetic_portfolio(rows: int, seed: int = 42):
+    rng = random.Random(seed)
+    items = []
+    for _ in range(rows):
+        formula_id, company_type, make_inputs = FORMULAS[rng.randrange(len(FORMULAS))]
+        items.append(FinanceEmissionBatchItem(formula_id=formula_id, company_type=company_type, inputs=make_inputs(rng)))
+    return items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--serial-sample", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="*", default=None,
+                        help="Worker counts to try (default: 1, 2, 4, ... up to CPU count)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("fastapi_app").setLevel(logging.WARNING)
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({2 ** i for i in range(cpu_count.bit_length()) if 2 ** i <= cpu_count} | {cpu_count})
+
+    print(f"Generating {args.rows:,} synthetic batch items...")
+    items = synthetic_portfolio(args.rows)
+
+    engine = CalculationEngine()
+    sample = items[:args.serial_sample]
+    started = time.perf_counter()
+    engine.calculate_batch(sample)
+    serial_per_item = (time.perf_counter() - started) / len(sample)
+    serial_estimate = serial_per_item * len(items)
+    print(f"serial          : {serial_per_item * 1e6:8.1f} µs/item -> {serial_estimate:8.2f} s for {len(items):,} rows (extrapolated)")
+
+    for workers in worker_counts:
+        executor = ParallelBatchExecutor(max_workers=workers, min_parallel_items=0)
+        try:
+            # Warm the pool (process start + registry build) outside the timed runs
+            executor.calculate_batch_columns(items[:workers * executor.initial_chunk_size])
+
+            started = time.perf_counter()
+            columns = executor.calculate_batch_columns(items)
+            columns_elapsed = time.perf_counter() - started
+            assert len(columns["financed_emissions"]) == len(items)
+
+            started = time.perf_counter()
+            results = executor.calculate_batch(items)
+            full_elapsed = time.perf_counter() - started
+            assert [r["index"] for r in results[:3]] == [0, 1, 2] and results[-1]["index"] == len(items) - 1
+        finally:
+            executor.shutdown()
+        print(f"{workers:3d} workers     : columns {columns_elapsed:8.2f} s  speedup {serial_estimate / columns_elapsed:5.2f}x | "
+              f"full results {full_elapsed:8.2f} s  speedup {serial_estimate / full_elapsed:5.2f}x  "
+              f"(final chunk size {executor.next_chunk_size()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /scenario/calculate response path, default FastAPI vs fast path.
+
+    cd backend
+    python benchmarks/bench_scenario_response.py --rows 100000
+
+default: ScenarioEngine.calculate_scenario builds ScenarioResult models, FastAPI
+         revalidates them against response_model and renders with stdlib json.
+fast:    ScenarioEngine.calculate_scenario_payload builds response-shaped dicts from the
+         result columns and FastJSONResponse renders them with orjson.
+arrow / parquet (needs pyarrow): the result columns encoded as an Arrow IPC stream or a
+         Parquet file, and the client-side load time compared to json.loads.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from fastapi_app.columnar import portfolio_entries_to_columns  # noqa: E402
+from fastapi_app import columnar_formats  # noqa: E402
+from fastapi_app.fast_json import FastJSONResponse, orjson  # noqa: E402
+from fastapi_app.models import PortfolioEntry, ScenarioResponse  # noqa: E402
+from fastapi_app.scenario_engine import ScenarioEngine  # noqa: E402
+
+
+def synthetic_entries(rows: int, sectors, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        PortfolioEntry(
+            id=f"exp-{i}",
+            company=f"Company {i}",
+            amount=rng.uniform(1e5, 1e8),
+            counterparty=f"CP-{rng.randrange(rows // 10 + 1)}",
+            sector=rng.choice(sectors),
+            geography=rng.choice(["Pakistan", "UAE", "Saudi Arabia", "Other"]),
+            probability_of_default=rng.uniform(0.1, 15.0),
+            loss_given_default=rng.uniform(10.0, 80.0),
+            tenor=rng.choice([12, 24, 36, 60, 120]),
+        )
+        for i in range(rows)
+    ]
+
+
+def timed(fn):
+    started = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--scenario", default="combined", choices=["transition", "physical", "combined"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("fastapi_app").setLevel(logging.WARNING)
+
+    engine = ScenarioEngine()
+    entries = synthetic_entries(args.rows, list(engine.sector_multipliers))
+    response_field = create_response_field(name="response", type_=ScenarioResponse)
+
+    # Default path
+    result, calc_default = timed(lambda: engine.calculate_scenario(entries, args.scenario))
+    content, validate_default = timed(
+        lambda: asyncio.run(serialize_response(field=response_field, response_content=result))
+    )
+    body_default, render_default = timed(lambda: JSONResponse(content).body)
+
+    # Fast path
+    payload, calc_fast = timed(
+        lambda: engine.calculate_scenario_payload(portfolio_entries_to_columns(entries), args.scenario)
+    )
+    body_fast, render_fast = timed(lambda: FastJSONResponse(payload).body)
+
+    assert json.loads(body_fast)["total_climate_adjusted_expected_loss"] == json.loads(body_default)["total_climate_adjusted_expected_loss"]
+
+    total_default = calc_default + validate_default + render_default
+    total_fast = calc_fast + render_fast
+    print(f"{args.rows:,} rows, {args.scenario} scenario (orjson {'available' if orjson else 'NOT installed'})")
+    print(f"default: calculate {calc_default:6.3f} s + validate/encode {validate_default:6.3f} s + json.dumps {render_default:6.3f} s = {total_default:6.3f} s ({len(body_default) / 1e6:.1f} MB)")
+    print(f"fast   : calculate {calc_fast:6.3f} s + orjson render {render_fast:6.3f} s = {total_fast:6.3f} s ({len(body_fast) / 1e6:.1f} MB)")
+    print(f"speedup: {total_default / total_fast:.1f}x end to end, "
+          f"{(validate_default + render_default) / render_fast:.1f}x on serialization alone")
+
+    if columnar_formats.pa is None:
+        print("pyarrow not installed: skipping Arrow/Parquet")
+        return
+
+    pa, pq = columnar_formats.pa, columnar_formats.pq
+    _, load_json = timed(lambda: json.loads(body_fast))
+    columns = portfolio_entries_to_columns(entries)
+    for output_format in (columnar_formats.FORMAT_ARROW, columnar_formats.FORMAT_PARQUET):
+        def encode():
+            result_columns = engine.calculate_columns(columns, args.scenario)
+            table = columnar_formats.scenario_result_table(result_columns, engine.summarize_columns(result_columns, args.scenario))
+            return columnar_formats.encode_table(table, output_format)
+
+        body, encode_elapsed = timed(encode)
+        if output_format == columnar_formats.FORMAT_ARROW:
+            table, load_elapsed = timed(lambda: pa.ipc.open_stream(body).read_all())
+        else:
+            table, load_elapsed = timed(lambda: pq.read_table(pa.BufferReader(body)))
+        assert table.num_rows == args.rows
+        print(f"{output_format:7s}: calculate + encode {encode_elapsed:6.3f} s ({len(body) / 1e6:.1f} MB, "
+              f"{len(body_fast) / len(body):.1f}x smaller than JSON); client load {load_elapsed:6.3f} s "
+              f"vs json.loads {load_json:6.3f} s ({load_json / load_elapsed:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Parity check: precompiled denominator plans vs the original per-call lookup.
+
+    cd backend
+    python benchmarks/check_denominator_parity.py --samples 200
+
+For every registered formula and company type, random inputs are drawn from the
+formula's declared inputs (each value positive, zero or missing). Formulas that declare
+any company-value key also get EVIC, total equity + debt and total assets. Asset-class
+values a formula does not declare are left out, since ignoring those is the one
+intended difference from the original lookup. The denominator of
+CalculationEngine.get_denominator_plan is compared with legacy_denominator, the
+candidate order get_denominator_for_company_type used before the plans existed, and
+get_denominator_for_company_type itself is compared on the same inputs. Exits with
+status 1 on any mismatch.
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_app.calculation_engine import CalculationEngine  # noqa: E402
+from fastapi_app.finance_models import CompanyType  # noqa: E402
+from fastapi_app.shared_formula_utils import get_denominator_for_company_type  # noqa: E402
+
+COMPANY_VALUE_KEYS = ['evic', 'total_equity_plus_debt', 'total_assets']
+LEGACY_FORMULA_SPECIFIC = [
+    'property_value_at_origination',
+    'total_value_at_origination',
+    'total_project_equity_plus_debt',
+    'ppp_adjusted_gdp',
+]
+
+
+def legacy_denominator(inputs, company_type):
+    """get_denominator_for_company_type before precompiled plans (None: no denominator)"""
+    if company_type == 'listed':
+        candidates = ['evic', 'total_equity_plus_debt', 'total_assets']
+    else:
+        candidates = ['total_equity_plus_debt', 'evic', 'total_assets']
+    for key in candidates + LEGACY_FORMULA_SPECIFIC:
+        if inputs.get(key, 0) > 0:
+            return inputs[key]
+    return None
+
+
+def resolve(resolver, inputs):
+    try:
+        return resolver(inputs)
+    except ValueError:
+        return None
+
+
+def random_inputs(rng, names):
+    inputs = {}
+    for name in names:
+        draw = rng.random()
+        if draw < 0.6:
+            inputs[name] = round(rng.uniform(1, 1e6), 2)
+        elif draw < 0.8:
+            inputs[name] = 0.0
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=200, help="random input sets per formula and company type")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    engine = CalculationEngine()
+    rng = random.Random(args.seed)
+    input_names = {}
+    for formula in engine.get_all_formulas():
+        input_names.setdefault(formula.id, []).extend(input_field.name for input_field in formula.inputs)
+
+    checked = 0
+    mismatches = []
+    for formula_id, names in sorted(input_names.items()):
+        if any(name in COMPANY_VALUE_KEYS for name in names):
+            names = names + COMPANY_VALUE_KEYS
+        names = list(dict.fromkeys(names))
+        for company_type in CompanyType:
+            plan = engine.get_denominator_plan(formula_id, company_type)
+            for _ in range(args.samples):
+                inputs = random_inputs(rng, names)
+                expected = legacy_denominator(inputs, company_type.value)
+                for label, actual in (
+                    ("plan", resolve(plan.resolve, inputs)),
+                    ("get_denominator_for_company_type",
+                     resolve(lambda values: get_denominator_for_company_type(values, company_type.value), inputs)),
+                ):
+                    checked += 1
+                    if actual != expected:
+                        mismatches.append((formula_id, company_type.value, label, inputs, expected, actual))
+
+    print(f"{len(input_names)} formulas x {len(CompanyType)} company types, {checked} comparisons")
+    for formula_id, company_type, label, inputs, expected, actual in mismatches[:20]:
+        print(f"MISMATCH {formula_id} ({company_type}, {label}): expected {expected}, got {actual} for {inputs}")
+    if mismatches:
+        print(f"{len(mismatches)} mismatches")
+        sys.exit(1)
+    print("all denominators match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+"""
+Per-organization admission control and load shedding for calculation routes.
+
+One tenant uploading a huge portfolio should not take every worker away from other
+tenants' interactive calculations. Before a request is routed (and before its body
+is parsed), AdmissionControlMiddleware:
+
+1. charges the tenant's token bucket with the request cost: about one unit per
+   portfolio row, estimated from Content-Length (ADMISSION_BYTES_PER_COST_UNIT bytes
+   per unit, at least 1). A request without Content-Length (chunked upload) is charged
+   the maximum, ADMISSION_ORG_BURST. Buckets refill at ADMISSION_ORG_RATE units/s up to
+   ADMISSION_ORG_BURST; a request that needs more waits for the refill.
+2. takes a slot of the route's concurrency limit (ADMISSION_INTERACTIVE_CONCURRENCY
+   for single calculations, ADMISSION_BULK_CONCURRENCY for portfolio-sized routes),
+   waiting in FIFO order.
+
+A request whose expected wait (token refill plus queue position times the route's
+average service time) exceeds ADMISSION_DEADLINE_SECONDS is rejected at once, with
+429 when the tenant's bucket is empty and 503 when the route is saturated, both
+with Retry-After. The tenant is the `org` claim of the bearer token, else its
+subject, else the client address. X-Forwarded-For is only used when the peer is one
+of ADMISSION_TRUSTED_PROXIES: the client is then its right-most hop that is not a
+trusted proxy, since hops to the left of that are set by the client itself. Limits
+are per process.
+
+Queue wait times per route (count, sum, max and a histogram) are exposed with
+the admitted / rejected counters by GET /admission/metrics, and each admitted
+response carries `Server-Timing: queue;dur=<ms>`.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from .auth_security import decode_access_token
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_ORG_RATE = float(os.getenv("ADMISSION_ORG_RATE", "50000"))
+ADMISSION_ORG_BURST = float(os.getenv("ADMISSION_ORG_BURST", "500000"))
+ADMISSION_DEADLINE_SECONDS = float(os.getenv("ADMISSION_DEADLINE_SECONDS", "15"))
+ADMISSION_BYTES_PER_COST_UNIT = int(os.getenv("ADMISSION_BYTES_PER_COST_UNIT", "200"))
+ADMISSION_INTERACTIVE_CONCURRENCY = int(os.getenv("ADMISSION_INTERACTIVE_CONCURRENCY", "32"))
+ADMISSION_BULK_CONCURRENCY = int(os.getenv("ADMISSION_BULK_CONCURRENCY", "2"))
+# Comma-separated addresses / CIDR ranges of reverse proxies whose X-Forwarded-For is trusted
+ADMISSION_TRUSTED_PROXIES = tuple(
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",")
+    if entry.strip()
+)
+ADMISSION_MAX_TENANTS = 10000
+SERVICE_TIME_SMOOTHING = 0.2  # weight of the latest request in the average service time
+
+# Upper bounds (seconds) of the queue wait histogram buckets; the last bucket is +Inf
+QUEUE_WAIT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+INTERACTIVE_ROUTES = ("/finance-emission", "/facilitated-emission")
+BULK_ROUTES = (
+    "/finance-emission/batch",
+    "/finance-emission/validate",
+    "/finance-emission/option3",
+    "/scenario/calculate",
+    "/scenario/calculate-file",
+    "/scenario/sensitivity",
+    "/scenario/reverse-stress",
+    "/scenario/sessions",
+    "/portfolio/ingest",
+)
+
+REJECT_TENANT_RATE = "tenant_rate"
+REJECT_OVERLOADED = "overloaded"
+REJECT_TIMEOUT = "queue_timeout"
+
+
+# ==============================
+# Token buckets
+# ==============================
+
+class TokenBucket:
+    """Cost units refilled at `rate` per second up to `burst`; may go negative for reservations"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float, max_wait: float) -> Optional[float]:
+        """
+        Take `cost` units and return how long to wait until they are covered, or None
+        (nothing taken) when that wait would exceed max_wait. Costs above the burst size
+        are capped at it, so one large request is slow rather than impossible.
+        """
+        self._refill(time.monotonic())
+        cost = min(cost, self.burst)
+        wait = max(cost - self.tokens, 0.0) / self.rate if self.rate > 0 else (0.0 if cost <= self.tokens else math.inf)
+        if wait > max_wait:
+            return None
+        self.tokens -= cost
+        return wait
+
+    def refund(self, cost: float) -> None:
+        self.tokens = min(self.burst, self.tokens + min(cost, self.burst))
+
+    def retry_after(self, cost: float) -> float:
+        """Seconds until `cost` units are available"""
+        self._refill(time.monotonic())
+        cost = min(cost, self.burst)
+        return max(cost - self.tokens, 0.0) / self.rate if self.rate > 0 else math.inf
+
+
+# ==============================
+# Route concurrency
+# ==============================
+
+class RouteLimiter:
+    """FIFO concurrency limit for one route, usable from any event loop"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.service_seconds = 0.0  # smoothed service time of admitted requests
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self) -> float:
+        """Expected queue wait of a request arriving now"""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                return 0.0
+            return (len(self._waiters) + 1) * self.service_seconds / self.limit
+
+    async def acquire(self, timeout: float) -> bool:
+        """Take a slot, waiting at most `timeout` seconds; False when it timed out"""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return True
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        try:
+            # On success release() has already counted the slot as ours
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            return False
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                # Already handed a slot; _grant passes it on since the waiter is done
+                pass
+
+    def release(self, service_seconds: Optional[float] = None) -> None:
+        with self._lock:
+            if service_seconds is not None:
+                self.service_seconds += SERVICE_TIME_SMOOTHING * (service_seconds - self.service_seconds)
+            if not self._waiters:
+                self.active -= 1
+                return
+            waiter = self._waiters.popleft()
+        try:
+            waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+        except RuntimeError:
+            # The waiter's event loop is closed
+            self.release()
+
+    def _grant(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            self.release()
+        else:
+            waiter.set_result(None)
+
+
+# ==============================
+# Metrics
+# ==============================
+
+class RouteMetrics:
+    """Admission counters and queue wait distribution of one route"""
+
+    def __init__(self):
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {REJECT_TENANT_RATE: 0, REJECT_OVERLOADED: 0, REJECT_TIMEOUT: 0}
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(QUEUE_WAIT_BUCKETS) + 1)
+
+    def observe_wait(self, seconds: float) -> None:
+        self.admitted += 1
+        self.wait_count += 1
+        self.wait_sum += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        for index, bound in enumerate(QUEUE_WAIT_BUCKETS):
+            if seconds <= bound:
+                self.wait_buckets[index] += 1
+                break
+        else:
+            self.wait_buckets[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip([str(bound) for bound in QUEUE_WAIT_BUCKETS] + ["+Inf"], self.wait_buckets):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "queue_wait_seconds": {
+                "count": self.wait_count,
+                "sum": self.wait_sum,
+                "max": self.wait_max,
+                "mean": self.wait_sum / self.wait_count if self.wait_count else 0.0,
+                "buckets": buckets,
+            },
+        }
+
+
+# ==============================
+# Controller
+# ==============================
+
+class AdmissionController:
+    """Tenant token buckets, route limiters and their metrics"""
+
+    def __init__(
+        self,
+        route_limits: Optional[Dict[str, int]] = None,
+        org_rate: float = ADMISSION_ORG_RATE,
+        org_burst: float = ADMISSION_ORG_BURST,
+        deadline_seconds: float = ADMISSION_DEADLINE_SECONDS
+    ):
+        if route_limits is None:
+            route_limits = {
+                **{path: ADMISSION_INTERACTIVE_CONCURRENCY for path in INTERACTIVE_ROUTES},
+                **{path: ADMISSION_BULK_CONCURRENCY for path in BULK_ROUTES},
+            }
+        self.org_rate = org_rate
+        self.org_burst = org_burst
+        self.deadline_seconds = deadline_seconds
+        self.limiters: Dict[str, RouteLimiter] = {path: RouteLimiter(limit) for path, limit in route_limits.items()}
+        self.metrics: Dict[str, RouteMetrics] = {path: RouteMetrics() for path in route_limits}
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, tenant: str) -> TokenBucket:
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = self._buckets[tenant] = TokenBucket(self.org_rate, self.org_burst)
+            while len(self._buckets) > ADMISSION_MAX_TENANTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(tenant)
+        return bucket
+
+    def reserve_tokens(self, tenant: str, cost: float, max_wait: float) -> Tuple[Optional[float], float]:
+        """(wait seconds or None when rejected, retry-after seconds when rejected)"""
+        with self._lock:
+            bucket = self._bucket(tenant)
+            wait = bucket.reserve(cost, max_wait)
+            return wait, (bucket.retry_after(cost) if wait is None else 0.0)
+
+    def refund_tokens(self, tenant: str, cost: float) -> None:
+        with self._lock:
+            self._bucket(tenant).refund(cost)
+
+    def reject(self, path: str, reason: str) -> None:
+        with self._lock:
+            self.metrics[path].rejected[reason] += 1
+
+    def observe_wait(self, path: str, seconds: float) -> None:
+        with self._lock:
+            self.metrics[path].observe_wait(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {}
+            for path, limiter in self.limiters.items():
+                routes[path] = {
+                    "limit": limiter.limit,
+                    "active": limiter.active,
+                    "queued": limiter.queued,
+                    "mean_service_seconds": limiter.service_seconds,
+                    **self.metrics[path].snapshot(),
+                }
+            return {
+                "enabled": ADMISSION_CONTROL_ENABLED,
+                "deadline_seconds": self.deadline_seconds,
+                "org_rate": self.org_rate,
+                "org_burst": self.org_burst,
+                "tenants": len(self._buckets),
+                "routes": routes,
+            }
+
+
+admission_controller = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Lazy initialization of the process-wide admission controller"""
+    global admission_controller
+    if admission_controller is None:
+        admission_controller = AdmissionController()
+    return admission_controller
+
+
+# ==============================
+# Middleware
+# ==============================
+
+def _header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def tenant_key(scope: Dict[str, Any]) -> str:
+    """The bearer token's organization (or user), else the client address"""
+    authorization = _header(scope, b"authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        try:
+            claims = decode_access_token(authorization[7:].strip())
+        except (ValueError, RuntimeError):
+            claims = {}
+        if claims.get("org"):
+            return f"org:{claims['org']}"
+        if claims.get("sub"):
+            return f"user:{claims['sub']}"
+    client = scope.get("client")
+    return f"ip:{client_address(client[0] if client else None, _header(scope, b'x-forwarded-for'))}"
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in ADMISSION_TRUSTED_PROXIES)
+
+
+def client_address(peer: Optional[str], forwarded: Optional[str]) -> str:
+    """
+    The peer address, or behind trusted proxies the right-most X-Forwarded-For hop that
+    is not a trusted proxy (entries further left are whatever the client sent)
+    """
+    if peer is None:
+        return "unknown"
+    if not forwarded or not _is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+def request_cost(scope: Dict[str, Any], max_cost: float) -> float:
+    """
+    Cost units of a request, about one per portfolio row (from Content-Length). Without
+    a valid Content-Length the size is unknown until the body is read, so max_cost.
+    """
+    try:
+        content_length = int(_header(scope, b"content-length"))
+    except (TypeError, ValueError):
+        return max_cost
+    return max(1.0, content_length / ADMISSION_BYTES_PER_COST_UNIT)
+
+
+async def _reject(send: Callable, status_code: int, detail: str, retry_after: float) -> None:
+    body = ('{"detail":"%s"}' % detail).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(max(1, math.ceil(min(retry_after, 3600)))).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying AdmissionController to the configured POST routes"""
+
+    def __init__(self, app: Any, controller_factory: Callable[[], AdmissionController] = get_admission_controller):
+        self.app = app
+        self.controller_factory = controller_factory
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if not ADMISSION_CONTROL_ENABLED or scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        controller = self.controller_factory()
+        path = scope["path"]
+        limiter = controller.limiters.get(path)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.monotonic()
+        deadline = controller.deadline_seconds
+        tenant = tenant_key(scope)
+        cost = request_cost(scope, controller.org_burst)
+        token_wait, retry_after = controller.reserve_tokens(tenant, cost, deadline)
+        if token_wait is None:
+            controller.reject(path, REJECT_TENANT_RATE)
+            logger.warning(f"Admission: {tenant} over its rate on {path} (cost {cost:.0f})")
+            await _reject(send, 429, "Too many requests for this organization; retry later", retry_after)
+            return
+        queue_wait = limiter.estimated_wait()
+        if token_wait + queue_wait > deadline:
+            controller.refund_tokens(tenant, cost)
+            controller.reject(path, REJECT_OVERLOADED)
+            logger.warning(f"Admission: {path} saturated, expected wait {queue_wait:.1f}s")
+            await _reject(send, 503, "Service is busy; retry later", queue_wait)
+            return
+
+        if token_wait > 0:
+            await asyncio.sleep(token_wait)
+        if not await limiter.acquire(deadline - (time.monotonic() - arrived)):
+            controller.refund_tokens(tenant, cost)
+            controller.reject(path, REJECT_TIMEOUT)
+            await _reject(send, 503, "Service is busy; retry later", limiter.service_seconds or 1.0)
+            return
+
+        started = time.monotonic()
+        waited = started - arrived
+        controller.observe_wait(path, waited)
+        server_timing = f"queue;dur={waited * 1000:.1f}".encode("latin-1")
+
+        async def timed_send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", server_timing)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            limiter.release(time.monotonic() - started)
@@ -3,6 +3,7 @@ FastAPI dependencies for authenticated routes.
 """
 
 import uuid
+from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
@@ -10,16 +11,46 @@ from sqlalchemy.orm import Session
 
 from .auth_models import User
 from .auth_security import decode_access_token
+from . import db as database
 from .db import get_db
 
 bearer_scheme = HTTPBearer(auto_error=True)
+optional_bearer_scheme = HTTPBearer(auto_error=False)
 
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     db: Session = Depends(get_db),
 ) -> User:
-    token = credentials.credentials
+    return _user_for_token(credentials.credentials, db)
+
+
+def get_current_organization_id(current_user: User = Depends(get_current_user)) -> uuid.UUID:
+    """The caller's current organization; 403 when the profile has none"""
+    organization_id = current_user.profile.current_organization_id if current_user.profile else None
+    if organization_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Select a current organization first",
+        )
+    return organization_id
+
+
+def get_optional_organization_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer_scheme),
+) -> Optional[uuid.UUID]:
+    """
+    The current organization of an authenticated caller, or None for anonymous requests
+    (and without DATABASE_URL). Invalid credentials still get 401.
+    """
+    if credentials is None or database.SessionLocal is None:
+        return None
+    with database.SessionLocal() as db:
+        user = _user_for_token(credentials.credentials, db)
+        return user.profile.current_organization_id if user.profile else None
+
+
+def _user_for_token(token: str, db: Session) -> User:
     try:
         payload = decode_access_token(token)
     except ValueError:
@@ -61,7 +61,11 @@ def login(body: LoginRequest, db: Session = Depends(get_db)) -> TokenResponse:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    token = create_access_token(user.id, extra_claims={"email": user.email})
+    claims = {"email": user.email}
+    if user.profile and user.profile.current_organization_id:
+        # Used by admission control to share rate limits across an organization's users
+        claims["org"] = str(user.profile.current_organization_id)
+    token = create_access_token(user.id, extra_claims=claims)
     return TokenResponse(access_token=token)
 
 
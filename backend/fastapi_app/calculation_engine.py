@@ -11,13 +11,15 @@ from typing import List, Dict, Any, Optional, Tuple
 import logging
 from .finance_models import (
     FormulaConfig, CalculationResult, FormulaValidationResult, 
-    CompanyType, FormulaCategory, CalculationStep
+    CompanyType, FormulaCategory, CalculationStep,
+    FinanceEmissionBatchItem, FinanceEmissionBatchResult
 )
 from .shared_formula_utils import (
     calculate_attribution_factor_listed, calculate_attribution_factor_unlisted,
-    validate_financial_inputs, get_denominator_for_company_type,
+    validate_financial_inputs, DenominatorPlan, build_denominator_plan,
     create_emission_calculation_steps, create_activity_calculation_steps
 )
+from .batch_validation import BatchValidator
 from .unit_conversions import smart_convert_unit
 from .formula_configs import BASIC_FORMULAS
 from .corporate_bond_business_loan_configs import CORPORATE_BOND_BUSINESS_LOAN_FORMULAS
@@ -53,7 +55,53 @@ class CalculationEngine:
             FACILITATED_EMISSION_FORMULAS
         )
         logger.info(f"Loaded {len(self.formulas)} formula configurations")
+        self._build_waterfall_index()
+        self._build_denominator_plans()
+        # First registration wins for repeated ids, as in get_formula_by_id
+        self._formulas_by_id: Dict[str, FormulaConfig] = {}
+        for formula in self.formulas:
+            self._formulas_by_id.setdefault(formula.id, formula)
+        self.batch_validator = BatchValidator(self.formulas)
+
+    def _build_waterfall_index(self) -> None:
+        """
+        Precompute the PCAF waterfall: every required input name gets a bit, every
+        formula the bitmask of its required inputs, and each category an ordered list
+        of (mask, formula), best data quality first (ties keep registry order).
+        """
+        self._input_bits: Dict[str, int] = {}
+        self._waterfall_index: Dict[FormulaCategory, List[Tuple[int, FormulaConfig]]] = {}
+        for formula in self.formulas:
+            mask = 0
+            for input_field in formula.inputs:
+                if input_field.required:
+                    if input_field.name not in self._input_bits:
+                        self._input_bits[input_field.name] = 1 << len(self._input_bits)
+                    mask |= self._input_bits[input_field.name]
+            self._waterfall_index.setdefault(formula.category, []).append((mask, formula))
+        for entries in self._waterfall_index.values():
+            entries.sort(key=lambda entry: entry[1].data_quality_score)
     
+    def _build_denominator_plans(self) -> None:
+        """
+        Resolve each (formula, company type) denominator strategy once: the company-type
+        preference order, without asset-class keys the formula does not declare (see
+        build_denominator_plan). Some ids are registered more than once with different
+        inputs, so a plan covers the inputs of every formula sharing its id.
+        """
+        input_names: Dict[str, List[str]] = {}
+        for formula in self.formulas:
+            input_names.setdefault(formula.id, []).extend(input_field.name for input_field in formula.inputs)
+        self._denominator_plans: Dict[Tuple[str, CompanyType], DenominatorPlan] = {
+            (formula_id, company_type): build_denominator_plan(company_type.value, names)
+            for formula_id, names in input_names.items()
+            for company_type in CompanyType
+        }
+
+    def get_denominator_plan(self, formula_id: str, company_type: CompanyType) -> Optional[DenominatorPlan]:
+        """Precompiled denominator plan for a formula and company type"""
+        return self._denominator_plans.get((formula_id, company_type))
+
     def get_all_formulas(self) -> List[FormulaConfig]:
         """Get all available formulas"""
         return self.formulas
@@ -201,7 +249,55 @@ class CalculationEngine:
                 # Continue with other calculations
         
         return results
-    
+
+    def calculate_batch(
+        self,
+        items: List[FinanceEmissionBatchItem],
+        start_index: int = 0,
+        waterfall: bool = False
+    ) -> List[FinanceEmissionBatchResult]:
+        """
+        Calculate a batch of independent (formula, inputs, company type) items.
+        A failing item is reported in its result instead of aborting the batch.
+        start_index offsets the reported indices when items is a slice of a larger batch.
+        waterfall=True picks each item's formula from its inputs (select_waterfall_formulas).
+        Inputs are validated column-wise for the whole batch (BatchValidator) with the
+        same messages as calculate().
+        """
+        results: List[FinanceEmissionBatchResult] = []
+        selections = (
+            self.select_waterfall_formulas(items) if waterfall
+            else [
+                (item.formula_id, None if item.formula_id else "formula_id is required unless the batch runs in waterfall mode")
+                for item in items
+            ]
+        )
+        validation_errors, validation_warnings = self.batch_validator.validate_items(
+            items, [None if selection_error else formula_id for formula_id, selection_error in selections]
+        )
+
+        for offset, (item, (formula_id, selection_error)) in enumerate(zip(items, selections)):
+            index = start_index + offset
+            try:
+                if selection_error:
+                    raise ValueError(selection_error)
+                formula = self._formulas_by_id.get(formula_id)
+                if not formula:
+                    raise ValueError(f"Formula '{formula_id}' not found")
+                if offset in validation_errors:
+                    raise ValueError(f"Validation failed: {', '.join(validation_errors[offset])}")
+                result = self._execute_calculation(formula, item.inputs, item.company_type)
+                if offset in validation_warnings:
+                    if result.metadata is None:
+                        result.metadata = {}
+                    result.metadata['validationWarnings'] = validation_warnings[offset]
+                results.append(FinanceEmissionBatchResult(index=index, success=True, result=result))
+            except Exception as error:
+                logger.error(f"Failed to calculate batch item {index} ({formula_id}): {error}")
+                results.append(FinanceEmissionBatchResult(index=index, success=False, error=str(error)))
+
+        return results
+
     def get_best_formula(
         self,
         available_inputs: List[str],
@@ -212,15 +308,57 @@ class CalculationEngine:
         Get the best available formula based on data quality and available inputs
         Migrated from: getBestFormula
         """
-        applicable_formulas = [
-            formula for formula in self.get_formulas_by_category(category)
-            if self._has_required_inputs(formula, available_inputs)
-        ]
-        
-        # Sort by data quality score (lower is better)
-        applicable_formulas.sort(key=lambda f: f.data_quality_score)
-        
-        return applicable_formulas[0] if applicable_formulas else None
+        return self.select_formula(self.input_signature({name: True for name in available_inputs}), category)
+
+    def input_signature(self, inputs: Dict[str, Any]) -> int:
+        """Bitmask of the waterfall inputs present (not None) in inputs"""
+        signature = 0
+        for name, value in inputs.items():
+            if value is not None:
+                signature |= self._input_bits.get(name, 0)
+        return signature
+
+    def select_formula(self, signature: int, category: FormulaCategory) -> Optional[FormulaConfig]:
+        """Best-scoring formula of the category whose required inputs are all in signature"""
+        for mask, formula in self._waterfall_index.get(category, []):
+            if signature & mask == mask:
+                return formula
+        return None
+
+    def select_waterfall_formulas(
+        self,
+        items: List[FinanceEmissionBatchItem]
+    ) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        (formula_id, error) per item for waterfall batches. The category comes from the
+        item or its formula_id; items sharing (category, input signature) are grouped so
+        the selection runs once per group.
+        """
+        groups: Dict[Tuple[FormulaCategory, int], List[int]] = {}
+        selections: List[Tuple[Optional[str], Optional[str]]] = [(None, None)] * len(items)
+        for position, item in enumerate(items):
+            category = item.category
+            if category is None and item.formula_id is not None:
+                formula = self._formulas_by_id.get(item.formula_id)
+                if formula is None:
+                    selections[position] = (None, f"Formula '{item.formula_id}' not found")
+                    continue
+                category = formula.category
+            if category is None:
+                selections[position] = (None, "Waterfall items need a category or formula_id")
+                continue
+            groups.setdefault((category, self.input_signature(item.inputs)), []).append(position)
+
+        for (category, signature), positions in groups.items():
+            formula = self.select_formula(signature, category)
+            selection = (
+                (formula.id, None) if formula is not None
+                else (None, f"No applicable {category.value} formula for the available inputs")
+            )
+            for position in positions:
+                selections[position] = selection
+        logger.info(f"Waterfall selection for {len(items)} items over {len(groups)} input signatures")
+        return selections
     
     def get_calculation_summary(self, result: CalculationResult) -> Dict[str, Any]:
         """
@@ -336,8 +474,8 @@ class CalculationEngine:
         # This is where the specific formula calculations would be implemented
         # For now, we'll implement a basic structure that can be extended
         
-        # Get the denominator based on company type
-        denominator = get_denominator_for_company_type(inputs, company_type.value)
+        # Get the denominator based on company type (plan precompiled per formula)
+        denominator = self._denominator_plans[(formula.id, company_type)].resolve(inputs)
         outstanding_amount = inputs.get('outstanding_amount', 0)
         
         # Calculate attribution factor based on formula type
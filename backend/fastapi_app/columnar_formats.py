@@ -0,0 +1,169 @@
+"""
+Columnar (Apache Arrow IPC stream / Parquet) encodings for engine results.
+
+Endpoints that return large row sets negotiate the format from the Accept header:
+JSON stays the default, `application/vnd.apache.arrow.stream` returns an Arrow IPC
+stream and `application/vnd.apache.parquet` returns a Parquet file. Numeric result
+columns are handed to Arrow straight from the engine's float64 arrays (zero-copy),
+sectors are dictionary-encoded from the engine's factorized codes, and portfolio
+totals travel in the schema metadata under the `summary` key (JSON).
+
+pyarrow is optional: when it is not installed, requests for a columnar format get
+406 and JSON keeps working.
+"""
+
+import io
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from .scenario_engine import SCENARIO_RESULT_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional (too large for the serverless bundle)
+    pa = None
+    pq = None
+
+FORMAT_JSON = "json"
+FORMAT_ARROW = "arrow"
+FORMAT_PARQUET = "parquet"
+
+MEDIA_TYPE_ARROW_STREAM = "application/vnd.apache.arrow.stream"
+MEDIA_TYPE_PARQUET = "application/vnd.apache.parquet"
+
+MEDIA_TYPE_FORMATS = {
+    "application/json": FORMAT_JSON,
+    MEDIA_TYPE_ARROW_STREAM: FORMAT_ARROW,
+    MEDIA_TYPE_PARQUET: FORMAT_PARQUET,
+    "application/x-parquet": FORMAT_PARQUET,
+}
+
+FORMAT_MEDIA_TYPES = {
+    FORMAT_ARROW: MEDIA_TYPE_ARROW_STREAM,
+    FORMAT_PARQUET: MEDIA_TYPE_PARQUET,
+}
+
+FORMAT_FILE_EXTENSIONS = {
+    FORMAT_ARROW: "arrows",
+    FORMAT_PARQUET: "parquet",
+}
+
+SUMMARY_METADATA_KEY = b"summary"
+
+# OpenAPI `responses` entry for routes that negotiate a columnar format
+COLUMNAR_OPENAPI_RESPONSES: Dict[Any, Dict[str, Any]] = {
+    200: {
+        "content": {
+            MEDIA_TYPE_ARROW_STREAM: {"schema": {"type": "string", "format": "binary"}},
+            MEDIA_TYPE_PARQUET: {"schema": {"type": "string", "format": "binary"}},
+        },
+    },
+    406: {"description": "Columnar format requested but pyarrow is not installed"},
+}
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Pick the response format from an Accept header.
+    Highest q-value wins, ties go to the earlier entry; anything unrecognised
+    (including */* and a missing header) means JSON.
+    """
+    if not accept:
+        return FORMAT_JSON
+
+    best_format = FORMAT_JSON
+    best_quality = 0.0
+    for entry in accept.split(","):
+        media_type, _, params = entry.partition(";")
+        media_type = media_type.strip().lower()
+        if media_type not in MEDIA_TYPE_FORMATS:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best_format, best_quality = MEDIA_TYPE_FORMATS[media_type], quality
+    return best_format
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise HTTPException(
+            status_code=406,
+            detail="Arrow/Parquet output requires pyarrow on the server; request application/json instead",
+        )
+
+
+def _string_array(values: Any) -> "pa.Array":
+    return pa.array(values, type=pa.string(), from_pandas=True)
+
+
+def scenario_result_table(result_columns: Dict[str, np.ndarray], summary: Dict[str, Any]) -> "pa.Table":
+    """Arrow table of ScenarioResult rows from ScenarioEngine.calculate_columns output"""
+    require_pyarrow()
+    arrays: List["pa.Array"] = []
+    for name in SCENARIO_RESULT_FIELDS:
+        if name == "sector":
+            # Codes are already computed by the engine; Arrow keeps each sector name once
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(result_columns["sector_code"].astype(np.int32, copy=False)),
+                _string_array(result_columns["sector_names"]),
+            ))
+        elif result_columns[name].dtype == object:
+            arrays.append(_string_array(result_columns[name]))
+        else:
+            arrays.append(pa.array(result_columns[name]))
+    table = pa.Table.from_arrays(arrays, names=list(SCENARIO_RESULT_FIELDS))
+    return table.replace_schema_metadata({SUMMARY_METADATA_KEY: json.dumps(summary).encode("utf-8")})
+
+
+def batch_result_table(result_columns: Dict[str, List[Any]], summary: Dict[str, Any]) -> "pa.Table":
+    """Arrow table of batch emission results from ParallelBatchExecutor.calculate_batch_columns output"""
+    require_pyarrow()
+    row_count = len(result_columns["success"])
+    table = pa.table({
+        "index": pa.array(np.arange(row_count, dtype=np.int64)),
+        "success": pa.array(result_columns["success"], type=pa.bool_()),
+        "attribution_factor": pa.array(np.asarray(result_columns["attribution_factor"], dtype=np.float64)),
+        "emission_factor": pa.array(np.asarray(result_columns["emission_factor"], dtype=np.float64)),
+        "financed_emissions": pa.array(np.asarray(result_columns["financed_emissions"], dtype=np.float64)),
+        "data_quality_score": pa.array(np.asarray(result_columns["data_quality_score"], dtype=np.int32)),
+        "error": pa.array(result_columns["error"], type=pa.string()),
+    })
+    return table.replace_schema_metadata({SUMMARY_METADATA_KEY: json.dumps(summary).encode("utf-8")})
+
+
+def encode_table(table: "pa.Table", output_format: str) -> bytes:
+    """Serialize a table as an Arrow IPC stream or a Parquet file"""
+    require_pyarrow()
+    if output_format == FORMAT_ARROW:
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if output_format == FORMAT_PARQUET:
+        sink = io.BytesIO()
+        pq.write_table(table, sink, compression="zstd")
+        return sink.getvalue()
+    raise ValueError(f"Unsupported columnar format: {output_format}")
+
+
+def columnar_response(table: "pa.Table", output_format: str, filename: str) -> Response:
+    return Response(
+        content=encode_table(table, output_format),
+        media_type=FORMAT_MEDIA_TYPES[output_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{FORMAT_FILE_EXTENSIONS[output_format]}"',
+            "Vary": "Accept",
+        },
+    )
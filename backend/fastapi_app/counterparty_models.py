@@ -0,0 +1,41 @@
+"""
+SQLAlchemy model for counterparty financial profiles (public.counterparty_financial_profiles).
+"""
+
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Float, Integer, String, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .db import Base
+
+
+class CounterpartyFinancialProfile(Base):
+    __tablename__ = "counterparty_financial_profiles"
+
+    # Owning organization: counterparty ids are chosen by each organization's users
+    organization_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    counterparty_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    reporting_year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    share_price: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    outstanding_shares: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    total_debt: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    minority_interest: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    preferred_stock: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    total_equity: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    total_assets: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # Denominators, computed once when the profile is written
+    evic: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    total_equity_plus_debt: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
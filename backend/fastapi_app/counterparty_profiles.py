@@ -0,0 +1,271 @@
+"""
+Counterparty financial profiles: balance-sheet data per (counterparty, reporting year).
+
+Counterparty ids are chosen by clients, so profiles are owned by an organization (the
+caller's current organization) and every read and write is scoped to it: one
+organization can neither overwrite nor use another's "C001"/2024.
+
+Profiles live in public.counterparty_financial_profiles (see
+sql/003_counterparty_financial_profiles.sql). EVIC and total equity + debt are computed
+once when a profile is written (calculate_evic / calculate_total_equity_plus_debt, unless
+given explicitly), so every exposure of a counterparty shares the same denominators.
+
+Batch items can reference a profile with counterparty_id + reporting_year instead of
+repeating the financials. resolve_counterparty_items looks up each distinct
+(counterparty_id, year) of the caller's organization once: first in a process-local LRU cache, then with a single
+query for all misses. The profile's values are merged under the item's inputs (inputs
+sent with the item win). Cached profiles expire after COUNTERPARTY_PROFILE_CACHE_TTL_SECONDS,
+so with several API processes an update made through another process is visible
+within that time; writes through this process invalidate its cache immediately.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import db as database
+from .counterparty_models import CounterpartyFinancialProfile
+from .finance_models import CompanyType, FinanceEmissionBatchItem
+from .shared_formula_utils import (
+    calculate_evic,
+    calculate_total_equity_plus_debt,
+    get_denominator_for_company_type,
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_SIZE = int(os.getenv("COUNTERPARTY_PROFILE_CACHE_SIZE", "100000"))
+PROFILE_CACHE_TTL_SECONDS = int(os.getenv("COUNTERPARTY_PROFILE_CACHE_TTL_SECONDS", "300"))
+QUERY_BATCH_SIZE = 1000  # keys / rows per statement
+
+FINANCIAL_FIELDS: Tuple[str, ...] = (
+    "share_price", "outstanding_shares", "total_debt", "minority_interest",
+    "preferred_stock", "total_equity", "total_assets",
+)
+DENOMINATOR_FIELDS: Tuple[str, ...] = ("evic", "total_equity_plus_debt")
+PROFILE_FIELDS: Tuple[str, ...] = FINANCIAL_FIELDS + DENOMINATOR_FIELDS
+
+ProfileKey = Tuple[uuid.UUID, str, int]  # (organization_id, counterparty_id, reporting_year)
+
+
+# ==============================
+# Denominators
+# ==============================
+
+def compute_denominators(financials: Dict[str, Optional[float]]) -> Dict[str, Optional[float]]:
+    """EVIC and total equity + debt: the given values, else computed from their components"""
+    known = {name: value for name, value in financials.items() if value is not None}
+    evic = financials.get("evic")
+    if evic is None and "share_price" in known and "outstanding_shares" in known:
+        evic = calculate_evic(known)
+    total_equity_plus_debt = financials.get("total_equity_plus_debt")
+    if total_equity_plus_debt is None and "total_equity" in known:
+        total_equity_plus_debt = calculate_total_equity_plus_debt(known)
+    return {"evic": evic, "total_equity_plus_debt": total_equity_plus_debt}
+
+
+def profile_inputs(profile: CounterpartyFinancialProfile) -> Dict[str, float]:
+    """The profile as calculation inputs (fields without a value are left out)"""
+    inputs = {}
+    for name in PROFILE_FIELDS:
+        value = getattr(profile, name)
+        if value is not None:
+            inputs[name] = value
+    return inputs
+
+
+def company_type_denominators(inputs: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """Attribution denominator per company type, as the calculation engine picks it"""
+    denominators: Dict[str, Optional[float]] = {}
+    for company_type in CompanyType:
+        try:
+            denominators[company_type.value] = get_denominator_for_company_type(inputs, company_type.value)
+        except ValueError:
+            denominators[company_type.value] = None
+    return denominators
+
+
+# ==============================
+# Process-local cache
+# ==============================
+
+class CounterpartyProfileCache:
+    """LRU of resolved profile inputs by (organization, counterparty_id, year) with a time to live"""
+
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl_seconds: int = PROFILE_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[ProfileKey, Tuple[float, Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[ProfileKey]) -> Dict[ProfileKey, Dict[str, float]]:
+        now = time.monotonic()
+        found: Dict[ProfileKey, Dict[str, float]] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+        return found
+
+    def put_many(self, profiles: Dict[ProfileKey, Dict[str, float]]) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, inputs in profiles.items():
+                self._entries[key] = (expires_at, inputs)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[ProfileKey]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+profile_cache = CounterpartyProfileCache()
+
+
+# ==============================
+# Store
+# ==============================
+
+def get_profile(
+    db: Session,
+    organization_id: uuid.UUID,
+    counterparty_id: str,
+    reporting_year: int
+) -> Optional[CounterpartyFinancialProfile]:
+    return db.get(CounterpartyFinancialProfile, (organization_id, counterparty_id, reporting_year))
+
+
+def upsert_profiles(db: Session, organization_id: uuid.UUID, profiles: Sequence) -> int:
+    """
+    Insert or replace CounterpartyProfileUpsert rows of an organization (the last one
+    wins for repeated keys)
+    """
+    rows: Dict[ProfileKey, Dict[str, Optional[float]]] = {}
+    for profile in profiles:
+        row = {name: getattr(profile, name) for name in FINANCIAL_FIELDS}
+        row.update(compute_denominators({name: getattr(profile, name) for name in PROFILE_FIELDS}))
+        row["organization_id"] = organization_id
+        row["counterparty_id"] = profile.counterparty_id
+        row["reporting_year"] = profile.reporting_year
+        rows[(organization_id, profile.counterparty_id, profile.reporting_year)] = row
+
+    values = list(rows.values())
+    for start in range(0, len(values), QUERY_BATCH_SIZE):
+        statement = insert(CounterpartyFinancialProfile).values(values[start:start + QUERY_BATCH_SIZE])
+        statement = statement.on_conflict_do_update(
+            index_elements=["organization_id", "counterparty_id", "reporting_year"],
+            set_={**{name: statement.excluded[name] for name in PROFILE_FIELDS}, "updated_at": func.now()},
+        )
+        db.execute(statement)
+    db.commit()
+    profile_cache.invalidate(rows)
+    return len(rows)
+
+
+def delete_profile(db: Session, organization_id: uuid.UUID, counterparty_id: str, reporting_year: int) -> bool:
+    profile = get_profile(db, organization_id, counterparty_id, reporting_year)
+    if profile is None:
+        return False
+    db.delete(profile)
+    db.commit()
+    profile_cache.invalidate([(organization_id, counterparty_id, reporting_year)])
+    return True
+
+
+def load_profile_inputs(db: Session, keys: Sequence[ProfileKey]) -> Dict[ProfileKey, Dict[str, float]]:
+    """Profile inputs for the keys that have a profile, one query per QUERY_BATCH_SIZE keys"""
+    key_columns = tuple_(
+        CounterpartyFinancialProfile.organization_id,
+        CounterpartyFinancialProfile.counterparty_id,
+        CounterpartyFinancialProfile.reporting_year,
+    )
+    loaded: Dict[ProfileKey, Dict[str, float]] = {}
+    for start in range(0, len(keys), QUERY_BATCH_SIZE):
+        profiles = db.query(CounterpartyFinancialProfile).filter(
+            key_columns.in_(keys[start:start + QUERY_BATCH_SIZE])
+        ).all()
+        for profile in profiles:
+            loaded[(profile.organization_id, profile.counterparty_id, profile.reporting_year)] = profile_inputs(profile)
+    return loaded
+
+
+# ==============================
+# Batch resolution
+# ==============================
+
+def resolve_counterparty_items(
+    items: List[FinanceEmissionBatchItem],
+    organization_id: Optional[uuid.UUID],
+    db: Optional[Session] = None,
+    item_errors: Optional[Dict[int, str]] = None
+) -> int:
+    """
+    Fill the inputs of items that reference a counterparty profile of organization_id
+    (the caller's current organization), in place. Returns the number of distinct
+    profiles used. Items without a reporting_year or profile, or any reference when
+    organization_id is None, raise ValueError, or are recorded in item_errors
+    (position -> message) and left unchanged when that dict is given.
+    """
+    keys: Dict[ProfileKey, None] = {}
+    for index, item in enumerate(items):
+        if item.counterparty_id is None:
+            continue
+        if organization_id is None:
+            message = "counterparty_id needs an authenticated user with a current organization"
+        elif item.reporting_year is None:
+            message = "reporting_year is required with counterparty_id"
+        else:
+            keys[(organization_id, item.counterparty_id, item.reporting_year)] = None
+            continue
+        if item_errors is None:
+            raise ValueError(f"Item {index}: {message}")
+        item_errors[index] = message
+    if not keys:
+        return 0
+
+    profiles = profile_cache.get_many(keys)
+    cached = len(profiles)
+    missing = [key for key in keys if key not in profiles]
+    if missing:
+        if db is None and database.SessionLocal is None:
+            raise ValueError("Counterparty profiles need DATABASE_URL to be set")
+        if db is None:
+            with database.SessionLocal() as session:
+                loaded = load_profile_inputs(session, missing)
+        else:
+            loaded = load_profile_inputs(db, missing)
+        profile_cache.put_many(loaded)
+        profiles.update(loaded)
+        missing = [key for key in missing if key not in loaded]
+        if missing and item_errors is None:
+            listed = ", ".join(f"{counterparty_id}/{year}" for _, counterparty_id, year in missing[:5])
+            more = f" and {len(missing) - 5} more" if len(missing) > 5 else ""
+            raise ValueError(f"No financial profile for counterparty/year {listed}{more}")
+
+    for index, item in enumerate(items):
+        if item.counterparty_id is None or item.reporting_year is None or organization_id is None:
+            continue
+        profile = profiles.get((organization_id, item.counterparty_id, item.reporting_year))
+        if profile is None:
+            item_errors[index] = f"No financial profile for counterparty {item.counterparty_id} in {item.reporting_year}"
+            continue
+        item.inputs = {**profile, **item.inputs}
+    logger.info(f"Resolved {len(keys) - len(missing)} counterparty profiles ({cached} cached) for {len(items)} items")
+    return len(keys) - len(missing)
@@ -0,0 +1,101 @@
+"""
+Counterparty routes: store financial profiles per counterparty and reporting year,
+scoped to the authenticated user's current organization.
+"""
+
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from .auth_deps import get_current_organization_id
+from .counterparty_models import CounterpartyFinancialProfile
+from .counterparty_profiles import (
+    PROFILE_FIELDS,
+    company_type_denominators,
+    delete_profile,
+    get_profile,
+    profile_inputs,
+    upsert_profiles,
+)
+from .counterparty_schemas import (
+    CounterpartyFinancials,
+    CounterpartyProfileBulkRequest,
+    CounterpartyProfileBulkResponse,
+    CounterpartyProfileOut,
+    CounterpartyProfileUpsert,
+)
+from .db import get_db
+
+router = APIRouter()
+
+
+def _profile_out(profile: CounterpartyFinancialProfile) -> CounterpartyProfileOut:
+    return CounterpartyProfileOut(
+        counterparty_id=profile.counterparty_id,
+        reporting_year=profile.reporting_year,
+        **{name: getattr(profile, name) for name in PROFILE_FIELDS},
+        denominators=company_type_denominators(profile_inputs(profile)),
+        created_at=profile.created_at,
+        updated_at=profile.updated_at,
+    )
+
+
+def _get_profile_or_404(
+    db: Session,
+    organization_id: uuid.UUID,
+    counterparty_id: str,
+    reporting_year: int,
+) -> CounterpartyFinancialProfile:
+    profile = get_profile(db, organization_id, counterparty_id, reporting_year)
+    if not profile:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Counterparty profile not found")
+    return profile
+
+
+@router.post("/profiles", response_model=CounterpartyProfileBulkResponse)
+def upsert_counterparty_profiles(
+    body: CounterpartyProfileBulkRequest,
+    organization_id: uuid.UUID = Depends(get_current_organization_id),
+    db: Session = Depends(get_db),
+) -> CounterpartyProfileBulkResponse:
+    return CounterpartyProfileBulkResponse(upserted=upsert_profiles(db, organization_id, body.profiles))
+
+
+@router.put("/{counterparty_id}/profiles/{reporting_year}", response_model=CounterpartyProfileOut)
+def put_counterparty_profile(
+    counterparty_id: str,
+    reporting_year: int,
+    body: CounterpartyFinancials,
+    organization_id: uuid.UUID = Depends(get_current_organization_id),
+    db: Session = Depends(get_db),
+) -> CounterpartyProfileOut:
+    try:
+        profile = CounterpartyProfileUpsert(
+            counterparty_id=counterparty_id, reporting_year=reporting_year, **body.model_dump()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    upsert_profiles(db, organization_id, [profile])
+    return _profile_out(_get_profile_or_404(db, organization_id, counterparty_id, reporting_year))
+
+
+@router.get("/{counterparty_id}/profiles/{reporting_year}", response_model=CounterpartyProfileOut)
+def get_counterparty_profile(
+    counterparty_id: str,
+    reporting_year: int,
+    organization_id: uuid.UUID = Depends(get_current_organization_id),
+    db: Session = Depends(get_db),
+) -> CounterpartyProfileOut:
+    return _profile_out(_get_profile_or_404(db, organization_id, counterparty_id, reporting_year))
+
+
+@router.delete("/{counterparty_id}/profiles/{reporting_year}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_counterparty_profile(
+    counterparty_id: str,
+    reporting_year: int,
+    organization_id: uuid.UUID = Depends(get_current_organization_id),
+    db: Session = Depends(get_db),
+) -> None:
+    if not delete_profile(db, organization_id, counterparty_id, reporting_year):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Counterparty profile not found")
@@ -0,0 +1,44 @@
+"""
+Pydantic schemas for counterparty financial profile API.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class CounterpartyFinancials(BaseModel):
+    """Balance-sheet data for one reporting year (PKR). evic / total_equity_plus_debt
+    are computed from their components when not given."""
+    share_price: Optional[float] = Field(default=None, ge=0)
+    outstanding_shares: Optional[float] = Field(default=None, ge=0)
+    total_debt: Optional[float] = Field(default=None, ge=0)
+    minority_interest: Optional[float] = Field(default=None, ge=0)
+    preferred_stock: Optional[float] = Field(default=None, ge=0)
+    total_equity: Optional[float] = Field(default=None, ge=0)
+    total_assets: Optional[float] = Field(default=None, ge=0)
+    evic: Optional[float] = Field(default=None, ge=0)
+    total_equity_plus_debt: Optional[float] = Field(default=None, ge=0)
+
+
+class CounterpartyProfileUpsert(CounterpartyFinancials):
+    counterparty_id: str = Field(min_length=1, max_length=128)
+    reporting_year: int = Field(ge=1900, le=2100)
+
+
+class CounterpartyProfileBulkRequest(BaseModel):
+    profiles: List[CounterpartyProfileUpsert] = Field(min_length=1)
+
+
+class CounterpartyProfileBulkResponse(BaseModel):
+    upserted: int
+
+
+class CounterpartyProfileOut(CounterpartyFinancials):
+    counterparty_id: str
+    reporting_year: int
+    # Attribution denominator per company type (None: no positive candidate)
+    denominators: Dict[str, Optional[float]]
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
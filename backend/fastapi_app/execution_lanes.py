@@ -0,0 +1,140 @@
+"""
+Execution lanes: separate worker pools for interactive and bulk calculations.
+
+Sync FastAPI endpoints all share Starlette's default thread pool, so a few portfolio-
+scale scenario runs can delay single-formula form calls. Calculation endpoints
+instead run in one of two lanes, each with its own thread pool:
+
+- interactive (INTERACTIVE_LANE_WORKERS threads): single calculations and small
+  batches, so they never queue behind bulk work
+- bulk (BULK_LANE_WORKERS threads): batch, scenario, sensitivity / reverse stress,
+  Option 3 and file runs whose estimated cost is at least LANE_BULK_MIN_ROWS
+
+The cost is estimated from the request size after parsing (items, portfolio rows,
+rows × shocks, upload bytes), so a 10-row batch stays interactive while a 1M-row
+portfolio goes to the bulk lane. Large emission batches still fan out to the
+ParallelBatchExecutor process pool from their bulk-lane thread. GET /lanes/metrics
+reports queue depth and recent p50 / p99 latency per lane.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE_LANE_WORKERS = int(os.getenv("INTERACTIVE_LANE_WORKERS", "8"))
+BULK_LANE_WORKERS = int(os.getenv("BULK_LANE_WORKERS", "2"))
+LANE_BULK_MIN_ROWS = int(os.getenv("LANE_BULK_MIN_ROWS", "1000"))
+LATENCY_WINDOW = 1000  # recent requests per lane kept for the latency percentiles
+
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+
+
+class ExecutionLane:
+    """A named thread pool with queue and latency statistics"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"lane-{name}")
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    async def run(self, function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run function in this lane's pool (keeping the caller's context variables)"""
+        submitted_at = time.monotonic()
+        context = contextvars.copy_context()
+
+        def call() -> Any:
+            with self._lock:
+                self.started += 1
+            try:
+                return context.run(function, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self.completed += 1
+                    self._latencies.append(time.monotonic() - submitted_at)
+
+        with self._lock:
+            self.submitted += 1
+        return await asyncio.wrap_future(self._executor.submit(call))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = np.array(self._latencies, dtype=np.float64)
+            started, completed = self.started, self.completed
+            submitted = self.submitted
+        p50, p99 = (np.percentile(latencies, [50, 99]).tolist() if len(latencies) else (None, None))
+        return {
+            "workers": self.workers,
+            "queued": submitted - started,
+            "running": started - completed,
+            "completed": completed,
+            "latency_seconds": {"window": len(latencies), "p50": p50, "p99": p99},
+        }
+
+
+class ExecutionLanes:
+    """The interactive and bulk lanes and the cost threshold between them"""
+
+    def __init__(
+        self,
+        interactive_workers: int = INTERACTIVE_LANE_WORKERS,
+        bulk_workers: int = BULK_LANE_WORKERS,
+        bulk_min_rows: int = LANE_BULK_MIN_ROWS
+    ):
+        self.bulk_min_rows = bulk_min_rows
+        self.lanes: Dict[str, ExecutionLane] = {
+            LANE_INTERACTIVE: ExecutionLane(LANE_INTERACTIVE, interactive_workers),
+            LANE_BULK: ExecutionLane(LANE_BULK, bulk_workers),
+        }
+
+    def lane_for(self, cost: float) -> ExecutionLane:
+        return self.lanes[LANE_BULK if cost >= self.bulk_min_rows else LANE_INTERACTIVE]
+
+    async def run(self, cost: float, function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return await self.lane_for(cost).run(function, *args, **kwargs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "bulk_min_rows": self.bulk_min_rows,
+            "lanes": {name: lane.snapshot() for name, lane in self.lanes.items()},
+        }
+
+
+execution_lanes = None
+
+
+def get_execution_lanes() -> ExecutionLanes:
+    """Lazy initialization of the process-wide execution lanes"""
+    global execution_lanes
+    if execution_lanes is None:
+        execution_lanes = ExecutionLanes()
+    return execution_lanes
+
+
+def in_lane(cost: Callable[..., float]) -> Callable:
+    """
+    Decorator turning a sync endpoint into an async one that runs in the lane picked
+    by cost(**endpoint_kwargs). The endpoint's signature is kept for FastAPI.
+    """
+    def decorate(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(endpoint)
+        async def run_endpoint(**kwargs: Any) -> Any:
+            return await get_execution_lanes().run(cost(**kwargs), endpoint, **kwargs)
+        return run_endpoint
+    return decorate
@@ -0,0 +1,37 @@
+"""
+Fast JSON responses for large engine results.
+
+Returning a Response subclass from an endpoint bypasses FastAPI's response_model
+handling: no revalidation of the content against the model and no jsonable_encoder
+pass. Only use it for output the engines build themselves (already response-shaped).
+Encoding uses orjson when installed and falls back to the stdlib json module.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt, fallback keeps dev setups working
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes; NumPy arrays and scalars are handled when orjson is available"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (stdlib json fallback)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
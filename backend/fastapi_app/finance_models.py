@@ -230,6 +230,103 @@ class FacilitatedEmissionResponse(BaseModel):
     calculation_id: Optional[str] = None
 
 
+class FinanceEmissionBatchItem(BaseModel):
+    """Single calculation within a batch request"""
+    formula_id: Optional[str] = None  # required unless the batch runs in waterfall mode
+    company_type: CompanyType
+    inputs: Dict[str, Any]
+    category: Optional[FormulaCategory] = None  # waterfall: formula family (default: formula_id's category)
+    # Reference a stored counterparty financial profile instead of sending EVIC / equity / debt inputs
+    counterparty_id: Optional[str] = None
+    reporting_year: Optional[int] = None
+
+
+class FinanceEmissionBatchRequest(BaseModel):
+    """Request model for a batch of finance/facilitated emission calculations"""
+    items: List[FinanceEmissionBatchItem]
+    top_k: Optional[int] = Field(default=None, gt=0)  # also return the K items with the largest financed emissions
+    include_results: bool = True  # False: totals (and top_k) only
+    waterfall: bool = False  # pick each item's best-scoring applicable formula from its inputs
+
+
+class FinanceEmissionBatchResult(BaseModel):
+    """Per-item outcome of a batch calculation (index refers to the request items)"""
+    index: int
+    success: bool
+    result: Optional[CalculationResult] = None
+    error: Optional[str] = None
+
+
+class FinanceEmissionBatchResponse(BaseModel):
+    """Response model for a batch of emission calculations"""
+    success: bool
+    total_items: int
+    succeeded: int
+    failed: int
+    total_financed_emissions: float
+    results: List[FinanceEmissionBatchResult]
+    top_contributors: Optional[List[FinanceEmissionBatchResult]] = None  # largest financed emissions first
+    error: Optional[str] = None
+
+
+class FinanceEmissionValidationRow(BaseModel):
+    """Validation outcome of one batch item that has errors or warnings"""
+    index: int
+    formula_id: Optional[str] = None  # formula validated against (waterfall: the selected one)
+    valid: bool
+    errors: List[str] = []
+    warnings: List[str] = []
+
+
+class FinanceEmissionValidationResponse(BaseModel):
+    """Dry-run validation of a batch; bitmaps are base64, bit i (little-endian bit order) = item i"""
+    success: bool
+    total_items: int
+    valid: int
+    invalid: int
+    with_warnings: int
+    invalid_bitmap: str
+    warning_bitmap: str
+    rows: List[FinanceEmissionValidationRow]  # items with errors or warnings, in order, capped
+    rows_truncated: bool
+    error: Optional[str] = None
+
+
+class Option3EstimationRequest(BaseModel):
+    """Request model for PCAF Option 3 estimates from sector emission intensities"""
+    companies: List[CompanyData]
+    include_results: bool = True  # False: totals only
+
+
+class Option3EstimationResult(BaseModel):
+    """Per-company Option 3 estimate (index refers to the request companies)"""
+    index: int
+    option_code: Optional[Literal["3a", "3b", "3c"]] = None  # None: no intensity or inputs for any option
+    data_quality_score: Optional[int] = None  # 4 (3a) or 5 (3b, 3c)
+    attribution_factor: Optional[float] = None  # 3a only
+    emission_factor: Optional[float] = None  # tCO2e per PKR million of revenue (3a, 3c) or assets (3b)
+    financed_emissions: float
+
+
+class Option3OptionTotal(BaseModel):
+    count: int
+    financed_emissions: float
+
+
+class Option3EstimationResponse(BaseModel):
+    """Response model for PCAF Option 3 estimates"""
+    success: bool
+    total_items: int
+    estimated: int
+    not_estimated: int
+    total_financed_emissions: float
+    weighted_data_quality_score: Optional[float] = None  # weighted by outstanding amount
+    options: Dict[str, Option3OptionTotal]  # per option code
+    intensities_version: str
+    results: List[Option3EstimationResult]
+    error: Optional[str] = None
+
+
 class FormulaListResponse(BaseModel):
     """Response model for formula list"""
     formulas: List[FinanceEmissionFormula]
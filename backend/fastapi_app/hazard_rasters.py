@@ -0,0 +1,228 @@
+"""
+Gridded physical hazard scores (flood, heat, cyclone, ...) from memory-mapped tiles.
+
+Hazard data lives in a local directory (HAZARD_DATA_DIR) with a manifest.json:
+
+    {
+      "version": "2025.1",
+      "hazards": {
+        "flood": {"cell_size": 0.01, "tile_size": 1000, "nodata": -1, "pd_uplift": 0.5},
+        "heat": {...}
+      }
+    }
+
+Each hazard is a global grid (origin 90°N, 180°W; rows go south, columns east) of
+scores in [0, 1], split into square tiles of tile_size × tile_size cells saved as
+`<hazard>/r<tile row>_c<tile column>.npy`. Tiles are opened with np.load(mmap_mode="r")
+and the open memmaps are kept in an LRU cache, so only the pages that lookups touch
+are ever read and nothing is downloaded. Missing tiles (e.g. open ocean) mean no data.
+
+Lookups are vectorized: grid cells and tile keys are computed for all locations at
+once, locations are grouped by tile with one argsort, and each touched tile is read
+with a single fancy-index gather.
+
+An exposure's location factor is 1 + Σ pd_uplift_h × score_h (no data counts as 0);
+ScenarioEngine multiplies physical PD multipliers by it for exposures with coordinates.
+write_hazard_tiles converts a full grid (.npy) into this layout.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HAZARD_DATA_DIR = os.getenv("HAZARD_DATA_DIR", os.path.join(os.path.dirname(__file__), "data", "hazards"))
+HAZARD_TILE_CACHE_SIZE = int(os.getenv("HAZARD_TILE_CACHE_SIZE", "256"))
+MANIFEST_FILE = "manifest.json"
+
+# Grid origin: top-left corner of cell (0, 0)
+ORIGIN_LATITUDE = 90.0
+ORIGIN_LONGITUDE = -180.0
+
+
+class HazardLayer:
+    """One hazard's tiled global grid"""
+
+    def __init__(
+        self,
+        name: str,
+        directory: str,
+        cell_size: float,
+        tile_size: int,
+        nodata: Optional[float] = None,
+        pd_uplift: float = 0.0,
+        cache_size: int = HAZARD_TILE_CACHE_SIZE
+    ):
+        if cell_size <= 0 or tile_size <= 0:
+            raise ValueError(f"Hazard '{name}': cell_size and tile_size must be positive")
+        self.name = name
+        self.directory = directory
+        self.cell_size = float(cell_size)
+        self.tile_size = int(tile_size)
+        self.nodata = nodata
+        self.pd_uplift = float(pd_uplift)
+        self.rows = int(round(180.0 / self.cell_size))
+        self.columns = int(round(360.0 / self.cell_size))
+        self.tile_columns = -(-self.columns // self.tile_size)
+        self.cache_size = cache_size
+        self._tiles: "OrderedDict[Tuple[int, int], Optional[np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def tile_path(self, tile_row: int, tile_column: int) -> str:
+        return os.path.join(self.directory, f"r{tile_row}_c{tile_column}.npy")
+
+    def _tile(self, tile_row: int, tile_column: int) -> Optional[np.ndarray]:
+        """Memory-mapped tile (None when the tile has no file), LRU-cached"""
+        key = (tile_row, tile_column)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return self._tiles[key]
+        path = self.tile_path(tile_row, tile_column)
+        tile = np.load(path, mmap_mode="r") if os.path.exists(path) else None
+        with self._lock:
+            self._tiles[key] = tile
+            while len(self._tiles) > self.cache_size:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def sample(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        """Scores at the given coordinates (float64, NaN where there is no location or no data)"""
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        scores = np.full(len(latitude), np.nan)
+        located = np.flatnonzero(np.isfinite(latitude) & np.isfinite(longitude) & (np.abs(latitude) <= 90.0))
+        if not located.size:
+            return scores
+
+        # Global cell indices; 90°S falls in the last row, longitudes wrap around
+        grid_row = np.minimum(np.floor((ORIGIN_LATITUDE - latitude[located]) / self.cell_size).astype(np.int64), self.rows - 1)
+        grid_column = np.floor(((longitude[located] - ORIGIN_LONGITUDE) % 360.0) / self.cell_size).astype(np.int64) % self.columns
+        tile_key = (grid_row // self.tile_size) * self.tile_columns + grid_column // self.tile_size
+
+        # Group locations by tile: one gather per touched tile
+        order = np.argsort(tile_key, kind="stable")
+        sorted_keys = tile_key[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        ends = np.append(starts[1:], len(order))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            tile_row, tile_column = divmod(int(sorted_keys[start]), self.tile_columns)
+            tile = self._tile(tile_row, tile_column)
+            if tile is None:
+                continue
+            rows = order[start:end]
+            values = tile[
+                grid_row[rows] - tile_row * self.tile_size,
+                grid_column[rows] - tile_column * self.tile_size,
+            ].astype(np.float64)
+            if self.nodata is not None:
+                values[values == self.nodata] = np.nan
+            scores[located[rows]] = values
+        return scores
+
+
+class HazardRasters:
+    """All hazard layers of a hazard data directory"""
+
+    def __init__(self, directory: str, cache_size: int = HAZARD_TILE_CACHE_SIZE):
+        with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+        self.version = str(manifest.get("version", ""))
+        self.layers: Dict[str, HazardLayer] = {
+            name: HazardLayer(
+                name,
+                os.path.join(directory, name),
+                spec["cell_size"],
+                spec["tile_size"],
+                spec.get("nodata"),
+                spec.get("pd_uplift", 0.0),
+                cache_size,
+            )
+            for name, spec in manifest.get("hazards", {}).items()
+        }
+
+    def scores(self, latitude: np.ndarray, longitude: np.ndarray) -> Dict[str, np.ndarray]:
+        """Score per hazard for each location (NaN: no location / no data)"""
+        return {name: layer.sample(latitude, longitude) for name, layer in self.layers.items()}
+
+    def location_factors(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        """1 + Σ pd_uplift × score per location; 1.0 where nothing is known"""
+        factors = np.ones(len(latitude))
+        for layer in self.layers.values():
+            if layer.pd_uplift:
+                factors += layer.pd_uplift * np.nan_to_num(layer.sample(latitude, longitude), nan=0.0)
+        return factors
+
+
+def load_hazard_rasters(directory: Optional[str] = None) -> Optional[HazardRasters]:
+    """The configured hazard data, or None when the directory has no manifest"""
+    directory = directory or HAZARD_DATA_DIR
+    if not os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        return None
+    try:
+        rasters = HazardRasters(directory)
+    except (KeyError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid hazard manifest in {directory}: {e}") from e
+    logger.info(f"Loaded hazard rasters version {rasters.version} ({', '.join(rasters.layers)}) from {directory}")
+    return rasters
+
+
+def write_hazard_tiles(grid: np.ndarray, directory: str, tile_size: int) -> int:
+    """Split a global (rows, columns) grid into the tile files of one hazard; all-nodata tiles can be deleted afterwards"""
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for tile_row, row_start in enumerate(range(0, grid.shape[0], tile_size)):
+        for tile_column, column_start in enumerate(range(0, grid.shape[1], tile_size)):
+            tile = np.ascontiguousarray(grid[row_start:row_start + tile_size, column_start:column_start + tile_size])
+            np.save(os.path.join(directory, f"r{tile_row}_c{tile_column}.npy"), tile)
+            written += 1
+    return written
+
+
+# ==============================
+# CLI
+# ==============================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tile a global hazard grid (.npy, origin 90N/180W) into HAZARD_DATA_DIR")
+    parser.add_argument("grid", help="Global grid of scores in [0, 1] saved with np.save")
+    parser.add_argument("--hazard", required=True, help="Hazard name, e.g. flood")
+    parser.add_argument("--output", default=HAZARD_DATA_DIR, help="Hazard data directory")
+    parser.add_argument("--tile-size", type=int, default=1000, help="Cells per tile side")
+    parser.add_argument("--nodata", type=float, default=None, help="Value meaning no data")
+    parser.add_argument("--pd-uplift", type=float, default=0.0, help="PD multiplier uplift at score 1")
+    parser.add_argument("--version", default=None, help="Manifest version")
+    args = parser.parse_args()
+
+    grid = np.load(args.grid, mmap_mode="r")
+    if grid.ndim != 2 or grid.shape[1] != 2 * grid.shape[0]:
+        parser.exit(2, "error: expected a global grid with twice as many columns as rows\n")
+
+    written = write_hazard_tiles(grid, os.path.join(args.output, args.hazard), args.tile_size)
+    manifest_path = os.path.join(args.output, MANIFEST_FILE)
+    manifest = {"version": "", "hazards": {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    if args.version:
+        manifest["version"] = args.version
+    manifest["hazards"][args.hazard] = {
+        "cell_size": 180.0 / grid.shape[0],
+        "tile_size": args.tile_size,
+        "nodata": args.nodata,
+        "pd_uplift": args.pd_uplift,
+    }
+    with open(manifest_path, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+    print(f"{args.hazard}: wrote {written} tiles to {os.path.join(args.output, args.hazard)}")
+
+
+if __name__ == "__main__":
+    main()
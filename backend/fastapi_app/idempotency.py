@@ -0,0 +1,358 @@
+"""
+Idempotency-Key support for POST calculation endpoints.
+
+Retries from the edge or flaky mobile networks re-POST the same calculation. A client
+that sends an `Idempotency-Key` header gets the first response for that key replayed
+byte for byte (status, content headers and body, plus `Idempotent-Replayed: true`)
+within IDEMPOTENCY_TTL_SECONDS. IdempotencyMiddleware answers the retry before routing,
+so it skips body validation, the computation and any database writes.
+
+- Keys are scoped to the caller (the tenant admission control uses: organization,
+  user or client address), method and path, so one caller never gets another's
+  response. The stored entry also keeps a SHA-256 of the query string, the Accept
+  header and the body. Reusing a key with a different request is rejected with 422.
+- A retry that arrives while the first request is still running gets 409.
+- Only responses below 500 (other than 429) and up to IDEMPOTENCY_MAX_RESPONSE_BYTES
+  are stored. Otherwise the key is released so the client can retry.
+
+Responses are stored in public.idempotency_responses (sql/004_idempotency_responses.sql)
+when DATABASE_URL is set, so every API process sees them. Without a database, each
+process keeps an in-memory LRU of up to IDEMPOTENCY_MAX_ENTRIES responses.
+IDEMPOTENCY_TTL_SECONDS=0 turns replay off.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from starlette.concurrency import run_in_threadpool
+
+from . import db as database
+from .admission_control import tenant_key
+from .idempotency_models import IdempotencyResponse
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_MAX_RESPONSE_BYTES = int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(8 * 1024 * 1024)))
+IDEMPOTENCY_PRUNE_INTERVAL_SECONDS = 60
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+
+# POST endpoints that calculate (or queue a calculation); other paths ignore the header
+IDEMPOTENT_PATHS = frozenset((
+    "/finance-emission",
+    "/finance-emission/batch",
+    "/finance-emission/validate",
+    "/finance-emission/option3",
+    "/facilitated-emission",
+    "/scenario/calculate",
+    "/scenario/calculate-file",
+    "/scenario/sensitivity",
+    "/scenario/reverse-stress",
+    "/scenario/sessions",
+    "/jobs/scenario",
+    "/jobs/finance-emission-batch",
+))
+
+# Response headers that belong to the stored representation; the rest (CORS, dates,
+# server) is set again by the outer middleware and server for each response
+STORED_HEADERS = frozenset((b"content-type", b"content-disposition", b"content-encoding", b"vary"))
+
+# begin() outcomes
+BEGIN_STARTED = "started"
+BEGIN_REPLAY = "replay"
+BEGIN_IN_PROGRESS = "in_progress"
+BEGIN_MISMATCH = "mismatch"
+
+StoredResponse = Tuple[int, List[List[str]], bytes]
+
+
+def storage_key(tenant: str, method: str, path: str, idempotency_key: str) -> str:
+    return hashlib.sha256(f"{tenant}\0{method} {path}\0{idempotency_key}".encode("utf-8")).hexdigest()
+
+
+def request_fingerprint(scope: Dict[str, Any], body: bytes) -> str:
+    """SHA-256 of everything that shapes the response: query string, Accept header and body"""
+    accept = b""
+    for name, value in scope["headers"]:
+        if name == b"accept":
+            accept = value
+            break
+    digest = hashlib.sha256(scope.get("query_string", b""))
+    digest.update(b"\0")
+    digest.update(accept)
+    digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+# ==============================
+# Stores
+# ==============================
+
+class MemoryIdempotencyStore:
+    """Process-local LRU of stored responses (used when DATABASE_URL is not set)"""
+
+    def __init__(
+        self,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+        ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS,
+        lock_seconds: int = IDEMPOTENCY_LOCK_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        # key -> (fingerprint, expires_at, stored response or None while running)
+        self._entries: "OrderedDict[str, Tuple[str, float, Optional[StoredResponse]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                if entry[0] != fingerprint:
+                    return BEGIN_MISMATCH, None
+                if entry[2] is None:
+                    return BEGIN_IN_PROGRESS, None
+                return BEGIN_REPLAY, entry[2]
+            self._entries[key] = (fingerprint, now + self.lock_seconds, None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return BEGIN_STARTED, None
+
+    def complete(self, key: str, fingerprint: str, response: StoredResponse) -> None:
+        with self._lock:
+            self._entries[key] = (fingerprint, time.monotonic() + self.ttl_seconds, response)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is None:
+                del self._entries[key]
+
+
+class DatabaseIdempotencyStore:
+    """Stored responses in public.idempotency_responses, shared by all API processes"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Any],
+        ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS,
+        lock_seconds: int = IDEMPOTENCY_LOCK_SECONDS
+    ):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self._next_prune = 0.0
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        now = datetime.now(timezone.utc)
+        pending = {
+            "request_fingerprint": fingerprint,
+            "status_code": None,
+            "headers": None,
+            "body": None,
+            "expires_at": now + timedelta(seconds=self.lock_seconds),
+        }
+        with self.session_factory() as session:
+            self._prune(session, now)
+            claimed = session.execute(
+                insert(IdempotencyResponse).values(idempotency_key=key, **pending).on_conflict_do_nothing()
+            ).rowcount
+            if not claimed:
+                # Take over an expired entry (finished or abandoned); a live one stays
+                claimed = session.execute(
+                    update(IdempotencyResponse)
+                    .where(IdempotencyResponse.idempotency_key == key, IdempotencyResponse.expires_at <= now)
+                    .values(**pending)
+                ).rowcount
+            session.commit()
+            if claimed:
+                return BEGIN_STARTED, None
+
+            entry = session.get(IdempotencyResponse, key)
+            if entry is None:
+                return BEGIN_IN_PROGRESS, None
+            if entry.request_fingerprint != fingerprint:
+                return BEGIN_MISMATCH, None
+            if entry.status_code is None:
+                return BEGIN_IN_PROGRESS, None
+            return BEGIN_REPLAY, (entry.status_code, entry.headers or [], entry.body or b"")
+
+    def complete(self, key: str, fingerprint: str, response: StoredResponse) -> None:
+        status_code, headers, body = response
+        with self.session_factory() as session:
+            session.execute(
+                update(IdempotencyResponse)
+                .where(IdempotencyResponse.idempotency_key == key, IdempotencyResponse.request_fingerprint == fingerprint)
+                .values(
+                    status_code=status_code,
+                    headers=headers,
+                    body=body,
+                    expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds),
+                )
+            )
+            session.commit()
+
+    def release(self, key: str) -> None:
+        with self.session_factory() as session:
+            session.execute(
+                delete(IdempotencyResponse).where(
+                    IdempotencyResponse.idempotency_key == key, IdempotencyResponse.status_code.is_(None)
+                )
+            )
+            session.commit()
+
+    def _prune(self, session: Any, now: datetime) -> None:
+        """Delete expired entries, at most once per IDEMPOTENCY_PRUNE_INTERVAL_SECONDS per process"""
+        if time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + IDEMPOTENCY_PRUNE_INTERVAL_SECONDS
+        session.execute(delete(IdempotencyResponse).where(IdempotencyResponse.expires_at <= now))
+
+
+idempotency_store = None
+
+
+def get_idempotency_store():
+    """Lazy initialization: the Postgres store when DATABASE_URL is set, else in memory"""
+    global idempotency_store
+    if idempotency_store is None:
+        if database.SessionLocal is not None:
+            idempotency_store = DatabaseIdempotencyStore(database.SessionLocal)
+        else:
+            idempotency_store = MemoryIdempotencyStore()
+    return idempotency_store
+
+
+# ==============================
+# Middleware
+# ==============================
+
+async def _send_json(send: Callable, status_code: int, content: Dict[str, Any], headers: Optional[List] = None) -> None:
+    body = json.dumps(content).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1"))]
+        + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware replaying stored responses for repeated Idempotency-Key requests"""
+
+    def __init__(self, app: Any, store_factory: Callable[[], Any] = get_idempotency_store, paths=IDEMPOTENT_PATHS):
+        self.app = app
+        self.store_factory = store_factory
+        self.paths = paths
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+            or IDEMPOTENCY_TTL_SECONDS <= 0
+        ):
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = None
+        for name, value in scope["headers"]:
+            if name == IDEMPOTENCY_HEADER:
+                idempotency_key = value.decode("latin-1").strip()
+                break
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"})
+            return
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        key = storage_key(tenant_key(scope), scope["method"], scope["path"], idempotency_key)
+        fingerprint = request_fingerprint(scope, body)
+        store = self.store_factory()
+        outcome, stored = await run_in_threadpool(store.begin, key, fingerprint)
+        if outcome == BEGIN_REPLAY:
+            status_code, headers, content = stored
+            logger.info(f"Replaying stored response for Idempotency-Key on {scope['path']}")
+            await send({
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+                + [(b"content-length", str(len(content)).encode("latin-1")), (REPLAYED_HEADER, b"true")],
+            })
+            await send({"type": "http.response.body", "body": content})
+            return
+        if outcome == BEGIN_IN_PROGRESS:
+            await _send_json(
+                send, 409, {"detail": "A request with this Idempotency-Key is still being processed"},
+                [(b"retry-after", b"1")],
+            )
+            return
+        if outcome == BEGIN_MISMATCH:
+            await _send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request"})
+            return
+
+        body_sent = False
+
+        async def replay_receive() -> Dict[str, Any]:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response: Dict[str, Any] = {"status": 500, "headers": [], "body": [], "size": 0}
+
+        async def capture_send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", [])
+                    if name.lower() in STORED_HEADERS
+                ]
+            elif message["type"] == "http.response.body" and response["size"] <= IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                chunk = message.get("body", b"")
+                response["body"].append(chunk)
+                response["size"] += len(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await run_in_threadpool(store.release, key)
+            raise
+        if response["status"] < 500 and response["status"] != 429 and response["size"] <= IDEMPOTENCY_MAX_RESPONSE_BYTES:
+            await run_in_threadpool(
+                store.complete, key, fingerprint, (response["status"], response["headers"], b"".join(response["body"]))
+            )
+        else:
+            await run_in_threadpool(store.release, key)
@@ -0,0 +1,30 @@
+"""
+SQLAlchemy model for stored Idempotency-Key responses (public.idempotency_responses).
+"""
+
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import DateTime, Integer, LargeBinary, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .db import Base
+
+
+class IdempotencyResponse(Base):
+    __tablename__ = "idempotency_responses"
+
+    # SHA-256 of the caller's tenant (organization, user or client IP), method, path and
+    # the client's Idempotency-Key, so one caller's key never replays another's response
+    idempotency_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # SHA-256 of the query string, Accept header and body
+    request_fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    # NULL while the first request is still running
+    status_code: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    headers: Mapped[Optional[Any]] = mapped_column(JSONB, nullable=True)
+    body: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,224 @@
+"""
+Postgres-backed queue for long-running calculation jobs.
+
+Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number of local
+worker processes can poll the same table without an external broker. Work is split
+into fixed-size chunks; every finished chunk is checkpointed in
+calculation_job_chunks. A worker holds a lease on the job while it runs and extends
+it on every checkpoint. If the worker crashes the lease expires, the job is claimed
+again and resumes at the first chunk without a checkpoint.
+"""
+
+import math
+import os
+import random
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .job_models import CalculationJob, CalculationJobChunk
+
+JOB_KIND_SCENARIO = "scenario"
+JOB_KIND_FINANCE_EMISSION_BATCH = "finance_emission_batch"
+
+# Payload key holding the rows each job kind is chunked over
+JOB_ROW_KEYS: Dict[str, str] = {
+    JOB_KIND_SCENARIO: "portfolio_entries",
+    JOB_KIND_FINANCE_EMISSION_BATCH: "items",
+}
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "5000"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+
+
+class JobLeaseLost(Exception):
+    """Raised when a worker no longer owns the job it is processing"""
+    pass
+
+
+def count_job_rows(kind: str, payload: Dict[str, Any]) -> int:
+    """Number of rows the job is chunked over"""
+    if kind not in JOB_ROW_KEYS:
+        raise ValueError(f"Unsupported job kind: {kind}")
+    return len(payload.get(JOB_ROW_KEYS[kind]) or [])
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter: base * 2^(attempts-1), capped"""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: Dict[str, Any],
+    chunk_size: Optional[int] = None,
+    priority: int = 0,
+    max_attempts: Optional[int] = None,
+) -> CalculationJob:
+    """Insert a new queued job and return it"""
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    row_count = count_job_rows(kind, payload)
+    if row_count == 0:
+        raise ValueError(f"Job payload has no {JOB_ROW_KEYS[kind]}")
+
+    job = CalculationJob(
+        kind=kind,
+        status="queued",
+        priority=priority,
+        payload=payload,
+        chunk_size=chunk_size,
+        total_chunks=math.ceil(row_count / chunk_size),
+        completed_chunks=0,
+        attempts=0,
+        max_attempts=max_attempts or DEFAULT_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: uuid.UUID) -> Optional[CalculationJob]:
+    return db.query(CalculationJob).filter(CalculationJob.id == job_id).first()
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[CalculationJob]:
+    """
+    Claim the next runnable job: queued and due, or running with an expired lease.
+    Concurrent workers skip rows another transaction has locked.
+    """
+    now = func.now()
+    job = (
+        db.query(CalculationJob)
+        .filter(
+            ((CalculationJob.status == "queued") & (CalculationJob.run_after <= now))
+            | ((CalculationJob.status == "running") & (CalculationJob.lease_expires_at < now))
+        )
+        .order_by(CalculationJob.priority.desc(), CalculationJob.created_at)
+        .with_for_update(skip_locked=True)
+        .limit(1)
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        return None
+
+    if job.attempts >= job.max_attempts:
+        # Lease expired on the final attempt (worker crashed): give up instead of looping
+        job.status = "failed"
+        job.error = job.error or "Worker lease expired on final attempt"
+        job.locked_by = None
+        job.lease_expires_at = None
+        job.finished_at = now
+        db.commit()
+        return None
+
+    job.status = "running"
+    job.attempts = job.attempts + 1
+    job.locked_by = worker_id
+    job.lease_expires_at = now + timedelta(seconds=LEASE_SECONDS)
+    job.started_at = job.started_at or now
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _lock_owned_job(db: Session, job_id: uuid.UUID, worker_id: str) -> CalculationJob:
+    job = (
+        db.query(CalculationJob)
+        .filter(
+            CalculationJob.id == job_id,
+            CalculationJob.locked_by == worker_id,
+            CalculationJob.status == "running",
+        )
+        .with_for_update()
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        raise JobLeaseLost(f"Worker {worker_id} no longer owns job {job_id}")
+    return job
+
+
+def completed_chunk_indexes(db: Session, job_id: uuid.UUID) -> Set[int]:
+    rows = db.query(CalculationJobChunk.chunk_index).filter(CalculationJobChunk.job_id == job_id).all()
+    return {row[0] for row in rows}
+
+
+def load_chunk_results(db: Session, job_id: uuid.UUID) -> List[Any]:
+    """Checkpointed chunk results in chunk order"""
+    rows = (
+        db.query(CalculationJobChunk)
+        .filter(CalculationJobChunk.job_id == job_id)
+        .order_by(CalculationJobChunk.chunk_index)
+        .all()
+    )
+    return [row.result for row in rows]
+
+
+def checkpoint_chunk(
+    db: Session,
+    job_id: uuid.UUID,
+    worker_id: str,
+    chunk_index: int,
+    result: Any,
+) -> None:
+    """Persist one finished chunk and extend the worker's lease in the same transaction"""
+    job = _lock_owned_job(db, job_id, worker_id)
+    db.add(CalculationJobChunk(job_id=job_id, chunk_index=chunk_index, result=result))
+    job.completed_chunks = job.completed_chunks + 1
+    job.lease_expires_at = func.now() + timedelta(seconds=LEASE_SECONDS)
+    db.commit()
+
+
+def complete_job(db: Session, job_id: uuid.UUID, worker_id: str, result: Any) -> None:
+    job = _lock_owned_job(db, job_id, worker_id)
+    job.status = "succeeded"
+    job.result = result
+    job.error = None
+    job.locked_by = None
+    job.lease_expires_at = None
+    job.finished_at = func.now()
+    db.commit()
+
+
+def fail_job(
+    db: Session,
+    job_id: uuid.UUID,
+    worker_id: str,
+    error: str,
+    retryable: bool = True,
+) -> str:
+    """
+    Record a failed attempt. Retryable failures go back to the queue with backoff
+    until max_attempts is reached. Checkpointed chunks are kept, so the retry
+    resumes where this attempt stopped. Returns the new job status.
+    """
+    job = _lock_owned_job(db, job_id, worker_id)
+    job.error = error
+    job.locked_by = None
+    job.lease_expires_at = None
+
+    if retryable and job.attempts < job.max_attempts:
+        job.status = "queued"
+        job.run_after = func.now() + timedelta(seconds=retry_delay_seconds(job.attempts))
+    else:
+        job.status = "failed"
+        job.finished_at = func.now()
+
+    status = job.status
+    db.commit()
+    return status
@@ -0,0 +1,136 @@
+"""
+Job routes: submit long scenario / emission batch runs, then poll or stream status.
+"""
+
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from .auth_deps import get_optional_organization_id
+from .counterparty_profiles import resolve_counterparty_items
+from .db import SessionLocal, get_db
+from .finance_models import FinanceEmissionBatchRequest
+from .job_models import CalculationJob
+from .job_queue import (
+    JOB_KIND_FINANCE_EMISSION_BATCH,
+    JOB_KIND_SCENARIO,
+    TERMINAL_STATUSES,
+    enqueue_job,
+    get_job,
+)
+from .job_schemas import JobStatusResponse, JobSubmitResponse
+from .models import ScenarioRequest
+
+router = APIRouter()
+
+EVENT_POLL_SECONDS = 1.0
+
+
+def _submit(
+    db: Session,
+    kind: str,
+    payload: Dict[str, Any],
+    chunk_size: Optional[int],
+    priority: int,
+) -> JobSubmitResponse:
+    try:
+        job = enqueue_job(db, kind, payload, chunk_size=chunk_size, priority=priority)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return JobSubmitResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        total_chunks=job.total_chunks,
+        status_url=f"/jobs/{job.id}",
+        events_url=f"/jobs/{job.id}/events",
+        result_url=f"/jobs/{job.id}/result",
+    )
+
+
+def _get_job_or_404(db: Session, job_id: uuid.UUID) -> CalculationJob:
+    job = get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.post("/scenario", response_model=JobSubmitResponse, status_code=status.HTTP_202_ACCEPTED)
+def submit_scenario_job(
+    body: ScenarioRequest,
+    chunk_size: Optional[int] = Query(default=None, gt=0),
+    priority: int = 0,
+    db: Session = Depends(get_db),
+) -> JobSubmitResponse:
+    return _submit(db, JOB_KIND_SCENARIO, body.model_dump(mode="json"), chunk_size, priority)
+
+
+@router.post("/finance-emission-batch", response_model=JobSubmitResponse, status_code=status.HTTP_202_ACCEPTED)
+def submit_finance_emission_batch_job(
+    body: FinanceEmissionBatchRequest,
+    chunk_size: Optional[int] = Query(default=None, gt=0),
+    priority: int = 0,
+    organization_id: Optional[uuid.UUID] = Depends(get_optional_organization_id),
+    db: Session = Depends(get_db),
+) -> JobSubmitResponse:
+    # Counterparty profiles (of the caller's organization) are resolved at submission,
+    # so every chunk sees the same financials
+    try:
+        resolve_counterparty_items(body.items, organization_id, db)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return _submit(db, JOB_KIND_FINANCE_EMISSION_BATCH, body.model_dump(mode="json"), chunk_size, priority)
+
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+def job_status(job_id: uuid.UUID, db: Session = Depends(get_db)) -> JobStatusResponse:
+    return JobStatusResponse.model_validate(_get_job_or_404(db, job_id))
+
+
+@router.get("/{job_id}/result")
+def job_result(job_id: uuid.UUID, db: Session = Depends(get_db)) -> Any:
+    job = _get_job_or_404(db, job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job failed: {job.error}")
+    if job.status != "succeeded":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job.status} ({job.completed_chunks}/{job.total_chunks} chunks done)",
+        )
+    return job.result
+
+
+@router.get("/{job_id}/events")
+def job_events(job_id: uuid.UUID, db: Session = Depends(get_db)) -> StreamingResponse:
+    """Server-sent events: one `progress` event per status change, then a final `done` event"""
+    _get_job_or_404(db, job_id)
+
+    def event_stream():
+        last_payload = None
+        while True:
+            # The request-scoped session is closed once streaming starts; use our own
+            with SessionLocal() as stream_db:
+                job = get_job(stream_db, job_id)
+                if job is None:
+                    return
+                payload = JobStatusResponse.model_validate(job).model_dump_json()
+                finished = job.status in TERMINAL_STATUSES
+
+            if payload != last_payload:
+                event = "done" if finished else "progress"
+                yield f"event: {event}\ndata: {payload}\n\n"
+                last_payload = payload
+            if finished:
+                return
+            time.sleep(EVENT_POLL_SECONDS)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,36 @@
+"""
+Pydantic schemas for background job API.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: uuid.UUID
+    kind: str
+    status: str
+    total_chunks: int
+    status_url: str
+    events_url: str
+    result_url: str
+
+
+class JobStatusResponse(BaseModel):
+    id: uuid.UUID
+    kind: str
+    status: str
+    total_chunks: int
+    completed_chunks: int
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    run_after: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
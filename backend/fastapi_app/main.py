@@ -1,13 +1,63 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, File, Form, HTTPException, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from .models import (
     HealthResponse,
+    PortfolioIngestReport,
+    ReverseStressRequest,
+    ReverseStressResponse,
+    ScenarioFileResponse,
     ScenarioRequest,
     ScenarioResponse,
+    ScenarioSessionDelta,
+    ScenarioSessionResponse,
+    SensitivityRequest,
+    SensitivityResponse,
 )
 from .calculation_engine import CalculationEngine
 from .scenario_engine import ScenarioEngine
+from .scenario_sessions import ScenarioSession, ScenarioSessionStore, SessionVersionConflict
+from .columnar import portfolio_entries_to_columns
+from .fast_json import FastJSONResponse
+from .columnar_formats import (
+    COLUMNAR_OPENAPI_RESPONSES,
+    FORMAT_JSON,
+    batch_result_table,
+    columnar_response,
+    negotiate_format,
+    require_pyarrow,
+    scenario_result_table,
+)
+from . import portfolio_ingest
+from .portfolio_ingest import (
+    FILE_FORMAT_PARQUET,
+    PARQUET_MAGIC,
+    PortfolioIngestResult,
+    detect_file_format,
+    read_portfolio_stream,
+)
+from .parallel_executor import (
+    ParallelBatchExecutor,
+    summarize_batch_columns,
+    summarize_batch_results,
+    top_batch_results,
+)
+from .admission_control import ADMISSION_BYTES_PER_COST_UNIT, AdmissionControlMiddleware, get_admission_controller
+from .auth_deps import get_optional_organization_id
 from .auth_routes import router as auth_router
+from .batch_dry_run import (
+    BODY_CONTENT_TYPES,
+    DEFAULT_MAX_REPORTED_ROWS,
+    UnsupportedBodyFormat,
+    detect_body_format,
+    dry_run_batch,
+    parse_batch_body,
+)
+from .counterparty_profiles import resolve_counterparty_items
+from .counterparty_routes import router as counterparty_router
+from .execution_lanes import get_execution_lanes, in_lane
+from .idempotency import IdempotencyMiddleware
+from .job_routes import router as job_router
 from .database import test_connection, get_supabase_client
 from .db import test_postgres_connection
 from .finance_models import (
@@ -16,9 +66,18 @@ from .finance_models import (
     FinanceEmissionResponse,
     FacilitatedEmissionRequest,
     FacilitatedEmissionResponse,
+    FinanceEmissionBatchRequest,
+    FinanceEmissionBatchResponse,
+    FinanceEmissionValidationResponse,
+    Option3EstimationRequest,
+    Option3EstimationResponse,
 )
+from .option3_estimation import Option3Estimator, SectorIntensitiesNotConfigured, companies_to_columns
+from .request_coalescing import SingleFlight, request_key
+from typing import Literal, Optional
 import logging
 import os
+import uuid
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +87,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(title="Finance Emission Service", version="0.1.0")
 
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
+app.include_router(job_router, prefix="/jobs", tags=["jobs"])
+app.include_router(counterparty_router, prefix="/counterparties", tags=["counterparties"])
 
 # CORS configuration - allow frontend domain and local development
 # When allow_credentials=True, you cannot use allow_origins=["*"]
@@ -58,6 +119,11 @@ else:
 
 logger.info(f"CORS allowed origins: {allowed_origins}")
 
+# Admission control and Idempotency-Key replay: added before CORS so they run inside it
+# and their responses (429/503, replays) still get CORS headers. Replays skip admission.
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(IdempotencyMiddleware)
+
 # Add CORS middleware - MUST be added before routes
 # For Vercel serverless functions, explicit CORS configuration is critical
 # Note: When allow_credentials=True, allow_headers must be explicit, not ["*"]
@@ -78,6 +144,7 @@ app.add_middleware(
         "X-Requested-With",
         "Access-Control-Request-Method",
         "Access-Control-Request-Headers",
+        "Idempotency-Key",
     ],
     expose_headers=["*"],
     max_age=3600,
@@ -88,6 +155,10 @@ app.add_middleware(
 # Initialize the calculation engines lazily to avoid crashes during import
 calculation_engine = None
 scenario_engine = None
+batch_executor = None
+scenario_sessions = None
+option3_estimator = None
+request_flights = None
 
 def get_calculation_engine():
     """Lazy initialization of calculation engine"""
@@ -96,6 +167,13 @@ def get_calculation_engine():
         calculation_engine = CalculationEngine()
     return calculation_engine
 
+def get_batch_executor():
+    """Lazy initialization of the multi-process batch executor (pool starts on first large batch)"""
+    global batch_executor
+    if batch_executor is None:
+        batch_executor = ParallelBatchExecutor()
+    return batch_executor
+
 def get_scenario_engine():
     """Lazy initialization of scenario engine"""
     global scenario_engine
@@ -103,6 +181,27 @@ def get_scenario_engine():
         scenario_engine = ScenarioEngine()
     return scenario_engine
 
+def get_option3_estimator():
+    """Lazy initialization of the Option 3 estimator (loads the sector intensity table)"""
+    global option3_estimator
+    if option3_estimator is None:
+        option3_estimator = Option3Estimator()
+    return option3_estimator
+
+def get_scenario_sessions():
+    """Lazy initialization of the in-process scenario session store"""
+    global scenario_sessions
+    if scenario_sessions is None:
+        scenario_sessions = ScenarioSessionStore()
+    return scenario_sessions
+
+def get_request_flights():
+    """Lazy initialization of the single-flight store shared by identical concurrent requests"""
+    global request_flights
+    if request_flights is None:
+        request_flights = SingleFlight()
+    return request_flights
+
 
 @app.get("/health", response_model=HealthResponse)
 def health() -> HealthResponse:
@@ -124,6 +223,18 @@ def root():
     return {"message": "FastAPI backend is running!", "status": "ok"}
 
 
+@app.get("/admission/metrics")
+def admission_metrics():
+    """Admission control counters and queue wait times per route (this process)"""
+    return get_admission_controller().snapshot()
+
+
+@app.get("/lanes/metrics")
+def lanes_metrics():
+    """Queue depth and recent latency of the interactive and bulk execution lanes (this process)"""
+    return get_execution_lanes().snapshot()
+
+
 @app.get("/test-db")
 def test_database():
     """
@@ -150,18 +261,26 @@ def test_database():
 
 
 @app.post("/finance-emission", response_model=FinanceEmissionResponse)
-def finance_emission(req: FinanceEmissionRequest) -> FinanceEmissionResponse:
+async def finance_emission(req: FinanceEmissionRequest) -> FinanceEmissionResponse:
     """
     Calculate financed emissions using PCAF methodology
     """
     try:
         logger.info(f"Calculating finance emission for formula: {req.formula_id}")
         
-        # Perform calculation using migrated engine (matches frontend CalculationEngine)
-        result = get_calculation_engine().calculate(
-            formula_id=req.formula_id,
-            inputs=req.inputs,
-            company_type=req.company_type,
+        def compute():
+            # Perform calculation using migrated engine (matches frontend CalculationEngine)
+            return get_calculation_engine().calculate(
+                formula_id=req.formula_id,
+                inputs=req.inputs,
+                company_type=req.company_type,
+            )
+
+        # Identical concurrent requests join one flight before taking a lane thread, so
+        # only the leader's computation runs in the interactive lane
+        result = await get_request_flights().run(
+            request_key("finance-emission", req.model_dump(mode="json")),
+            lambda: get_execution_lanes().run(1, compute),
         )
         
         # Wrap in response model (shape mirrors frontend CalculationResult)
@@ -182,7 +301,144 @@ def finance_emission(req: FinanceEmissionRequest) -> FinanceEmissionResponse:
         raise HTTPException(status_code=500, detail="Internal calculation error")
 
 
+@app.post("/finance-emission/batch", response_model=FinanceEmissionBatchResponse, responses=COLUMNAR_OPENAPI_RESPONSES)
+@in_lane(lambda req, **_: len(req.items))
+def finance_emission_batch(
+    req: FinanceEmissionBatchRequest,
+    request: Request,
+    organization_id: Optional[uuid.UUID] = Depends(get_optional_organization_id),
+) -> FinanceEmissionBatchResponse:
+    """
+    Calculate a batch of finance/facilitated emissions; large batches run across worker processes.
+    Send `Accept: application/vnd.apache.arrow.stream` or `application/vnd.apache.parquet`
+    for a columnar result (summary columns only, totals in the schema metadata).
+    """
+    output_format = negotiate_format(request.headers.get("accept"))
+    if output_format != FORMAT_JSON:
+        require_pyarrow()
+
+    try:
+        logger.info(f"Calculating finance emission batch of {len(req.items)} items")
+
+        if not req.items:
+            raise ValueError("Batch items cannot be empty")
+        # Items with a counterparty_id get the stored financials of the caller's organization
+        # (one lookup per counterparty/year)
+        resolve_counterparty_items(req.items, organization_id)
+
+        if output_format != FORMAT_JSON:
+            columns = get_batch_executor().calculate_batch_columns(req.items, req.waterfall)
+            summary = summarize_batch_columns(columns)
+            logger.info(f"Finance emission batch completed ({output_format}): {summary['succeeded']} succeeded, {summary['failed']} failed")
+            return columnar_response(batch_result_table(columns, summary), output_format, "finance-emission-batch")
+
+        if req.include_results:
+            results = get_batch_executor().calculate_batch(req.items, req.waterfall)
+            payload = summarize_batch_results(results)
+            payload["results"] = results
+            if req.top_k:
+                payload["top_contributors"] = top_batch_results(results, req.top_k)
+        else:
+            # Totals from the cheap summary columns; only the top K items are built in full
+            payload = get_batch_executor().calculate_batch_summary(req.items, top_k=req.top_k, waterfall=req.waterfall)
+            payload["results"] = []
+        payload["error"] = None
+
+        logger.info(f"Finance emission batch completed: {payload['succeeded']} succeeded, {payload['failed']} failed")
+        # Engine output is already response-shaped: skip response_model revalidation
+        return FastJSONResponse(payload)
+
+    except ValueError as e:
+        logger.error(f"Validation error in finance emission batch: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Internal error in finance emission batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal calculation error")
+
+
+def _dry_run_body(
+    body: bytes,
+    content_type: Optional[str],
+    waterfall: bool,
+    include_rows: bool,
+    max_rows: int,
+    organization_id: Optional[uuid.UUID],
+):
+    rows, body_waterfall = parse_batch_body(body, detect_body_format(content_type))
+    if not rows:
+        raise ValueError("Batch items cannot be empty")
+    return dry_run_batch(
+        get_calculation_engine(), rows, waterfall or body_waterfall, include_rows, max_rows, organization_id
+    )
+
+
+@app.post(
+    "/finance-emission/validate",
+    response_model=FinanceEmissionValidationResponse,
+    openapi_extra={"requestBody": {"content": {content_type: {} for content_type in BODY_CONTENT_TYPES}}},
+)
+async def validate_finance_emission_batch(
+    request: Request,
+    waterfall: bool = False,
+    include_rows: bool = True,
+    max_rows: int = Query(default=DEFAULT_MAX_REPORTED_ROWS, gt=0),
+    organization_id: Optional[uuid.UUID] = Depends(get_optional_organization_id),
+) -> FinanceEmissionValidationResponse:
+    """
+    Dry run: validate a batch (JSON, NDJSON or CSV body) without calculating or storing
+    anything. Returns bitmaps of invalid / warned items and the messages per item.
+    """
+    try:
+        body = await request.body()
+        payload = await get_execution_lanes().run(
+            len(body) / ADMISSION_BYTES_PER_COST_UNIT,
+            _dry_run_body, body, request.headers.get("content-type"), waterfall, include_rows, max_rows,
+            organization_id,
+        )
+        logger.info(f"Validated batch of {payload['total_items']} items: {payload['invalid']} invalid")
+        return FastJSONResponse(payload)
+
+    except UnsupportedBodyFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        logger.error(f"Validation error in batch dry run: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Internal error in batch dry run: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal validation error")
+
+
+@app.post("/finance-emission/option3", response_model=Option3EstimationResponse)
+@in_lane(lambda req, **_: len(req.companies))
+def finance_emission_option3(req: Option3EstimationRequest) -> Option3EstimationResponse:
+    """
+    Estimate financed emissions for companies without reported or activity data
+    (PCAF Option 3a/3b/3c) from sector emission intensities, column-wise over the batch.
+    """
+    try:
+        logger.info(f"Estimating Option 3 emissions for {len(req.companies)} companies")
+
+        if not req.companies:
+            raise ValueError("Companies cannot be empty")
+
+        payload = get_option3_estimator().estimate_payload(companies_to_columns(req.companies), req.include_results)
+
+        logger.info(f"Option 3 estimation completed: {payload['estimated']} estimated, {payload['not_estimated']} not estimated")
+        return FastJSONResponse(payload)
+
+    except SectorIntensitiesNotConfigured as e:
+        logger.error(f"Option 3 estimation unavailable: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        logger.error(f"Validation error in Option 3 estimation: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Internal error in Option 3 estimation: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal calculation error")
+
+
 @app.post("/facilitated-emission", response_model=FacilitatedEmissionResponse)
+@in_lane(lambda **_: 1)
 def facilitated_emission(req: FacilitatedEmissionRequest) -> FacilitatedEmissionResponse:
     """
     Calculate facilitated emissions using PCAF methodology
@@ -234,11 +490,17 @@ async def log_requests(request: Request, call_next):
     return response
 
 
-@app.post("/scenario/calculate", response_model=ScenarioResponse)
-def calculate_scenario(req: ScenarioRequest) -> ScenarioResponse:
+@app.post("/scenario/calculate", response_model=ScenarioResponse, responses=COLUMNAR_OPENAPI_RESPONSES)
+async def calculate_scenario(req: ScenarioRequest, request: Request) -> ScenarioResponse:
     """
-    Calculate climate stress testing scenarios using sector-specific multipliers
+    Calculate climate stress testing scenarios using sector-specific multipliers.
+    Send `Accept: application/vnd.apache.arrow.stream` or `application/vnd.apache.parquet`
+    for a columnar result (totals in the schema metadata).
     """
+    output_format = negotiate_format(request.headers.get("accept"))
+    if output_format != FORMAT_JSON:
+        require_pyarrow()
+
     try:
         logger.info(f"POST /scenario/calculate - Calculating {req.scenario_type} scenario for {len(req.portfolio_entries)} portfolio entries")
         
@@ -247,18 +509,58 @@ def calculate_scenario(req: ScenarioRequest) -> ScenarioResponse:
             logger.warning("POST /scenario/calculate - Empty portfolio entries received")
             raise ValueError("Portfolio entries cannot be empty")
         
-        # Perform scenario calculation
-        result = get_scenario_engine().calculate_scenario(
-            portfolio_entries=req.portfolio_entries,
-            scenario_type=req.scenario_type
+        def compute_columnar():
+            engine = get_scenario_engine()
+            columns = portfolio_entries_to_columns(req.portfolio_entries)
+            result_columns = engine.calculate_columns(columns, req.scenario_type)
+            summary = engine.summarize_columns(result_columns, req.scenario_type)
+            if req.group_by:
+                summary["groups"] = engine.group_totals(columns, result_columns, req.group_by, req.tenor_buckets)
+            if req.include_concentration or req.include_contributions:
+                # Per-row contribution shares are climate_adjusted_expected_loss / total in the table itself
+                summary["concentration"] = engine.concentration_from_columns(columns, result_columns)
+            if req.include_capital:
+                summary["capital"] = engine.capital_from_columns(columns, result_columns)
+            if req.include_ecl:
+                summary["ecl"] = engine.ecl_from_columns(columns, result_columns, req.ecl_sicr_threshold, req.ecl_discount_rate)
+            return scenario_result_table(result_columns, summary), summary
+
+        def compute_payload():
+            # Perform vectorized scenario calculation straight from columns
+            return get_scenario_engine().calculate_scenario_payload(
+                columns=portfolio_entries_to_columns(req.portfolio_entries),
+                scenario_type=req.scenario_type,
+                group_by=req.group_by,
+                tenor_buckets=req.tenor_buckets,
+                include_rows=req.include_rows,
+                top_k=req.top_k,
+                top_k_by=req.top_k_by,
+                include_concentration=req.include_concentration,
+                include_contributions=req.include_contributions,
+                include_capital=req.include_capital,
+                include_ecl=req.include_ecl,
+                ecl_sicr_threshold=req.ecl_sicr_threshold,
+                ecl_discount_rate=req.ecl_discount_rate
+            )
+
+        # Identical concurrent requests (double clicks, several tabs) join one flight before
+        # taking a lane thread: only the leader computes in the lane, followers await its
+        # result. The result table / payload is shared, each request builds its own Response.
+        # Hashing a large portfolio takes a while, so the key is built off the event loop.
+        key = await run_in_threadpool(
+            lambda: request_key(f"scenario-calculate:{output_format}", req.model_dump(mode="json"))
         )
-        
-        if not result.success:
-            logger.error(f"POST /scenario/calculate - Scenario calculation failed: {result.error}")
-            raise ValueError(result.error or "Scenario calculation failed")
-        
-        logger.info(f"POST /scenario/calculate - Success! Total loss increase: {result.total_loss_increase_percentage:.2f}%")
-        return result
+        cost = len(req.portfolio_entries)
+        if output_format != FORMAT_JSON:
+            table, summary = await get_request_flights().run(key, lambda: get_execution_lanes().run(cost, compute_columnar))
+            logger.info(f"POST /scenario/calculate - Success ({output_format})! Total loss increase: {summary['total_loss_increase_percentage']:.2f}%")
+            return await run_in_threadpool(columnar_response, table, output_format, f"scenario-{req.scenario_type}")
+
+        payload = await get_request_flights().run(key, lambda: get_execution_lanes().run(cost, compute_payload))
+
+        logger.info(f"POST /scenario/calculate - Success! Total loss increase: {payload['total_loss_increase_percentage']:.2f}%")
+        # Engine output is already response-shaped: skip response_model revalidation
+        return await run_in_threadpool(FastJSONResponse, payload)
         
     except ValueError as e:
         logger.error(f"POST /scenario/calculate - Validation error: {str(e)}")
@@ -268,5 +570,220 @@ def calculate_scenario(req: ScenarioRequest) -> ScenarioResponse:
         raise HTTPException(status_code=500, detail="Internal scenario calculation error")
 
 
+@app.post("/scenario/sensitivity", response_model=SensitivityResponse)
+@in_lane(lambda req, **_: len(req.portfolio_entries) * max(1, len(req.shocks) * len(req.parameters) + len(req.shock_matrix or [])))
+def calculate_scenario_sensitivity(req: SensitivityRequest) -> SensitivityResponse:
+    """
+    Total EL sensitivity to per-sector multiplier / lgd_change shocks (grid and
+    optional shock matrix) plus analytic gradients, in one call
+    """
+    try:
+        logger.info(f"POST /scenario/sensitivity - {req.scenario_type} scenario, {len(req.portfolio_entries)} entries, {len(req.shocks)} shocks")
+
+        if not req.portfolio_entries:
+            raise ValueError("Portfolio entries cannot be empty")
+
+        payload = get_scenario_engine().calculate_sensitivity(
+            columns=portfolio_entries_to_columns(req.portfolio_entries),
+            scenario_type=req.scenario_type,
+            shocks=req.shocks,
+            parameters=req.parameters,
+            shock_matrix=[row.model_dump() for row in req.shock_matrix] if req.shock_matrix else None,
+        )
+        logger.info(f"POST /scenario/sensitivity - Success! {len(payload['grid'])} grid points")
+        return FastJSONResponse(payload)
+
+    except ValueError as e:
+        logger.error(f"POST /scenario/sensitivity - Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"POST /scenario/sensitivity - Internal error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal scenario sensitivity error")
+
+
+@app.post("/scenario/reverse-stress", response_model=ReverseStressResponse)
+@in_lane(lambda req, **_: len(req.portfolio_entries))
+def calculate_reverse_stress(req: ReverseStressRequest) -> ReverseStressResponse:
+    """
+    Find the smallest uniform (or sector-weighted) scaling of the sector multipliers
+    that produces the target portfolio loss increase
+    """
+    try:
+        logger.info(f"POST /scenario/reverse-stress - {req.scenario_type} scenario, target +{req.target_loss_increase_percentage}% for {len(req.portfolio_entries)} entries")
+
+        if not req.portfolio_entries:
+            raise ValueError("Portfolio entries cannot be empty")
+
+        payload = get_scenario_engine().solve_reverse_stress(
+            columns=portfolio_entries_to_columns(req.portfolio_entries),
+            scenario_type=req.scenario_type,
+            target_loss_increase_percentage=req.target_loss_increase_percentage,
+            sector_weights=req.sector_weights,
+        )
+        logger.info(f"POST /scenario/reverse-stress - Success! Scale {payload['scale']:.6f} after {payload['iterations']} iterations")
+        return FastJSONResponse(payload)
+
+    except ValueError as e:
+        logger.error(f"POST /scenario/reverse-stress - Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"POST /scenario/reverse-stress - Internal error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal reverse stress error")
+
+
+def _get_session_or_404(session_id: str) -> ScenarioSession:
+    session = get_scenario_sessions().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Scenario session not found or expired")
+    return session
+
+
+@app.post("/scenario/sessions", response_model=ScenarioSessionResponse, status_code=201)
+@in_lane(lambda req, **_: len(req.portfolio_entries))
+def create_scenario_session(req: ScenarioRequest, include_results: bool = True) -> ScenarioSessionResponse:
+    """
+    Calculate a scenario and keep its per-exposure results on the server so later
+    edits can be sent as deltas (PATCH /scenario/sessions/{session_id})
+    """
+    try:
+        logger.info(f"POST /scenario/sessions - {req.scenario_type} scenario for {len(req.portfolio_entries)} entries")
+        session = get_scenario_sessions().create(get_scenario_engine(), req.scenario_type, req.portfolio_entries)
+        with session.lock:
+            payload = session.payload(session.rows() if include_results else [])
+        return FastJSONResponse(payload, status_code=201)
+
+    except ValueError as e:
+        logger.error(f"POST /scenario/sessions - Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"POST /scenario/sessions - Internal error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal scenario calculation error")
+
+
+@app.get("/scenario/sessions/{session_id}", response_model=ScenarioSessionResponse)
+def get_scenario_session(session_id: str, include_results: bool = False) -> ScenarioSessionResponse:
+    """Current totals (and optionally all rows) of a scenario session"""
+    session = _get_session_or_404(session_id)
+    with session.lock:
+        return FastJSONResponse(session.payload(session.rows() if include_results else []))
+
+
+@app.patch("/scenario/sessions/{session_id}", response_model=ScenarioSessionResponse)
+def update_scenario_session(session_id: str, delta: ScenarioSessionDelta) -> ScenarioSessionResponse:
+    """
+    Add/update/remove exposures; only the changed rows are recomputed.
+    Returns the new totals and the recomputed rows.
+    """
+    session = _get_session_or_404(session_id)
+    try:
+        with session.lock:
+            changed = session.apply_delta(delta.upsert, delta.remove, expected_version=delta.expected_version)
+            payload = session.payload(changed, removed=delta.remove)
+        logger.info(f"PATCH /scenario/sessions/{session_id} - v{payload['version']}: {len(delta.upsert)} upserted, {len(delta.remove)} removed")
+        return FastJSONResponse(payload)
+
+    except SessionVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        logger.error(f"PATCH /scenario/sessions/{session_id} - Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"PATCH /scenario/sessions/{session_id} - Internal error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal scenario calculation error")
+
+
+@app.delete("/scenario/sessions/{session_id}", status_code=204)
+def delete_scenario_session(session_id: str):
+    if not get_scenario_sessions().delete(session_id):
+        raise HTTPException(status_code=404, detail="Scenario session not found or expired")
+
+
+def _upload_cost(file: UploadFile) -> float:
+    """Estimated rows of an uploaded exposure file (unknown sizes go to the bulk lane)"""
+    return file.size / ADMISSION_BYTES_PER_COST_UNIT if file.size is not None else float("inf")
+
+
+def _ingest_upload(file: UploadFile) -> PortfolioIngestResult:
+    """Parse an uploaded CSV/Parquet exposure file (already spooled to disk by Starlette)"""
+    head = file.file.read(len(PARQUET_MAGIC))
+    file.file.seek(0)
+    file_format = detect_file_format(file.filename, head)
+    if file_format == FILE_FORMAT_PARQUET and portfolio_ingest.pq is None:
+        raise HTTPException(status_code=415, detail="Parquet upload requires pyarrow on the server; upload CSV instead")
+    return read_portfolio_stream(file.file, file_format)
+
+
+@app.post("/portfolio/ingest", response_model=PortfolioIngestReport)
+@in_lane(lambda file, **_: _upload_cost(file))
+def ingest_portfolio(file: UploadFile = File(...)) -> PortfolioIngestReport:
+    """
+    Validate a CSV/Parquet exposure file; returns row counts and per-line validation errors
+    """
+    try:
+        logger.info(f"POST /portfolio/ingest - Ingesting {file.filename}")
+        report = _ingest_upload(file).report()
+        logger.info(f"POST /portfolio/ingest - {report['rows_accepted']} of {report['rows_read']} rows accepted")
+        return FastJSONResponse(report)
+
+    except ValueError as e:
+        logger.error(f"POST /portfolio/ingest - Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"POST /portfolio/ingest - Internal error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal portfolio ingestion error")
+
+
+@app.post("/scenario/calculate-file", response_model=ScenarioFileResponse, responses=COLUMNAR_OPENAPI_RESPONSES)
+@in_lane(lambda file, **_: _upload_cost(file))
+def calculate_scenario_file(
+    request: Request,
+    file: UploadFile = File(...),
+    scenario_type: Literal["transition", "physical", "combined"] = Form(...),
+    skip_invalid_rows: bool = Form(False),
+) -> ScenarioFileResponse:
+    """
+    Run a scenario on an uploaded CSV/Parquet exposure file.
+    Any invalid row fails the request with 422 and the ingest report, unless
+    skip_invalid_rows is set, in which case only the valid rows are calculated.
+    Supports the same Arrow/Parquet Accept negotiation as /scenario/calculate.
+    """
+    output_format = negotiate_format(request.headers.get("accept"))
+    if output_format != FORMAT_JSON:
+        require_pyarrow()
+
+    try:
+        logger.info(f"POST /scenario/calculate-file - Calculating {scenario_type} scenario for {file.filename}")
+        ingested = _ingest_upload(file)
+        report = ingested.report()
+
+        if report["error_count"] and not skip_invalid_rows:
+            raise HTTPException(status_code=422, detail=report)
+        if not report["rows_accepted"]:
+            raise ValueError("File contains no valid portfolio rows")
+
+        engine = get_scenario_engine()
+        if output_format != FORMAT_JSON:
+            result_columns = engine.calculate_columns(ingested.columns, scenario_type)
+            summary = engine.summarize_columns(result_columns, scenario_type)
+            summary["ingest"] = {key: value for key, value in report.items() if key != "errors"}
+            return columnar_response(scenario_result_table(result_columns, summary), output_format, f"scenario-{scenario_type}")
+
+        payload = engine.calculate_scenario_payload(columns=ingested.columns, scenario_type=scenario_type)
+        payload["ingest"] = report
+        logger.info(f"POST /scenario/calculate-file - Success! {report['rows_accepted']} rows, total loss increase: {payload['total_loss_increase_percentage']:.2f}%")
+        return FastJSONResponse(payload)
+
+    except ValueError as e:
+        logger.error(f"POST /scenario/calculate-file - Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"POST /scenario/calculate-file - Internal error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal scenario calculation error")
+
+
 # Local dev entrypoint: uvicorn backend.fastapi_app.main:app --reload
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, conlist, confloat
+from pydantic import BaseModel, Field, conint, conlist, confloat
 from typing import List, Optional, Literal, Dict, Any
 
 
@@ -55,11 +55,28 @@ class PortfolioEntry(BaseModel):
     probability_of_default: float  # Baseline PD (%)
     loss_given_default: float  # Baseline LGD (%)
     tenor: int  # months
+    # Optional location (decimal degrees) for gridded physical hazard lookups
+    latitude: Optional[confloat(ge=-90, le=90)] = None
+    longitude: Optional[confloat(ge=-180, le=180)] = None
+
+
+ScenarioGroupBy = Literal["sector", "geography", "counterparty", "tenor_bucket"]
 
 
 class ScenarioRequest(BaseModel):
     scenario_type: Literal["transition", "physical", "combined"]
     portfolio_entries: List[PortfolioEntry]
+    group_by: List[ScenarioGroupBy] = Field(default_factory=list)  # server-side rollups
+    tenor_buckets: Optional[List[conint(gt=0)]] = None  # bucket edges in months, default 12/36/60/120
+    include_rows: bool = True  # False: totals and groups only
+    top_k: Optional[conint(gt=0)] = None  # also return the K largest rows by top_k_by
+    top_k_by: Literal["loss_increase", "loss_increase_percentage", "climate_adjusted_expected_loss"] = "loss_increase"
+    include_concentration: bool = False  # HHI, concentration curve and Gini in `concentration`
+    include_contributions: bool = False  # also per-exposure shares of total climate-adjusted EL
+    include_capital: bool = False  # Basel IRB capital / RWA before and after the scenario in `capital`
+    include_ecl: bool = False  # IFRS 9 staged ECL and stage migration in `ecl`
+    ecl_sicr_threshold: Optional[confloat(gt=0)] = None  # relative PD increase (%) for stage 2, default 100
+    ecl_discount_rate: Optional[confloat(ge=0)] = None  # annual %, default 5
 
 
 class ScenarioResult(BaseModel):
@@ -78,6 +95,79 @@ class ScenarioResult(BaseModel):
     loss_increase_percentage: float
 
 
+class ScenarioTopContributor(ScenarioResult):
+    index: int  # position in portfolio_entries
+    id: str
+
+
+class ConcentrationIndex(BaseModel):
+    group_count: int
+    exposure_hhi: float  # Herfindahl-Hirschman index of group exposure shares (0-1)
+    expected_loss_hhi: float  # same, on climate-adjusted expected loss
+
+
+class ConcentrationCurvePoint(BaseModel):
+    population_share: float  # fraction of exposures, ranked by climate-adjusted EL (largest first)
+    expected_loss_share: float  # their share of total climate-adjusted EL
+    exposure_share: float  # their share of total exposure
+
+
+class ScenarioConcentration(BaseModel):
+    hhi: Dict[str, ConcentrationIndex]  # sector, counterparty, geography
+    gini: float  # of per-exposure climate-adjusted EL
+    curve: List[ConcentrationCurvePoint]
+    contribution_shares: Optional[List[float]] = None  # per exposure, in portfolio_entries order
+
+
+class CapitalImpact(BaseModel):
+    exposure: float
+    baseline_capital: float  # IRB capital requirement K × EAD with baseline PD / LGD
+    stressed_capital: float  # same with scenario-adjusted PD / LGD
+    capital_increase: float
+    capital_increase_percentage: float
+    baseline_risk_weighted_assets: float  # 12.5 × capital
+    stressed_risk_weighted_assets: float
+
+
+class SectorCapitalImpact(CapitalImpact):
+    key: str
+
+
+class ScenarioCapital(CapitalImpact):
+    sectors: List[SectorCapitalImpact]  # largest stressed capital first
+
+
+class EclImpact(BaseModel):
+    exposure: float
+    baseline_ecl: float
+    stressed_ecl: float
+    ecl_increase: float
+    ecl_increase_percentage: float
+
+
+class SectorEclImpact(EclImpact):
+    key: str
+
+
+class ScenarioEcl(EclImpact):
+    sicr_threshold: float  # %
+    discount_rate: float  # annual %
+    baseline_stage_counts: List[int]  # exposures in stages 1, 2, 3
+    stressed_stage_counts: List[int]
+    stage_migration: List[List[int]]  # [baseline stage - 1][stressed stage - 1] -> count
+    sectors: List[SectorEclImpact]  # largest stressed ECL first
+
+
+class ScenarioGroup(BaseModel):
+    key: str
+    count: int
+    exposure: float
+    baseline_expected_loss: float
+    climate_adjusted_expected_loss: float
+    loss_increase: float
+    loss_increase_percentage: float
+
+
 class ScenarioResponse(BaseModel):
     success: bool
     scenario_type: str
@@ -87,4 +177,154 @@ class ScenarioResponse(BaseModel):
     total_loss_increase: float
     total_loss_increase_percentage: float
     results: List[ScenarioResult]
-    error: Optional[str] = None
\ No newline at end of file
+    # Requested group_by rollups: dimension -> groups (largest climate-adjusted EL first;
+    # tenor buckets in bucket order)
+    groups: Optional[Dict[str, List[ScenarioGroup]]] = None
+    top_contributors: Optional[List[ScenarioTopContributor]] = None  # largest first
+    concentration: Optional[ScenarioConcentration] = None
+    capital: Optional[ScenarioCapital] = None
+    ecl: Optional[ScenarioEcl] = None
+    # Version of the geography x sector physical risk matrix applied (None: flat sector values)
+    physical_risk_matrix_version: Optional[str] = None
+    error: Optional[str] = None
+
+
+# Portfolio file ingestion (CSV / Parquet)
+class PortfolioIngestError(BaseModel):
+    line: int  # CSV: file line (header = 1); Parquet: data row (first = 1)
+    column: Optional[str] = None
+    message: str
+
+
+class PortfolioIngestReport(BaseModel):
+    file_format: Literal["csv", "parquet"]
+    rows_read: int
+    rows_accepted: int
+    rows_rejected: int
+    error_count: int
+    errors: List[PortfolioIngestError]  # first INGEST_MAX_REPORTED_ERRORS only
+    errors_truncated: bool
+    total_exposure: float
+
+
+class ScenarioFileResponse(ScenarioResponse):
+    ingest: PortfolioIngestReport
+
+
+# Scenario sensitivity
+SectorParameterName = Literal["transition_pd_multiplier", "physical_pd_multiplier", "lgd_change"]
+
+
+class ShockMatrixRow(BaseModel):
+    name: Optional[str] = None
+    # sector -> parameter -> relative shock in % (10 = parameter × 1.10)
+    shocks: Dict[str, Dict[SectorParameterName, confloat(ge=-100)]]
+
+
+class SensitivityRequest(BaseModel):
+    scenario_type: Literal["transition", "physical", "combined"]
+    portfolio_entries: List[PortfolioEntry]
+    shocks: List[confloat(ge=-100)] = Field(default_factory=lambda: [-10.0, -5.0, 5.0, 10.0])  # relative, %
+    parameters: List[SectorParameterName] = Field(
+        default_factory=lambda: ["transition_pd_multiplier", "physical_pd_multiplier", "lgd_change"]
+    )
+    shock_matrix: Optional[List[ShockMatrixRow]] = None
+
+
+class SectorSensitivity(BaseModel):
+    sector: str
+    exposure: float
+    baseline_expected_loss: float
+    climate_adjusted_expected_loss: float
+    transition_pd_multiplier: float
+    physical_pd_multiplier: float
+    lgd_change: float
+    gradient: Dict[str, float]  # ∂ total EL / ∂ parameter (per unit multiplier, per LGD percentage point)
+
+
+class SensitivityGridPoint(BaseModel):
+    sector: str
+    parameter: str
+    shock: float
+    total_climate_adjusted_expected_loss: float
+    change: float
+
+
+class ShockMatrixResult(BaseModel):
+    name: str
+    total_climate_adjusted_expected_loss: float
+    change: float
+
+
+class SensitivityResponse(BaseModel):
+    success: bool
+    scenario_type: str
+    total_exposure: float
+    total_baseline_expected_loss: float
+    total_climate_adjusted_expected_loss: float
+    sectors: List[SectorSensitivity]
+    grid: List[SensitivityGridPoint]
+    shock_matrix_results: List[ShockMatrixResult]
+    error: Optional[str] = None
+
+
+# Reverse stress testing
+class ReverseStressRequest(BaseModel):
+    scenario_type: Literal["transition", "physical", "combined"]
+    portfolio_entries: List[PortfolioEntry]
+    target_loss_increase_percentage: confloat(gt=0)  # EL increase over baseline, % (50 = +50%)
+    # Per-sector weights on the scale; unlisted sectors weigh 1.0, 0 keeps a sector at baseline
+    sector_weights: Optional[Dict[str, confloat(ge=0)]] = None
+
+
+class ReverseStressSector(BaseModel):
+    sector: str
+    weight: float
+    transition_pd_multiplier: float
+    physical_pd_multiplier: float
+    lgd_change: float
+    climate_adjusted_expected_loss: float
+
+
+class ReverseStressResponse(BaseModel):
+    success: bool
+    scenario_type: str
+    target_loss_increase_percentage: float
+    scale: float  # 0 = baseline, 1 = configured sector multipliers
+    achieved_loss_increase_percentage: float
+    total_exposure: float
+    total_baseline_expected_loss: float
+    total_climate_adjusted_expected_loss: float
+    configured_loss_increase_percentage: float
+    iterations: int
+    evaluations: int
+    sectors: List[ReverseStressSector]
+    error: Optional[str] = None
+
+
+# Scenario sessions (incremental recomputation)
+class ScenarioSessionDelta(BaseModel):
+    upsert: List[PortfolioEntry] = Field(default_factory=list)  # added or replaced, matched by id
+    remove: List[str] = Field(default_factory=list)  # exposure ids
+    expected_version: Optional[int] = None  # 409 if the session has moved on
+
+
+class ScenarioSessionRow(ScenarioResult):
+    id: str
+
+
+class ScenarioSessionResponse(BaseModel):
+    session_id: str
+    version: int
+    entry_count: int
+    success: bool
+    scenario_type: str
+    total_exposure: float
+    total_baseline_expected_loss: float
+    total_climate_adjusted_expected_loss: float
+    total_loss_increase: float
+    total_loss_increase_percentage: float
+    physical_risk_matrix_version: Optional[str] = None
+    results: List[ScenarioSessionRow]  # all rows on create / GET ?include_results, changed rows on PATCH
+    removed: List[str] = Field(default_factory=list)
+    error: Optional[str] = None
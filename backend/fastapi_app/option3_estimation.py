@@ -0,0 +1,242 @@
+"""
+PCAF Option 3 estimates: financed emissions from sector emission intensities.
+
+For counterparties without reported emissions (Options 1a/1b) or activity data
+(Options 2a/2b), emissions are estimated from an in-memory table of sector intensities
+(tCO2e per PKR million) loaded from the file in SECTOR_EMISSION_INTENSITIES_PATH:
+
+    {"version": "2025.1", "sectors": {"Cement": {"revenue": 16.1, "assets": 8.04}, ...}}
+
+There is no default path: the shipped data/sector_emission_intensities.json holds
+illustrative values (version "illustrative-2025.1") and is only used when configured
+explicitly. Without a table, estimation raises SectorIntensitiesNotConfigured (503).
+The version is returned with every estimate as intensities_version.
+
+Per company, the best available option is used:
+
+- 3a (data quality 4): attribution factor × revenue × revenue intensity, with the
+  attribution factor outstanding / EVIC (listed) or / (equity + debt) (private),
+  falling back to total assets (the company denominator plans of shared_formula_utils)
+- 3c (data quality 5): outstanding × asset turnover ratio × revenue intensity
+- 3b (data quality 5): outstanding × asset intensity
+
+The whole book is evaluated column-wise: sector intensities are gathered once per
+factorized sector and the options are chosen with boolean masks, so a 1M-row
+portfolio is estimated in one call.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .columnar import factorize
+from .finance_models import CompanyData, CompanyType
+from .shared_formula_utils import build_denominator_plan, select_denominator_columns
+
+logger = logging.getLogger(__name__)
+
+SECTOR_EMISSION_INTENSITIES_PATH = os.getenv("SECTOR_EMISSION_INTENSITIES_PATH")
+INTENSITY_SCALE = 1e6  # intensities are per PKR million
+
+# Option codes in order of preference, with their PCAF data quality scores
+OPTION3_CODES: Tuple[str, ...] = ("3a", "3c", "3b")
+OPTION3_DATA_QUALITY: Dict[str, int] = {"3a": 4, "3c": 5, "3b": 5}
+
+# Indexed by the `listed` column: unlisted (0), listed (1)
+COMPANY_DENOMINATOR_PLANS = (build_denominator_plan("unlisted"), build_denominator_plan("listed"))
+
+COMPANY_NUMERIC_COLUMNS: Tuple[str, ...] = (
+    "outstanding_amount", "evic", "total_equity", "total_debt", "revenue", "assets", "asset_turnover_ratio"
+)
+
+
+class SectorIntensitiesNotConfigured(RuntimeError):
+    """No sector emission intensity table is configured (or the configured file is missing)"""
+
+
+class SectorEmissionIntensities:
+    """Revenue- and asset-based emission intensities per sector"""
+
+    def __init__(self, version: str, sectors: Dict[str, Dict[str, float]]):
+        self.version = version
+        self._revenue: Dict[str, float] = {}
+        self._assets: Dict[str, float] = {}
+        for sector, row in sectors.items():
+            for basis, table in (("revenue", self._revenue), ("assets", self._assets)):
+                if basis not in row:
+                    continue
+                value = row[basis]
+                if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                    raise ValueError(f"Emission intensity for ('{sector}', '{basis}') must be a non-negative number")
+                table[sector] = float(value)
+
+    @classmethod
+    def from_file(cls, path: str) -> "SectorEmissionIntensities":
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        if "version" not in data or "sectors" not in data:
+            raise ValueError("Sector emission intensities need 'version' and 'sectors'")
+        return cls(str(data["version"]), data["sectors"])
+
+    def arrays(self, sectors: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(revenue, asset) intensities per tCO2e/PKR for the given sectors; NaN where unknown"""
+        revenue = np.array([self._revenue.get(sector, np.nan) for sector in sectors], dtype=np.float64)
+        assets = np.array([self._assets.get(sector, np.nan) for sector in sectors], dtype=np.float64)
+        return revenue / INTENSITY_SCALE, assets / INTENSITY_SCALE
+
+
+def load_sector_emission_intensities(path: Optional[str] = None) -> SectorEmissionIntensities:
+    path = path or SECTOR_EMISSION_INTENSITIES_PATH
+    if not path:
+        raise SectorIntensitiesNotConfigured(
+            "Option 3 estimates need sector emission intensities; set SECTOR_EMISSION_INTENSITIES_PATH"
+        )
+    if not os.path.exists(path):
+        raise SectorIntensitiesNotConfigured(f"Sector emission intensities {path} not found (SECTOR_EMISSION_INTENSITIES_PATH)")
+    try:
+        intensities = SectorEmissionIntensities.from_file(path)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid sector emission intensities {path}: {e}") from e
+    logger.info(f"Loaded sector emission intensities version {intensities.version} from {path}")
+    return intensities
+
+
+def companies_to_columns(companies: Sequence[CompanyData]) -> Dict[str, np.ndarray]:
+    """CompanyData objects in columnar form (missing numbers are NaN, missing sectors "")"""
+    count = len(companies)
+    columns: Dict[str, np.ndarray] = {
+        "listed": np.fromiter((company.type == CompanyType.LISTED for company in companies), dtype=bool, count=count),
+    }
+    sector = np.empty(count, dtype=object)
+    sector[:] = [company.sector or "" for company in companies]
+    columns["sector"] = sector
+    for name in COMPANY_NUMERIC_COLUMNS:
+        values = (getattr(company, name) for company in companies)
+        columns[name] = np.fromiter((np.nan if value is None else value for value in values), dtype=np.float64, count=count)
+    return columns
+
+
+class Option3Estimator:
+    """Vectorized PCAF Option 3 estimation over columnar company data"""
+
+    def __init__(self, intensities: Optional[SectorEmissionIntensities] = None):
+        self.intensities = intensities or load_sector_emission_intensities()
+
+    @staticmethod
+    def _positive(values: np.ndarray) -> np.ndarray:
+        return np.isfinite(values) & (values > 0)
+
+    def estimate_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Per company: `option` (index into OPTION3_CODES, -1 when nothing applies),
+        `attribution_factor` (3a only, else NaN), `emission_factor` (tCO2e per PKR
+        million of the basis used) and `financed_emissions` (0 when not estimated).
+        """
+        sector_codes, sector_names = factorize(columns["sector"])
+        revenue_intensity, asset_intensity = self.intensities.arrays(sector_names)
+        revenue_intensity = revenue_intensity[sector_codes]
+        asset_intensity = asset_intensity[sector_codes]
+
+        outstanding = columns["outstanding_amount"]
+        equity_plus_debt = np.nan_to_num(columns["total_equity"]) + np.nan_to_num(columns["total_debt"])
+        equity_plus_debt[np.isnan(columns["total_equity"]) & np.isnan(columns["total_debt"])] = np.nan
+        denominator = select_denominator_columns(
+            {"evic": columns["evic"], "total_equity_plus_debt": equity_plus_debt, "total_assets": columns["assets"]},
+            COMPANY_DENOMINATOR_PLANS,
+            columns["listed"].astype(np.int8),
+        )
+
+        has_outstanding = np.isfinite(outstanding) & (outstanding >= 0)
+        has_revenue_intensity = np.isfinite(revenue_intensity)
+        candidates = (
+            has_outstanding & has_revenue_intensity & self._positive(denominator)
+            & np.isfinite(columns["revenue"]) & (columns["revenue"] >= 0),
+            has_outstanding & has_revenue_intensity & self._positive(columns["asset_turnover_ratio"]),
+            has_outstanding & np.isfinite(asset_intensity),
+        )
+
+        option = np.full(len(outstanding), -1, dtype=np.int8)
+        # Fill from the least preferred option so better ones overwrite it
+        for code in range(len(OPTION3_CODES) - 1, -1, -1):
+            option[candidates[code]] = code
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            attribution_factor = np.where(option == 0, outstanding / denominator, np.nan)
+            financed_emissions = np.select(
+                [option == 0, option == 1, option == 2],
+                [
+                    attribution_factor * columns["revenue"] * revenue_intensity,
+                    outstanding * columns["asset_turnover_ratio"] * revenue_intensity,
+                    outstanding * asset_intensity,
+                ],
+                default=0.0,
+            )
+        emission_factor = np.select(
+            [option == 0, option == 1, option == 2],
+            [revenue_intensity, revenue_intensity, asset_intensity],
+            default=np.nan,
+        ) * INTENSITY_SCALE
+        return {
+            "option": option,
+            "attribution_factor": attribution_factor,
+            "emission_factor": emission_factor,
+            "financed_emissions": financed_emissions,
+        }
+
+    def estimate_payload(self, columns: Dict[str, np.ndarray], include_results: bool = True) -> Dict[str, Any]:
+        """Option3EstimationResponse-shaped dict (results in input order)"""
+        estimates = self.estimate_columns(columns)
+        option = estimates["option"]
+        financed_emissions = estimates["financed_emissions"]
+        estimated = option >= 0
+
+        data_quality = np.zeros(len(option), dtype=np.int64)
+        for code, option_code in enumerate(OPTION3_CODES):
+            data_quality[option == code] = OPTION3_DATA_QUALITY[option_code]
+        # PCAF score weighted by outstanding amount over the estimated companies
+        weights = np.where(estimated, columns["outstanding_amount"], 0.0)
+        weight_total = float(weights.sum())
+
+        counts = np.bincount(option[estimated], minlength=len(OPTION3_CODES)).tolist()
+        totals = np.bincount(option[estimated], weights=financed_emissions[estimated], minlength=len(OPTION3_CODES)).tolist()
+        return {
+            "success": True,
+            "total_items": len(option),
+            "estimated": int(estimated.sum()),
+            "not_estimated": int((~estimated).sum()),
+            "total_financed_emissions": float(financed_emissions.sum()),
+            "weighted_data_quality_score": (
+                float((weights * data_quality).sum() / weight_total) if weight_total > 0 else None
+            ),
+            "options": {
+                option_code: {"count": count, "financed_emissions": total}
+                for option_code, count, total in zip(OPTION3_CODES, counts, totals)
+            },
+            "intensities_version": self.intensities.version,
+            "results": self.result_rows(estimates, data_quality) if include_results else [],
+            "error": None,
+        }
+
+    @staticmethod
+    def result_rows(estimates: Dict[str, np.ndarray], data_quality: np.ndarray) -> List[Dict[str, Any]]:
+        codes = (None,) + OPTION3_CODES
+        rows = []
+        for index, (option, attribution_factor, emission_factor, financed_emissions, score) in enumerate(zip(
+            estimates["option"].tolist(),
+            estimates["attribution_factor"].tolist(),
+            estimates["emission_factor"].tolist(),
+            estimates["financed_emissions"].tolist(),
+            data_quality.tolist(),
+        )):
+            rows.append({
+                "index": index,
+                "option_code": codes[option + 1],
+                "data_quality_score": score or None,
+                "attribution_factor": None if attribution_factor != attribution_factor else attribution_factor,
+                "emission_factor": None if emission_factor != emission_factor else emission_factor,
+                "financed_emissions": financed_emissions,
+            })
+        return rows
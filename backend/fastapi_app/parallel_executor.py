@@ -0,0 +1,316 @@
+"""
+Multi-core execution for batch emission calculations.
+
+Large batches are sharded into chunks and evaluated across a ProcessPoolExecutor.
+Each worker process builds its CalculationEngine (and with it the formula registry)
+once in the pool initializer, so tasks only carry the items to calculate.
+
+Chunk size adapts to the measured per-item cost: every finished chunk reports how
+long it took, and the next chunks are sized so that one chunk takes roughly
+target_chunk_seconds. Results are written back by index, so the merged output is in
+input order regardless of completion order.
+
+The pool is shared by concurrent batches (the bulk execution lane runs several) and
+created under a lock. If a worker process dies (e.g. out of memory on a large chunk)
+the pool is broken for good: it is then discarded, and the batch is retried once on
+a fresh pool before the error propagates.
+
+Workers send results back as plain dicts (or, for calculate_batch_columns, as a few
+flat lists). Pickling and rebuilding pydantic models costs about as much as the
+calculation itself and would cap the speedup well below the core count.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import calculation_engine as calculation_engine_module
+from .calculation_engine import CalculationEngine
+from .columnar import top_k_indices
+from .finance_models import FinanceEmissionBatchItem, FinanceEmissionBatchResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv("BATCH_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+# Below this many items the pool start-up and pickling cost more than they save
+PARALLEL_MIN_ITEMS = int(os.getenv("BATCH_PARALLEL_MIN_ITEMS", "2000"))
+
+# Summary columns returned by calculate_batch_columns
+BATCH_RESULT_COLUMNS = (
+    "success",
+    "attribution_factor",
+    "emission_factor",
+    "financed_emissions",
+    "data_quality_score",
+    "error",
+)
+
+# Engine owned by the current worker process (set by _init_worker)
+_worker_engine: Optional[CalculationEngine] = None
+
+
+def batch_results_to_dicts(results: List[FinanceEmissionBatchResult]) -> List[Dict[str, Any]]:
+    return [result.model_dump() for result in results]
+
+
+def batch_results_to_columns(results: List[FinanceEmissionBatchResult]) -> Dict[str, List[Any]]:
+    """Flatten batch results into per-field lists (failed rows get 0 / None)"""
+    columns: Dict[str, List[Any]] = {name: [] for name in BATCH_RESULT_COLUMNS}
+    for item in results:
+        result = item.result
+        columns["success"].append(item.success)
+        columns["attribution_factor"].append(result.attribution_factor if result else 0.0)
+        columns["emission_factor"].append(result.emission_factor if result else 0.0)
+        columns["financed_emissions"].append(result.financed_emissions if result else 0.0)
+        columns["data_quality_score"].append(result.data_quality_score if result else 0)
+        columns["error"].append(item.error)
+    return columns
+
+
+def summarize_batch_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Success/failure counts and total financed emissions for batch result dicts"""
+    succeeded = sum(1 for item in results if item["success"])
+    return {
+        "success": True,
+        "total_items": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "total_financed_emissions": sum(
+            item["result"]["financed_emissions"] for item in results if item["success"]
+        ),
+    }
+
+
+def summarize_batch_columns(columns: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """summarize_batch_results for calculate_batch_columns output"""
+    succeeded = sum(1 for success in columns["success"] if success)
+    return {
+        "success": True,
+        "total_items": len(columns["success"]),
+        "succeeded": succeeded,
+        "failed": len(columns["success"]) - succeeded,
+        "total_financed_emissions": sum(columns["financed_emissions"]),
+    }
+
+
+def top_batch_results(results: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """The k successful batch result dicts with the largest financed emissions, largest first"""
+    financed = np.fromiter(
+        (item["result"]["financed_emissions"] if item["success"] else -np.inf for item in results),
+        dtype=np.float64,
+        count=len(results),
+    )
+    return [results[index] for index in top_k_indices(financed, k) if results[index]["success"]]
+
+
+def _init_worker(engine_log_level: int) -> None:
+    """Pool initializer: build the formula registry once per worker process"""
+    global _worker_engine
+    # Per-item INFO debug logging would dominate the cost of a batch
+    logging.getLogger(calculation_engine_module.__name__).setLevel(engine_log_level)
+    _worker_engine = CalculationEngine()
+
+
+def _run_chunk(
+    start: int,
+    items: List[FinanceEmissionBatchItem],
+    as_columns: bool,
+    waterfall: bool = False
+) -> Tuple[int, Any, float]:
+    """Evaluate one chunk in a worker; returns (start, results, elapsed seconds)"""
+    started = time.perf_counter()
+    results = _worker_engine.calculate_batch(items, start_index=start, waterfall=waterfall)
+    payload = batch_results_to_columns(results) if as_columns else batch_results_to_dicts(results)
+    return start, payload, time.perf_counter() - started
+
+
+class ParallelBatchExecutor:
+    """
+    Evaluates FinanceEmissionBatchItem lists across worker processes.
+    The pool is created lazily and reused across calls; call shutdown() to release it.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        target_chunk_seconds: float = 0.25,
+        initial_chunk_size: int = 256,
+        min_chunk_size: int = 64,
+        max_chunk_size: int = 50000,
+        min_parallel_items: int = PARALLEL_MIN_ITEMS,
+        engine_log_level: int = logging.WARNING,
+    ):
+        self.max_workers = max(1, max_workers or DEFAULT_MAX_WORKERS)
+        self.target_chunk_seconds = target_chunk_seconds
+        self.initial_chunk_size = initial_chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.min_parallel_items = min_parallel_items
+        self.engine_log_level = engine_log_level
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._serial_engine: Optional[CalculationEngine] = None
+        # Smoothed seconds per item, carried across calls so later batches start well-sized
+        self.seconds_per_item: Optional[float] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.engine_log_level,),
+                )
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a broken pool (unless another batch already replaced it) without waiting on it"""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def next_chunk_size(self) -> int:
+        """Chunk size that should take about target_chunk_seconds at the measured cost"""
+        if not self.seconds_per_item:
+            return self.initial_chunk_size
+        size = int(self.target_chunk_seconds / self.seconds_per_item)
+        return max(self.min_chunk_size, min(self.max_chunk_size, size))
+
+    def _record_cost(self, item_count: int, elapsed: float) -> None:
+        if item_count <= 0:
+            return
+        observed = elapsed / item_count
+        if self.seconds_per_item is None:
+            self.seconds_per_item = observed
+        else:
+            # Exponential moving average keeps one slow chunk from swinging the size
+            self.seconds_per_item = 0.7 * self.seconds_per_item + 0.3 * observed
+
+    def _run_serial(self, items: List[FinanceEmissionBatchItem], waterfall: bool = False) -> List[FinanceEmissionBatchResult]:
+        if self._serial_engine is None:
+            self._serial_engine = CalculationEngine()
+        return self._serial_engine.calculate_batch(items, waterfall=waterfall)
+
+    def _should_parallelize(self, items: List[FinanceEmissionBatchItem]) -> bool:
+        return self.max_workers > 1 and len(items) >= self.min_parallel_items
+
+    def _run_parallel(
+        self,
+        items: List[FinanceEmissionBatchItem],
+        as_columns: bool,
+        waterfall: bool = False
+    ) -> List[Tuple[int, Any]]:
+        """
+        Run all chunks on the pool; returns (start, payload) pairs sorted by start.
+        In waterfall mode each chunk groups its own items by input signature. A broken
+        pool is replaced and the batch retried once.
+        """
+        pool = self._get_pool()
+        try:
+            return self._run_chunks(pool, items, as_columns, waterfall)
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            logger.warning(f"Batch worker process died; retrying the {len(items)}-item batch on a fresh pool")
+        pool = self._get_pool()
+        try:
+            return self._run_chunks(pool, items, as_columns, waterfall)
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise
+
+    def _run_chunks(
+        self,
+        pool: ProcessPoolExecutor,
+        items: List[FinanceEmissionBatchItem],
+        as_columns: bool,
+        waterfall: bool
+    ) -> List[Tuple[int, Any]]:
+        chunks: List[Tuple[int, Any]] = []
+        in_flight: Dict[Future, int] = {}
+        next_start = 0
+        # Keep a couple of chunks queued per worker so no process idles between chunks
+        max_in_flight = self.max_workers * 2
+
+        while next_start < len(items) or in_flight:
+            while next_start < len(items) and len(in_flight) < max_in_flight:
+                stop = min(next_start + self.next_chunk_size(), len(items))
+                future = pool.submit(_run_chunk, next_start, items[next_start:stop], as_columns, waterfall)
+                in_flight[future] = stop - next_start
+                next_start = stop
+
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                item_count = in_flight.pop(future)
+                start, payload, elapsed = future.result()
+                chunks.append((start, payload))
+                self._record_cost(item_count, elapsed)
+
+        logger.info(
+            f"Parallel batch of {len(items)} items on {self.max_workers} workers "
+            f"(~{(self.seconds_per_item or 0) * 1e6:.1f} µs/item, chunk size {self.next_chunk_size()})"
+        )
+        chunks.sort(key=lambda chunk: chunk[0])
+        return chunks
+
+    def calculate_batch(self, items: List[FinanceEmissionBatchItem], waterfall: bool = False) -> List[Dict[str, Any]]:
+        """
+        Calculate all items; returns FinanceEmissionBatchResult-shaped dicts in input order
+        """
+        if not self._should_parallelize(items):
+            return batch_results_to_dicts(self._run_serial(items, waterfall))
+
+        return [
+            result for _, payload in self._run_parallel(items, as_columns=False, waterfall=waterfall) for result in payload
+        ]
+
+    def calculate_batch_summary(
+        self,
+        items: List[FinanceEmissionBatchItem],
+        top_k: Optional[int] = None,
+        waterfall: bool = False
+    ) -> Dict[str, Any]:
+        """
+        summarize_batch_results totals (plus `top_contributors` when top_k is set) computed
+        from the summary columns. Only the top K items are recalculated in full for the
+        response, so full results for every row are never built.
+        """
+        columns = self.calculate_batch_columns(items, waterfall)
+        summary = summarize_batch_columns(columns)
+        if top_k:
+            financed = np.asarray(columns["financed_emissions"], dtype=np.float64)
+            financed[~np.asarray(columns["success"], dtype=bool)] = -np.inf
+            indices = [index for index in top_k_indices(financed, top_k).tolist() if columns["success"][index]]
+            if self._serial_engine is None:
+                self._serial_engine = CalculationEngine()
+            summary["top_contributors"] = [
+                self._serial_engine.calculate_batch([items[index]], start_index=index, waterfall=waterfall)[0].model_dump()
+                for index in indices
+            ]
+        return summary
+
+    def calculate_batch_columns(self, items: List[FinanceEmissionBatchItem], waterfall: bool = False) -> Dict[str, List[Any]]:
+        """
+        Calculate all items and return only the summary columns (BATCH_RESULT_COLUMNS)
+        in input order. Much cheaper to ship back from workers than full results.
+        """
+        if not self._should_parallelize(items):
+            return batch_results_to_columns(self._run_serial(items, waterfall))
+
+        columns: Dict[str, List[Any]] = {name: [] for name in BATCH_RESULT_COLUMNS}
+        for _, payload in self._run_parallel(items, as_columns=True, waterfall=waterfall):
+            for name in BATCH_RESULT_COLUMNS:
+                columns[name].extend(payload[name])
+        return columns
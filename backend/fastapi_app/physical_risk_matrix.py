@@ -0,0 +1,137 @@
+"""
+Geography × sector physical risk multipliers for the scenario engine.
+
+The table is a versioned JSON file, used only when PHYSICAL_RISK_MATRIX_PATH names it
+explicitly (the shipped data/physical_risk_multipliers.json is not picked up by
+default, so deployments keep the flat sector values until they opt in). Scenario
+responses report the applied table as physical_risk_matrix_version:
+
+    {
+      "version": "2025.1",
+      "aliases": {"PK": "Pakistan", ...},
+      "regions": {"Pakistan": "South Asia", ...},
+      "multipliers": {
+        "Pakistan": {"Agriculture": 1.6, ...},
+        "South Asia": {"Agriculture": 1.5, ...},
+        "default": {...}
+      }
+    }
+
+Aliases (ISO codes, alternative spellings) are resolved to a geography first. A
+(geography, sector) pair then resolves to the first entry found for the geography, then
+its region, then "default"; pairs with no entry keep the sector's flat
+physical_pd_multiplier. Geography and region names match case-insensitively, sector
+names exactly (like ScenarioEngine.sector_multipliers).
+
+For evaluation the table is expanded into a dense (geographies × sectors) NumPy matrix
+over the factorized names of a portfolio, so the per-row multiplier is one gather.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PHYSICAL_RISK_MATRIX_PATH = os.getenv("PHYSICAL_RISK_MATRIX_PATH")
+DEFAULT_ROW = "default"
+
+
+def _normalize(name: str) -> str:
+    return name.strip().casefold()
+
+
+class PhysicalRiskMatrix:
+    """Physical PD multipliers per geography / region / default row and sector"""
+
+    def __init__(
+        self,
+        version: str,
+        multipliers: Dict[str, Dict[str, float]],
+        regions: Optional[Dict[str, str]] = None,
+        aliases: Optional[Dict[str, str]] = None
+    ):
+        self.version = version
+        self._rows: Dict[str, Dict[str, float]] = {}
+        for row_name, row in multipliers.items():
+            if not isinstance(row, dict):
+                raise ValueError(f"Physical risk matrix row '{row_name}' must map sectors to multipliers")
+            for sector, multiplier in row.items():
+                if not isinstance(multiplier, (int, float)) or isinstance(multiplier, bool) or multiplier < 0:
+                    raise ValueError(
+                        f"Physical risk multiplier for ('{row_name}', '{sector}') must be a non-negative number"
+                    )
+            self._rows[_normalize(row_name)] = {sector: float(multiplier) for sector, multiplier in row.items()}
+        self._regions: Dict[str, str] = {
+            _normalize(geography): _normalize(region) for geography, region in (regions or {}).items()
+        }
+        self._aliases: Dict[str, str] = {
+            _normalize(alias): _normalize(geography) for alias, geography in (aliases or {}).items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PhysicalRiskMatrix":
+        if "version" not in data or "multipliers" not in data:
+            raise ValueError("Physical risk matrix needs 'version' and 'multipliers'")
+        return cls(str(data["version"]), data["multipliers"], data.get("regions"), data.get("aliases"))
+
+    @classmethod
+    def from_file(cls, path: str) -> "PhysicalRiskMatrix":
+        with open(path, "r", encoding="utf-8") as handle:
+            return cls.from_dict(json.load(handle))
+
+    def _geography_key(self, geography: str) -> str:
+        key = _normalize(geography)
+        return self._aliases.get(key, key)
+
+    def lookup(self, geography: str, sector: str) -> Optional[float]:
+        """Multiplier for a pair via geography -> region -> default, or None"""
+        key = self._geography_key(geography)
+        for row_name in (key, self._regions.get(key), DEFAULT_ROW):
+            row = self._rows.get(row_name) if row_name else None
+            if row is not None and sector in row:
+                return row[sector]
+        return None
+
+    def dense(self, geographies: Sequence[str], sectors: Sequence[str], fallback: np.ndarray) -> np.ndarray:
+        """
+        (len(geographies), len(sectors)) float64 matrix of multipliers; fallback[j]
+        (the flat sector value) where a pair has no entry
+        """
+        sector_index = {sector: column for column, sector in enumerate(sectors)}
+        default = np.array(fallback, dtype=np.float64)
+        for sector, multiplier in self._rows.get(DEFAULT_ROW, {}).items():
+            if sector in sector_index:
+                default[sector_index[sector]] = multiplier
+
+        matrix = np.tile(default, (len(geographies), 1))
+        for row_index, geography in enumerate(geographies):
+            key = self._geography_key(geography)
+            # Region first, then the geography's own row overrides it
+            for row in (self._rows.get(self._regions.get(key, "")), self._rows.get(key)):
+                for sector, multiplier in (row or {}).items():
+                    column = sector_index.get(sector)
+                    if column is not None:
+                        matrix[row_index, column] = multiplier
+        return matrix
+
+
+def load_physical_risk_matrix(path: Optional[str] = None) -> Optional[PhysicalRiskMatrix]:
+    """
+    The configured matrix, or None when no path is configured (flat sector multipliers
+    only). A missing or malformed file raises ValueError.
+    """
+    path = path or PHYSICAL_RISK_MATRIX_PATH
+    if not path:
+        return None
+    if not os.path.exists(path):
+        raise ValueError(f"Physical risk matrix {path} not found (PHYSICAL_RISK_MATRIX_PATH)")
+    try:
+        matrix = PhysicalRiskMatrix.from_file(path)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid physical risk matrix {path}: {e}") from e
+    logger.info(f"Loaded physical risk matrix version {matrix.version} from {path}")
+    return matrix
@@ -0,0 +1,457 @@
+"""
+Bulk portfolio ingestion from CSV or Parquet exposure files.
+
+Files are read in batches straight into the columnar form used by ScenarioEngine
+(see columnar.py), never as PortfolioEntry objects:
+
+- CSV is streamed line by line with the stdlib csv module.
+- Parquet is memory-mapped and read one record batch at a time (needs pyarrow).
+
+Numeric columns accumulate as float64 chunks and repeated strings (sector,
+geography, counterparty, company) are interned, so a parsed portfolio takes a small
+multiple of its on-disk size. Every batch is validated column-wise; rows that fail
+are dropped and reported with their line number (CSV: physical line, header is
+line 1; Parquet: data row number, starting at 1).
+
+CLI:
+    python -m fastapi_app.portfolio_ingest exposures.csv --scenario combined --output results.parquet
+"""
+
+import argparse
+import codecs
+import csv
+import json
+import logging
+import os
+import sys
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .columnar import PORTFOLIO_LOCATION_COLUMNS, PORTFOLIO_NUMERIC_COLUMNS, PORTFOLIO_STRING_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional (too large for the serverless bundle)
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+FILE_FORMAT_CSV = "csv"
+FILE_FORMAT_PARQUET = "parquet"
+PARQUET_MAGIC = b"PAR1"
+
+INGEST_BATCH_ROWS = int(os.getenv("INGEST_BATCH_ROWS", "65536"))
+MAX_REPORTED_ERRORS = int(os.getenv("INGEST_MAX_REPORTED_ERRORS", "1000"))
+
+# Accepted header names per PortfolioEntry field (case-insensitive); the aliases
+# are the exposure/counterparty column names used by the portfolio tables
+COLUMN_ALIASES: Dict[str, Sequence[str]] = {
+    "id": ("id", "exposure_id"),
+    "company": ("company", "company_name", "counterparty_name", "name"),
+    "amount": ("amount", "amount_pkr", "exposure"),
+    "counterparty": ("counterparty", "counterparty_type"),
+    "sector": ("sector",),
+    "geography": ("geography",),
+    "probability_of_default": ("probability_of_default", "pd"),
+    "loss_given_default": ("loss_given_default", "lgd"),
+    "tenor": ("tenor", "tenor_months"),
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lon", "lng"),
+}
+REQUIRED_COLUMNS = ("amount", "sector", "probability_of_default", "loss_given_default")
+
+# Same fallbacks the frontend applies before calling /scenario/calculate;
+# a missing id becomes the line number, a missing tenor 0 and a missing location NaN
+STRING_DEFAULTS = {"company": "Unknown Company", "counterparty": "N/A", "geography": "N/A"}
+INTERNED_COLUMNS = ("company", "counterparty", "sector", "geography")
+
+# (min, max) per numeric column; PD and LGD are percentages
+NUMERIC_BOUNDS = {
+    "amount": (0.0, None),
+    "probability_of_default": (0.0, 100.0),
+    "loss_given_default": (0.0, 100.0),
+    "tenor": (0.0, None),
+    "latitude": (-90.0, 90.0),
+    "longitude": (-180.0, 180.0),
+}
+
+
+def detect_file_format(filename: Optional[str], head: bytes = b"") -> str:
+    """Parquet if the file starts with the Parquet magic or has a .parquet/.pq extension, else CSV"""
+    if head.startswith(PARQUET_MAGIC):
+        return FILE_FORMAT_PARQUET
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".parquet", ".pq"):
+        return FILE_FORMAT_PARQUET
+    return FILE_FORMAT_CSV
+
+
+def resolve_columns(header: Sequence[str]) -> Dict[str, int]:
+    """Map PortfolioEntry field -> position in `header`; raises ValueError if a required column is missing"""
+    positions = {name.strip().lower(): index for index, name in enumerate(header)}
+    resolved: Dict[str, int] = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                resolved[field] = positions[alias]
+                break
+
+    missing = [field for field in REQUIRED_COLUMNS if field not in resolved]
+    if missing:
+        raise ValueError(
+            f"Missing required column(s): {', '.join(missing)}. "
+            f"Accepted headers: {', '.join(COLUMN_ALIASES[field][0] for field in COLUMN_ALIASES)}"
+        )
+    return resolved
+
+
+def _parse_number(text: str) -> float:
+    """Parse a CSV number; tolerates surrounding spaces, thousands separators and a trailing %"""
+    text = text.strip().replace(",", "")
+    if text.endswith("%"):
+        text = text[:-1]
+    return float(text)
+
+
+class PortfolioIngestResult:
+    """
+    Accepted rows in columnar form plus the validation report.
+    Only the first max_reported_errors errors are kept; error_count counts all of them.
+    """
+
+    def __init__(self, file_format: str, max_reported_errors: int = MAX_REPORTED_ERRORS):
+        self.file_format = file_format
+        self.max_reported_errors = max_reported_errors
+        self.rows_read = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.columns: Dict[str, np.ndarray] = {}
+        self._numeric_chunks: Dict[str, List[np.ndarray]] = {name: [] for name in PORTFOLIO_NUMERIC_COLUMNS}
+        self._strings: Dict[str, List[str]] = {name: [] for name in PORTFOLIO_STRING_COLUMNS}
+        self._pools: Dict[str, Dict[str, str]] = {name: {} for name in INTERNED_COLUMNS}
+
+    @property
+    def rows_accepted(self) -> int:
+        return len(self.columns["amount"]) if self.columns else sum(len(c) for c in self._numeric_chunks["amount"])
+
+    def add_errors(self, errors: List[Dict[str, Any]]) -> None:
+        self.error_count += len(errors)
+        room = self.max_reported_errors - len(self.errors)
+        if room > 0:
+            self.errors.extend(sorted(errors, key=lambda error: error["line"])[:room])
+
+    def accept_batch(
+        self,
+        lines: np.ndarray,
+        strings: Dict[str, List[Any]],
+        numbers: Dict[str, np.ndarray],
+        invalid: np.ndarray,
+        errors: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Validate one batch column-wise and keep the valid rows.
+        `invalid` / `errors` carry problems already found while parsing (bad numbers, nulls).
+        """
+        for name, (lower, upper) in NUMERIC_BOUNDS.items():
+            values = numbers[name]
+            # Location cells may be empty (NaN); comparisons with NaN are False
+            not_finite = np.isinf(values) if name in PORTFOLIO_LOCATION_COLUMNS else ~np.isfinite(values)
+            checks = [(not_finite, "must be a finite number"), (values < lower, f"must be >= {lower:g}")]
+            if upper is not None:
+                checks.append((values > upper, f"must be <= {upper:g}"))
+            if name == "tenor":
+                checks.append((np.isfinite(values) & (values != np.floor(values)), "must be a whole number of months"))
+            for mask, message in checks:
+                # Cells rejected while parsing hold 0.0, which passes every check, so nothing is reported twice
+                for row in np.flatnonzero(mask):
+                    errors.append({"line": int(lines[row]), "column": name, "message": f"{name} {message} (got {float(values[row])!r})"})
+                invalid |= mask
+
+        half_located = np.isnan(numbers["latitude"]) != np.isnan(numbers["longitude"])
+        for row in np.flatnonzero(half_located):
+            errors.append({"line": int(lines[row]), "column": "latitude", "message": "latitude and longitude must be given together"})
+        invalid |= half_located
+
+        for row, sector in enumerate(strings["sector"]):
+            if not sector:
+                errors.append({"line": int(lines[row]), "column": "sector", "message": "sector is required"})
+                invalid[row] = True
+
+        self.add_errors(errors)
+        keep = np.flatnonzero(~invalid)
+        for name in PORTFOLIO_NUMERIC_COLUMNS:
+            self._numeric_chunks[name].append(numbers[name][keep])
+        for name in PORTFOLIO_STRING_COLUMNS:
+            values = strings[name]
+            pool = self._pools.get(name)
+            if pool is None:
+                self._strings[name].extend(values[row] for row in keep)
+            else:
+                self._strings[name].extend(pool.setdefault(values[row], values[row]) for row in keep)
+
+    def finish(self) -> "PortfolioIngestResult":
+        """Concatenate the accepted batches into the final columns"""
+        # Pop each column's parts as it is converted so only one column is ever held twice
+        for name in PORTFOLIO_NUMERIC_COLUMNS:
+            chunks = self._numeric_chunks.pop(name)
+            self.columns[name] = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.float64)
+        for name in PORTFOLIO_STRING_COLUMNS:
+            values = self._strings.pop(name)
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+            self.columns[name] = column
+        self._pools = {}
+        return self
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "file_format": self.file_format,
+            "rows_read": self.rows_read,
+            "rows_accepted": self.rows_accepted,
+            "rows_rejected": self.rows_read - self.rows_accepted,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "errors_truncated": self.error_count > len(self.errors),
+            "total_exposure": float(self.columns["amount"].sum()) if self.columns else 0.0,
+        }
+
+
+def read_portfolio_csv(
+    lines: Iterable[str],
+    batch_rows: int = INGEST_BATCH_ROWS,
+    max_reported_errors: int = MAX_REPORTED_ERRORS,
+) -> PortfolioIngestResult:
+    """Parse CSV text lines (first line is the header) into a PortfolioIngestResult"""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("File is empty")
+    positions = resolve_columns(header)
+    result = PortfolioIngestResult(FILE_FORMAT_CSV, max_reported_errors)
+
+    def new_batch():
+        return [], {name: [] for name in PORTFOLIO_STRING_COLUMNS}, {name: [] for name in PORTFOLIO_NUMERIC_COLUMNS}, [], []
+
+    def flush(batch_lines, strings, numbers, invalid, errors):
+        if batch_lines:
+            result.accept_batch(
+                np.array(batch_lines, dtype=np.int64),
+                strings,
+                {name: np.array(values, dtype=np.float64) for name, values in numbers.items()},
+                np.array(invalid, dtype=bool),
+                errors,
+            )
+
+    batch = new_batch()
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        line = reader.line_num
+        batch_lines, strings, numbers, invalid, errors = batch
+        result.rows_read += 1
+        row_invalid = False
+
+        for name in PORTFOLIO_STRING_COLUMNS:
+            position = positions.get(name)
+            value = row[position].strip() if position is not None and position < len(row) else ""
+            if not value:
+                value = str(line) if name == "id" else STRING_DEFAULTS.get(name, "")
+            strings[name].append(value)
+
+        for name in PORTFOLIO_NUMERIC_COLUMNS:
+            position = positions.get(name)
+            text = row[position] if position is not None and position < len(row) else ""
+            if not text.strip():
+                if name in REQUIRED_COLUMNS:
+                    errors.append({"line": line, "column": name, "message": f"{name} is required"})
+                    row_invalid = True
+                numbers[name].append(np.nan if name in PORTFOLIO_LOCATION_COLUMNS else 0.0)
+                continue
+            try:
+                numbers[name].append(_parse_number(text))
+            except ValueError:
+                errors.append({"line": line, "column": name, "message": f"{name} is not a number (got {text!r})"})
+                row_invalid = True
+                numbers[name].append(0.0)
+
+        batch_lines.append(line)
+        invalid.append(row_invalid)
+        if len(batch_lines) >= batch_rows:
+            flush(*batch)
+            batch = new_batch()
+
+    flush(*batch)
+    return result.finish()
+
+
+def _parquet_numbers(column: "pa.Array", name: str, first_line: int, errors: List[Dict[str, Any]]):
+    """float64 values and a rejected-row mask for one Parquet column of a batch"""
+    rejected = np.zeros(len(column), dtype=bool)
+    if pa.types.is_integer(column.type) or pa.types.is_floating(column.type) or pa.types.is_decimal(column.type):
+        values = column.cast(pa.float64()).to_numpy(zero_copy_only=False)
+        missing = column.is_null().to_numpy(zero_copy_only=False)
+    else:
+        # Numbers stored as strings: parse like CSV cells
+        values = np.zeros(len(column), dtype=np.float64)
+        missing = np.zeros(len(column), dtype=bool)
+        for row, text in enumerate(column.to_pylist()):
+            if text is None or not str(text).strip():
+                missing[row] = True
+                continue
+            try:
+                values[row] = _parse_number(str(text))
+            except ValueError:
+                errors.append({"line": first_line + row, "column": name, "message": f"{name} is not a number (got {text!r})"})
+                rejected[row] = True
+
+    if missing.any():
+        if name in REQUIRED_COLUMNS:
+            for row in np.flatnonzero(missing):
+                errors.append({"line": first_line + int(row), "column": name, "message": f"{name} is required"})
+            rejected |= missing
+        values = np.where(missing, np.nan if name in PORTFOLIO_LOCATION_COLUMNS else 0.0, values)
+    return values, rejected
+
+
+def read_portfolio_parquet(
+    source: Any,
+    batch_rows: int = INGEST_BATCH_ROWS,
+    max_reported_errors: int = MAX_REPORTED_ERRORS,
+) -> PortfolioIngestResult:
+    """Read a Parquet file (path, memory-mapped, or binary file object) batch by batch"""
+    if pq is None:
+        raise ValueError("Parquet ingestion requires pyarrow on the server; upload CSV instead")
+
+    parquet_file = pq.ParquetFile(source, memory_map=isinstance(source, str))
+    names = parquet_file.schema_arrow.names
+    positions = resolve_columns(names)
+    selected = sorted(set(positions.values()))
+    result = PortfolioIngestResult(FILE_FORMAT_PARQUET, max_reported_errors)
+
+    first_line = 1
+    for record_batch in parquet_file.iter_batches(batch_size=batch_rows, columns=[names[i] for i in selected]):
+        row_count = record_batch.num_rows
+        lines = np.arange(first_line, first_line + row_count, dtype=np.int64)
+        errors: List[Dict[str, Any]] = []
+        invalid = np.zeros(row_count, dtype=bool)
+
+        strings: Dict[str, List[Any]] = {}
+        for name in PORTFOLIO_STRING_COLUMNS:
+            position = positions.get(name)
+            values = (
+                record_batch.column(names[position]).cast(pa.string()).to_pylist()
+                if position is not None else [None] * row_count
+            )
+            default = STRING_DEFAULTS.get(name, "")
+            strings[name] = [
+                value.strip() if value and value.strip() else (str(first_line + row) if name == "id" else default)
+                for row, value in enumerate(values)
+            ]
+
+        numbers: Dict[str, np.ndarray] = {}
+        for name in PORTFOLIO_NUMERIC_COLUMNS:
+            position = positions.get(name)
+            if position is None:
+                numbers[name] = np.full(row_count, np.nan if name in PORTFOLIO_LOCATION_COLUMNS else 0.0)
+                continue
+            numbers[name], rejected = _parquet_numbers(record_batch.column(names[position]), name, first_line, errors)
+            invalid |= rejected
+
+        result.rows_read += row_count
+        result.accept_batch(lines, strings, numbers, invalid, errors)
+        first_line += row_count
+
+    return result.finish()
+
+
+def read_portfolio_stream(
+    stream: BinaryIO,
+    file_format: str,
+    max_reported_errors: int = MAX_REPORTED_ERRORS,
+) -> PortfolioIngestResult:
+    """Ingest from a binary file object (e.g. an upload); CSV is decoded as UTF-8 while streaming"""
+    if file_format == FILE_FORMAT_PARQUET:
+        return read_portfolio_parquet(stream, max_reported_errors=max_reported_errors)
+    return read_portfolio_csv(codecs.iterdecode(stream, "utf-8-sig"), max_reported_errors=max_reported_errors)
+
+
+def read_portfolio_file(
+    path: str,
+    file_format: Optional[str] = None,
+    max_reported_errors: int = MAX_REPORTED_ERRORS,
+) -> PortfolioIngestResult:
+    """Ingest a CSV or Parquet file from disk (Parquet is memory-mapped)"""
+    if file_format is None:
+        with open(path, "rb") as handle:
+            file_format = detect_file_format(path, handle.read(len(PARQUET_MAGIC)))
+
+    if file_format == FILE_FORMAT_PARQUET:
+        return read_portfolio_parquet(path, max_reported_errors=max_reported_errors)
+    with open(path, "r", encoding="utf-8-sig", newline="") as handle:
+        return read_portfolio_csv(handle, max_reported_errors=max_reported_errors)
+
+
+# ==============================
+# CLI
+# ==============================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validate a CSV/Parquet exposure file and optionally run a scenario on it")
+    parser.add_argument("path", help="CSV or Parquet file with one exposure per row")
+    parser.add_argument("--format", choices=[FILE_FORMAT_CSV, FILE_FORMAT_PARQUET], default=None,
+                        help="File format (default: detected from the file)")
+    parser.add_argument("--scenario", choices=["transition", "physical", "combined"], default=None,
+                        help="Run this scenario on the accepted rows")
+    parser.add_argument("--output", default=None,
+                        help="Write scenario results to .parquet, .arrows or .json (requires --scenario)")
+    parser.add_argument("--max-errors", type=int, default=20, help="Validation errors to print")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        result = read_portfolio_file(args.path, args.format, max_reported_errors=args.max_errors)
+    except (OSError, ValueError) as e:
+        parser.exit(2, f"error: {e}\n")
+
+    report = result.report()
+    print(json.dumps({key: value for key, value in report.items() if key != "errors"}, indent=2))
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['message']}")
+    if report["errors_truncated"]:
+        print(f"... {report['error_count'] - len(report['errors'])} more errors")
+
+    if not args.scenario:
+        return
+    if not report["rows_accepted"]:
+        parser.exit(1, "error: no valid rows to run the scenario on\n")
+
+    from .columnar_formats import FORMAT_ARROW, FORMAT_PARQUET, encode_table, scenario_result_table
+    from .fast_json import dumps
+    from .scenario_engine import ScenarioEngine
+
+    engine = ScenarioEngine()
+    result_columns = engine.calculate_columns(result.columns, args.scenario)
+    summary = engine.summarize_columns(result_columns, args.scenario)
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        extension = os.path.splitext(args.output)[1].lower()
+        if extension in (".parquet", ".pq", ".arrows", ".arrow") and pa is None:
+            parser.exit(2, "error: writing Arrow/Parquet output requires pyarrow\n")
+        if extension in (".parquet", ".pq"):
+            content = encode_table(scenario_result_table(result_columns, summary), FORMAT_PARQUET)
+        elif extension in (".arrows", ".arrow"):
+            content = encode_table(scenario_result_table(result_columns, summary), FORMAT_ARROW)
+        else:
+            content = dumps({**summary, "results": engine.result_rows(result_columns), "error": None})
+        with open(args.output, "wb") as handle:
+            handle.write(content)
+        print(f"Wrote {report['rows_accepted']} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
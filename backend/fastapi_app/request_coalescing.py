@@ -0,0 +1,142 @@
+"""
+Request coalescing (single flight) for identical in-flight calculations.
+
+Double clicks and several tabs loading the same portfolio send the same request more
+than once while the first is still computing. Endpoints run their computation through
+SingleFlight.run under a canonical request key (request_key: SHA-256 of the endpoint
+name and the validated request serialized with sorted keys), so concurrent identical
+requests wait for one computation and share its result, or its exception.
+
+SingleFlight is async: callers join the flight on the event loop before taking a
+worker thread, and followers await the leader's future without holding one. Only the
+leader's compute coroutine (typically ExecutionLanes.run) uses an execution lane, so
+a burst of identical requests cannot fill the interactive or bulk pool with waiters.
+
+Followers wait at most REQUEST_COALESCE_TIMEOUT_SECONDS for the flight they joined.
+After that they compute on their own, and the stuck flight no longer takes new
+followers. Results are only shared between requests that overlap in time; nothing is
+cached once a flight completes. Shared results must be treated as read-only.
+REQUEST_COALESCE_TIMEOUT_SECONDS=0 turns coalescing off.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+COALESCE_TIMEOUT_SECONDS = float(os.getenv("REQUEST_COALESCE_TIMEOUT_SECONDS", "30"))
+
+T = TypeVar("T")
+
+
+def request_key(scope: str, payload: Any) -> str:
+    """Canonical hash of a JSON-compatible payload (e.g. model_dump(mode="json")) under a scope"""
+    if orjson is not None:
+        encoded = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    else:
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(scope.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(encoded)
+    return digest.hexdigest()
+
+
+class _Flight:
+    """One in-flight computation and the outcome its followers wait for"""
+
+    __slots__ = ("future", "deadline", "followers")
+
+    def __init__(self, deadline: float):
+        # A concurrent Future, so followers on any event loop can await it (wrap_future)
+        self.future: Future = Future()
+        self.deadline = deadline
+        self.followers = 0
+
+
+class SingleFlight:
+    """Share one computation between concurrent callers with the same key (async)"""
+
+    def __init__(self, timeout_seconds: float = COALESCE_TIMEOUT_SECONDS):
+        self.timeout_seconds = timeout_seconds
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"leaders": 0, "followers": 0, "timeouts": 0}
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[T]], timeout_seconds: Optional[float] = None) -> T:
+        """
+        Await compute() once for all concurrent callers with this key. timeout_seconds
+        (default: the store's) bounds how long followers wait before computing themselves.
+        """
+        timeout_seconds = self.timeout_seconds if timeout_seconds is None else timeout_seconds
+        if timeout_seconds <= 0:
+            return await compute()
+
+        now = time.monotonic()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and flight.deadline <= now:
+                # Stuck past its deadline: later callers start a fresh flight
+                flight = None
+            if flight is None:
+                flight = _Flight(now + timeout_seconds)
+                self._flights[key] = flight
+                leader = True
+                self.stats["leaders"] += 1
+            else:
+                flight.followers += 1
+                leader = False
+                self.stats["followers"] += 1
+
+        if leader:
+            return await self._lead(key, flight, compute)
+
+        try:
+            # shield: a follower timing out must not cancel the shared future
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(flight.future)),
+                max(flight.deadline - time.monotonic(), 0.0),
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.stats["timeouts"] += 1
+            logger.warning(f"Coalesced request {key[:12]} timed out after {timeout_seconds}s; computing separately")
+        except asyncio.CancelledError:
+            if not flight.future.cancelled():
+                raise
+            # The leader was cancelled (e.g. its client disconnected): compute separately
+        return await compute()
+
+    async def _lead(self, key: str, flight: _Flight, compute: Callable[[], Awaitable[T]]) -> T:
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            raise
+        except BaseException as e:
+            flight.future.set_exception(e)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            if flight.followers:
+                logger.info(f"Coalesced request {key[:12]}: shared with {flight.followers} identical requests")
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
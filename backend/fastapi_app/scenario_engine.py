@@ -3,19 +3,65 @@ Scenario Building Calculation Engine
 Handles climate stress testing calculations using sector-specific multipliers
 """
 
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .columnar import column_length, factorize, portfolio_entries_to_columns, top_k_indices
 from .models import PortfolioEntry, ScenarioResult, ScenarioResponse
+from .hazard_rasters import HazardRasters, load_hazard_rasters
+from .ifrs9_ecl import (
+    IFRS9_DISCOUNT_RATE,
+    IFRS9_SICR_THRESHOLD,
+    STAGES,
+    allocate_stages,
+    staged_expected_credit_loss,
+)
+from .irb_capital import RWA_PER_CAPITAL, irb_capital_columns
+from .physical_risk_matrix import PhysicalRiskMatrix, load_physical_risk_matrix
+from .sector_partial_sums import SectorPartialSums
 import logging
 
 logger = logging.getLogger(__name__)
 
+SCENARIO_TYPES = ("transition", "physical", "combined")
+
+# Configurable per-sector parameters (keys of sector_multipliers entries)
+SECTOR_PARAMETER_NAMES: Tuple[str, ...] = ("transition_pd_multiplier", "physical_pd_multiplier", "lgd_change")
+
+# Reverse stress: scale values scanned per bracket pass, and the largest scale tried
+REVERSE_STRESS_SCAN_POINTS = 256
+REVERSE_STRESS_MAX_SCALE = 1000.0
+
+# group_by dimensions and the default tenor bucket edges (months)
+SCENARIO_GROUP_BY = ("sector", "geography", "counterparty", "tenor_bucket")
+DEFAULT_TENOR_BUCKETS: Tuple[int, ...] = (12, 36, 60, 120)
+
+# Dimensions reported in the concentration section (HHI) and the number of curve points
+CONCENTRATION_DIMENSIONS = ("sector", "counterparty", "geography")
+CONCENTRATION_CURVE_POINTS = 21
+
+# Result fields top_k can rank by
+SCENARIO_TOP_K_FIELDS = ("loss_increase", "loss_increase_percentage", "climate_adjusted_expected_loss")
+
+# Per-row output fields, in ScenarioResult order
+SCENARIO_RESULT_FIELDS: Tuple[str, ...] = tuple(ScenarioResult.model_fields)
+
 
 class ScenarioEngine:
     """
     Engine for calculating climate stress testing scenarios
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        physical_risk_matrix: Optional[PhysicalRiskMatrix] = None,
+        hazard_rasters: Optional[HazardRasters] = None
+    ):
+        # Geography × sector physical PD multipliers (None: flat per-sector values only;
+        # loaded only when PHYSICAL_RISK_MATRIX_PATH is set)
+        self.physical_risk_matrix = physical_risk_matrix or load_physical_risk_matrix()
+        # Gridded hazard scores for exposures with coordinates (None: no location factors)
+        self.hazard_rasters = hazard_rasters or load_hazard_rasters()
+
         # Sector-specific multipliers for transition and physical risks
         self.sector_multipliers = {
             "Power Generation – Fossil Fuel": {
@@ -343,6 +389,925 @@ class ScenarioEngine:
             "lgd_change": 0.0
         })
     
+    def sector_multiplier_arrays(self, sectors: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Configured transition_pd_multiplier, physical_pd_multiplier and lgd_change (%) per sector"""
+        multipliers = [self.get_sector_multipliers(sector) for sector in sectors]
+        return {
+            name: np.array([m[name] for m in multipliers], dtype=np.float64)
+            for name in SECTOR_PARAMETER_NAMES
+        }
+
+    def uses_geography(self, scenario_type: str) -> bool:
+        """Whether physical multipliers (and so results) depend on geography for this scenario"""
+        return self.physical_risk_matrix is not None and scenario_type != "transition"
+
+    def location_factors(self, columns: Dict[str, np.ndarray], scenario_type: str) -> Optional[np.ndarray]:
+        """
+        Per-row physical PD factor from the hazard rasters (1.0 for rows without
+        coordinates), or None when no row is affected
+        """
+        if self.hazard_rasters is None or scenario_type == "transition" or "latitude" not in columns:
+            return None
+        if not np.isfinite(columns["latitude"]).any():
+            return None
+        return self.hazard_rasters.location_factors(columns["latitude"], columns["longitude"])
+
+    def physical_multiplier_matrix(
+        self,
+        geographies: Sequence[str],
+        sectors: Sequence[str],
+        sector_physical: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Dense (geographies, sectors) physical_pd_multiplier matrix: the physical risk
+        matrix entry where there is one, else the sector's flat value
+        """
+        if sector_physical is None:
+            sector_physical = self.sector_multiplier_arrays(sectors)["physical_pd_multiplier"]
+        if self.physical_risk_matrix is None:
+            return np.tile(sector_physical, (len(geographies), 1))
+        return self.physical_risk_matrix.dense(geographies, sectors, sector_physical)
+
+    @staticmethod
+    def scenario_parameters(
+        transition: np.ndarray,
+        physical: np.ndarray,
+        lgd_change: np.ndarray,
+        scenario_type: str
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Effective (pd_multiplier, transition_lgd_shift, physical_lgd_shift) for a scenario
+        from the configured multipliers; LGD shifts are decimals
+        """
+        if scenario_type not in SCENARIO_TYPES:
+            raise ValueError(f"Invalid scenario type: {scenario_type}")
+
+        lgd_shift = lgd_change / 100.0
+        no_shift = np.zeros_like(lgd_shift)
+
+        if scenario_type == "transition":
+            # PD_T = PD₀ × m_T, LGD_T = LGD₀ + ΔLGD_T
+            return transition, lgd_shift, no_shift
+        if scenario_type == "physical":
+            # PD_P = PD₀ × m_P, LGD_P = LGD₀ + ΔLGD_P
+            return physical, no_shift, lgd_shift
+        # PD_C = PD₀ × m_T × m_P, LGD_C = LGD₀ + ΔLGD_T + ΔLGD_P
+        return transition * physical, lgd_shift, lgd_shift
+
+    def sector_parameters(
+        self,
+        sectors: Sequence[str],
+        scenario_type: str,
+        geographies: Optional[Sequence[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Per-sector scenario parameters as arrays aligned with `sectors`:
+        pd_multiplier, transition_lgd_shift and physical_lgd_shift (decimals)
+        and lgd_change (the configured percentage, reported per row).
+        With `geographies`, pd_multiplier is a (geographies, sectors) matrix built
+        from the physical risk matrix (unless the scenario is transition-only).
+        """
+        if scenario_type not in SCENARIO_TYPES:
+            raise ValueError(f"Invalid scenario type: {scenario_type}")
+
+        configured = self.sector_multiplier_arrays(sectors)
+        physical = configured["physical_pd_multiplier"]
+        if geographies is not None:
+            physical = self.physical_multiplier_matrix(geographies, sectors, physical)
+        pd_multiplier, transition_lgd_shift, physical_lgd_shift = self.scenario_parameters(
+            configured["transition_pd_multiplier"],
+            physical,
+            configured["lgd_change"],
+            scenario_type,
+        )
+        return {
+            "pd_multiplier": pd_multiplier,
+            "transition_lgd_shift": transition_lgd_shift,
+            "physical_lgd_shift": physical_lgd_shift,
+            "lgd_change": configured["lgd_change"],
+        }
+
+    def calculate_columns(self, columns: Dict[str, np.ndarray], scenario_type: str) -> Dict[str, np.ndarray]:
+        """
+        Vectorized scenario evaluation over a columnar portfolio (see columnar.py).
+
+        Returns one array per ScenarioResult field plus `sector_code` (index into
+        `sector_names`), so callers can aggregate by sector without re-factorizing.
+        When physical multipliers vary by geography, `geography_code` / `geography_names`
+        are returned too. Exposures with coordinates also get their hazard location
+        factor (see hazard_rasters.py) in pd_multiplier for physical / combined scenarios.
+        """
+        sector_codes, sector_names = factorize(columns["sector"])
+        extra_columns: Dict[str, np.ndarray] = {}
+        if self.uses_geography(scenario_type):
+            geography_codes, geography_names = factorize(columns["geography"])
+            parameters = self.sector_parameters(sector_names, scenario_type, geography_names)
+            extra_columns = {"geography_code": geography_codes, "geography_names": np.array(geography_names, dtype=object)}
+        else:
+            parameters = self.sector_parameters(sector_names, scenario_type)
+
+        amount = columns["amount"]
+        baseline_pd_decimal = columns["probability_of_default"] / 100.0
+        baseline_lgd_decimal = columns["loss_given_default"] / 100.0
+
+        # One gather per parameter: (geography ×) sector-level values broadcast to rows
+        if parameters["pd_multiplier"].ndim == 2:
+            pd_multiplier = parameters["pd_multiplier"][extra_columns["geography_code"], sector_codes]
+        else:
+            pd_multiplier = parameters["pd_multiplier"][sector_codes]
+        location_factors = self.location_factors(columns, scenario_type)
+        if location_factors is not None:
+            pd_multiplier = pd_multiplier * location_factors
+        adjusted_pd = baseline_pd_decimal * pd_multiplier
+        # LGD change is an absolute addition, capped at 100%
+        adjusted_lgd = np.minimum(
+            baseline_lgd_decimal
+            + parameters["transition_lgd_shift"][sector_codes]
+            + parameters["physical_lgd_shift"][sector_codes],
+            1.0,
+        )
+
+        baseline_expected_loss = amount * baseline_pd_decimal * baseline_lgd_decimal
+        climate_adjusted_expected_loss = amount * adjusted_pd * adjusted_lgd
+        loss_increase = climate_adjusted_expected_loss - baseline_expected_loss
+        loss_increase_percentage = np.zeros_like(loss_increase)
+        np.divide(loss_increase, baseline_expected_loss, out=loss_increase_percentage, where=baseline_expected_loss > 0)
+        loss_increase_percentage *= 100.0
+
+        return {
+            "company": columns["company"],
+            "sector": columns["sector"],
+            "exposure": amount,
+            "baseline_pd": columns["probability_of_default"],
+            "baseline_lgd": columns["loss_given_default"],
+            "pd_multiplier": pd_multiplier,
+            "adjusted_pd": adjusted_pd * 100.0,
+            "lgd_change": parameters["lgd_change"][sector_codes],
+            "adjusted_lgd": adjusted_lgd * 100.0,
+            "climate_adjusted_expected_loss": climate_adjusted_expected_loss,
+            "baseline_expected_loss": baseline_expected_loss,
+            "loss_increase": loss_increase,
+            "loss_increase_percentage": loss_increase_percentage,
+            "sector_code": sector_codes,
+            "sector_names": np.array(sector_names, dtype=object),
+            **extra_columns,
+        }
+
+    def summarize_columns(self, result_columns: Dict[str, np.ndarray], scenario_type: str) -> Dict[str, Any]:
+        """Portfolio totals (the scalar fields of ScenarioResponse) for calculate_columns output"""
+        return self.summarize_totals(
+            float(result_columns["exposure"].sum()),
+            float(result_columns["baseline_expected_loss"].sum()),
+            float(result_columns["climate_adjusted_expected_loss"].sum()),
+            scenario_type,
+        )
+
+    def summarize_totals(
+        self,
+        total_exposure: float,
+        total_baseline_expected_loss: float,
+        total_climate_adjusted_expected_loss: float,
+        scenario_type: str
+    ) -> Dict[str, Any]:
+        """Scalar ScenarioResponse fields from the three summed totals"""
+        total_loss_increase = total_climate_adjusted_expected_loss - total_baseline_expected_loss
+        total_loss_increase_percentage = (
+            (total_loss_increase / total_baseline_expected_loss * 100.0) if total_baseline_expected_loss > 0 else 0.0
+        )
+        return {
+            "success": True,
+            "scenario_type": scenario_type,
+            "total_exposure": total_exposure,
+            "total_baseline_expected_loss": total_baseline_expected_loss,
+            "total_climate_adjusted_expected_loss": total_climate_adjusted_expected_loss,
+            "total_loss_increase": total_loss_increase,
+            "total_loss_increase_percentage": total_loss_increase_percentage,
+            "physical_risk_matrix_version": (
+                self.physical_risk_matrix.version if self.uses_geography(scenario_type) else None
+            ),
+        }
+
+    @staticmethod
+    def tenor_bucket_labels(edges: Sequence[int]) -> List[str]:
+        """Labels for the buckets np.searchsorted(edges, tenor, side="right") assigns: "0-12", ..., "120+" """
+        bounds = [0] + list(edges)
+        return [f"{low}-{high}" for low, high in zip(bounds, bounds[1:])] + [f"{bounds[-1]}+"]
+
+    def _group_entry(self, key: str, count: int, exposure: float, baseline: float, adjusted: float) -> Dict[str, Any]:
+        loss_increase = adjusted - baseline
+        return {
+            "key": key,
+            "count": count,
+            "exposure": exposure,
+            "baseline_expected_loss": baseline,
+            "climate_adjusted_expected_loss": adjusted,
+            "loss_increase": loss_increase,
+            "loss_increase_percentage": (loss_increase / baseline * 100.0) if baseline > 0 else 0.0,
+        }
+
+    def _dimension_codes(
+        self,
+        columns: Dict[str, np.ndarray],
+        result_columns: Dict[str, np.ndarray],
+        dimension: str,
+        tenor_buckets: Optional[Sequence[int]] = None
+    ) -> Tuple[np.ndarray, List[str]]:
+        """
+        Integer group codes per row and the group labels for a group_by dimension.
+        Factorized string dimensions are kept in result_columns (`<dimension>_code` /
+        `<dimension>_names`, like sector) so groups and concentration share one pass.
+        """
+        if dimension == "tenor_bucket":
+            edges = sorted(set(tenor_buckets or DEFAULT_TENOR_BUCKETS))
+            codes = np.searchsorted(np.asarray(edges, dtype=np.float64), columns["tenor"], side="right")
+            return codes, self.tenor_bucket_labels(edges)
+        if dimension not in SCENARIO_GROUP_BY:
+            raise ValueError(f"Invalid group_by dimension: {dimension}")
+        if f"{dimension}_code" not in result_columns:
+            codes, labels = factorize(columns[dimension])
+            result_columns[f"{dimension}_code"] = codes
+            result_columns[f"{dimension}_names"] = np.array(labels, dtype=object)
+        return result_columns[f"{dimension}_code"], list(result_columns[f"{dimension}_names"])
+
+    def group_totals(
+        self,
+        columns: Dict[str, np.ndarray],
+        result_columns: Dict[str, np.ndarray],
+        group_by: Sequence[str],
+        tenor_buckets: Optional[Sequence[int]] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Rollups of calculate_columns output per requested dimension, using
+        np.bincount on factorized keys. Empty groups are left out; groups are ordered
+        by climate-adjusted EL (largest first), tenor buckets by bucket.
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for dimension in group_by:
+            codes, labels = self._dimension_codes(columns, result_columns, dimension, tenor_buckets)
+            size = len(labels)
+            counts = np.bincount(codes, minlength=size).tolist()
+            sums = [
+                np.bincount(codes, weights=result_columns[name], minlength=size).tolist()
+                for name in ("exposure", "baseline_expected_loss", "climate_adjusted_expected_loss")
+            ]
+            entries = [
+                self._group_entry(str(label), count, exposure, baseline, adjusted)
+                for label, count, exposure, baseline, adjusted in zip(labels, counts, *sums)
+                if count
+            ]
+            if dimension != "tenor_bucket":
+                entries.sort(key=lambda entry: entry["climate_adjusted_expected_loss"], reverse=True)
+            groups[dimension] = entries
+        return groups
+
+    def merge_groups(self, partial_groups: Sequence[Dict[str, List[Dict[str, Any]]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Combine group_totals of disjoint row chunks (e.g. job chunks) into portfolio rollups"""
+        merged: Dict[str, Dict[str, List[float]]] = {}
+        for groups in partial_groups:
+            for dimension, entries in groups.items():
+                totals = merged.setdefault(dimension, {})
+                for entry in entries:
+                    total = totals.setdefault(entry["key"], [0, 0.0, 0.0, 0.0])
+                    total[0] += entry["count"]
+                    total[1] += entry["exposure"]
+                    total[2] += entry["baseline_expected_loss"]
+                    total[3] += entry["climate_adjusted_expected_loss"]
+
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        for dimension, totals in merged.items():
+            entries = [self._group_entry(key, *total) for key, total in totals.items()]
+            if dimension == "tenor_bucket":
+                entries.sort(key=lambda entry: int(entry["key"].split("-")[0].rstrip("+")))
+            else:
+                entries.sort(key=lambda entry: entry["climate_adjusted_expected_loss"], reverse=True)
+            result[dimension] = entries
+        return result
+
+    def result_rows(self, result_columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """ScenarioResult-shaped dicts built straight from the result columns"""
+        values = [result_columns[name].tolist() for name in SCENARIO_RESULT_FIELDS]
+        return [dict(zip(SCENARIO_RESULT_FIELDS, row)) for row in zip(*values)]
+
+    def top_contributors(
+        self,
+        columns: Dict[str, np.ndarray],
+        result_columns: Dict[str, np.ndarray],
+        k: int,
+        by: str = "loss_increase"
+    ) -> List[Dict[str, Any]]:
+        """The k rows with the largest `by` value (largest first), with their input index and id"""
+        if by not in SCENARIO_TOP_K_FIELDS:
+            raise ValueError(f"Invalid top_k field: {by}")
+        indices = top_k_indices(result_columns[by], k)
+        selected = {name: result_columns[name][indices] for name in SCENARIO_RESULT_FIELDS}
+        return [
+            {"index": index, "id": entry_id, **row}
+            for index, entry_id, row in zip(indices.tolist(), columns["id"][indices].tolist(), self.result_rows(selected))
+        ]
+
+    @staticmethod
+    def herfindahl_index(totals: np.ndarray) -> float:
+        """Σ share² of non-negative group totals (1.0 = a single group holds everything)"""
+        total = float(totals.sum())
+        if total <= 0:
+            return 0.0
+        shares = totals / total
+        return float(np.dot(shares, shares))
+
+    def concentration_metrics(
+        self,
+        dimension_totals: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        expected_loss: np.ndarray,
+        exposure: np.ndarray,
+        include_contributions: bool = False
+    ) -> Dict[str, Any]:
+        """
+        ScenarioConcentration dict from per-group (exposure, climate-adjusted EL) totals
+        for each CONCENTRATION_DIMENSIONS entry and the per-row climate-adjusted EL / exposure.
+
+        The curve ranks rows by climate-adjusted EL, largest first, and gives the share of
+        total EL (and exposure) held by the top population_share of rows at
+        CONCENTRATION_CURVE_POINTS evenly spaced points; gini is computed from all rows.
+        Total EL is a plain sum over rows, so each row's marginal (Euler) contribution is
+        its own EL: contribution_shares is EL_i / total EL in input order.
+        """
+        hhi = {
+            dimension: {
+                "group_count": int(np.count_nonzero(group_exposure)),
+                "exposure_hhi": self.herfindahl_index(group_exposure),
+                "expected_loss_hhi": self.herfindahl_index(group_expected_loss),
+            }
+            for dimension, (group_exposure, group_expected_loss) in dimension_totals.items()
+        }
+
+        row_count = len(expected_loss)
+        total_expected_loss = float(expected_loss.sum())
+        total_exposure = float(exposure.sum())
+        order = np.argsort(-expected_loss)
+        # Leading zero: prefix k covers the k rows with the largest EL
+        cum_expected_loss = np.concatenate(([0.0], np.cumsum(expected_loss[order])))
+        cum_exposure = np.concatenate(([0.0], np.cumsum(exposure[order])))
+        counts = np.unique(np.rint(np.linspace(0.0, row_count, CONCENTRATION_CURVE_POINTS)).astype(np.intp))
+        curve = [
+            {
+                "population_share": count / row_count if row_count else 0.0,
+                "expected_loss_share": cum_expected_loss[count] / total_expected_loss if total_expected_loss > 0 else 0.0,
+                "exposure_share": cum_exposure[count] / total_exposure if total_exposure > 0 else 0.0,
+            }
+            for count in counts.tolist()
+        ]
+
+        gini = 0.0
+        if row_count and total_expected_loss > 0:
+            # Ascending ranks i = 1..n: G = Σ (2i - n - 1) x_i / (n Σ x)
+            ranks = np.arange(row_count, 0, -1, dtype=np.float64)
+            gini = float(np.dot(2.0 * ranks - row_count - 1.0, expected_loss[order]) / (row_count * total_expected_loss))
+
+        concentration: Dict[str, Any] = {"hhi": hhi, "gini": gini, "curve": curve}
+        if include_contributions:
+            concentration["contribution_shares"] = (
+                (expected_loss / total_expected_loss).tolist() if total_expected_loss > 0 else [0.0] * row_count
+            )
+        return concentration
+
+    def concentration_from_columns(
+        self,
+        columns: Dict[str, np.ndarray],
+        result_columns: Dict[str, np.ndarray],
+        include_contributions: bool = False
+    ) -> Dict[str, Any]:
+        """concentration_metrics for calculate_columns output (bincount per dimension)"""
+        dimension_totals = {}
+        for dimension in CONCENTRATION_DIMENSIONS:
+            codes, labels = self._dimension_codes(columns, result_columns, dimension)
+            dimension_totals[dimension] = tuple(
+                np.bincount(codes, weights=result_columns[name], minlength=len(labels))
+                for name in ("exposure", "climate_adjusted_expected_loss")
+            )
+        return self.concentration_metrics(
+            dimension_totals,
+            result_columns["climate_adjusted_expected_loss"],
+            result_columns["exposure"],
+            include_contributions,
+        )
+
+    def concentration_parts(self, columns: Dict[str, np.ndarray], result_columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """JSON-friendly concentration inputs of one row chunk, combined by merge_concentration"""
+        return {
+            "groups": self.group_totals(columns, result_columns, CONCENTRATION_DIMENSIONS),
+            "exposure": result_columns["exposure"].tolist(),
+            "climate_adjusted_expected_loss": result_columns["climate_adjusted_expected_loss"].tolist(),
+        }
+
+    def merge_concentration(self, parts: Sequence[Dict[str, Any]], include_contributions: bool = False) -> Dict[str, Any]:
+        """concentration_metrics for disjoint row chunks (in row order) from their concentration_parts"""
+        groups = self.merge_groups([part["groups"] for part in parts])
+        dimension_totals = {
+            dimension: (
+                np.array([entry["exposure"] for entry in groups.get(dimension, [])], dtype=np.float64),
+                np.array([entry["climate_adjusted_expected_loss"] for entry in groups.get(dimension, [])], dtype=np.float64),
+            )
+            for dimension in CONCENTRATION_DIMENSIONS
+        }
+        return self.concentration_metrics(
+            dimension_totals,
+            np.array([value for part in parts for value in part["climate_adjusted_expected_loss"]], dtype=np.float64),
+            np.array([value for part in parts for value in part["exposure"]], dtype=np.float64),
+            include_contributions,
+        )
+
+    @staticmethod
+    def _capital_entry(exposure: float, baseline: float, stressed: float) -> Dict[str, Any]:
+        capital_increase = stressed - baseline
+        return {
+            "exposure": exposure,
+            "baseline_capital": baseline,
+            "stressed_capital": stressed,
+            "capital_increase": capital_increase,
+            "capital_increase_percentage": (capital_increase / baseline * 100.0) if baseline > 0 else 0.0,
+            "baseline_risk_weighted_assets": RWA_PER_CAPITAL * baseline,
+            "stressed_risk_weighted_assets": RWA_PER_CAPITAL * stressed,
+        }
+
+    def _capital_section(self, sector_totals: Dict[str, List[float]]) -> Dict[str, Any]:
+        """Capital section from sector -> [exposure, baseline capital, stressed capital]"""
+        sectors = [{"key": key, **self._capital_entry(*totals)} for key, totals in sector_totals.items()]
+        sectors.sort(key=lambda entry: entry["stressed_capital"], reverse=True)
+        exposure, baseline, stressed = (sum(totals[i] for totals in sector_totals.values()) for i in range(3))
+        return {**self._capital_entry(exposure, baseline, stressed), "sectors": sectors}
+
+    def capital_from_columns(self, columns: Dict[str, np.ndarray], result_columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """
+        Basel IRB capital (K × EAD) and RWA with baseline and with scenario-adjusted PD / LGD,
+        maturity from tenor (see irb_capital.py): portfolio totals and per sector.
+        """
+        exposure = result_columns["exposure"]
+        tenor = columns["tenor"]
+        baseline = irb_capital_columns(
+            exposure, result_columns["baseline_pd"] / 100.0, result_columns["baseline_lgd"] / 100.0, tenor
+        )["capital"]
+        stressed = irb_capital_columns(
+            exposure, result_columns["adjusted_pd"] / 100.0, result_columns["adjusted_lgd"] / 100.0, tenor
+        )["capital"]
+        codes = result_columns["sector_code"]
+        size = len(result_columns["sector_names"])
+        sums = [np.bincount(codes, weights=values, minlength=size).tolist() for values in (exposure, baseline, stressed)]
+        return self._capital_section({
+            str(label): list(totals) for label, *totals in zip(result_columns["sector_names"], *sums)
+        })
+
+    def merge_capital(self, parts: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine capital_from_columns of disjoint row chunks (capital is additive per exposure)"""
+        sector_totals: Dict[str, List[float]] = {}
+        for part in parts:
+            for entry in part["sectors"]:
+                totals = sector_totals.setdefault(entry["key"], [0.0, 0.0, 0.0])
+                totals[0] += entry["exposure"]
+                totals[1] += entry["baseline_capital"]
+                totals[2] += entry["stressed_capital"]
+        return self._capital_section(sector_totals)
+
+    @staticmethod
+    def _ecl_entry(exposure: float, baseline: float, stressed: float) -> Dict[str, Any]:
+        ecl_increase = stressed - baseline
+        return {
+            "exposure": exposure,
+            "baseline_ecl": baseline,
+            "stressed_ecl": stressed,
+            "ecl_increase": ecl_increase,
+            "ecl_increase_percentage": (ecl_increase / baseline * 100.0) if baseline > 0 else 0.0,
+        }
+
+    def _ecl_section(
+        self,
+        sector_totals: Dict[str, List[float]],
+        migration: List[List[int]],
+        sicr_threshold: float,
+        discount_rate: float
+    ) -> Dict[str, Any]:
+        """ECL section from sector -> [exposure, baseline ECL, stressed ECL] and the 3 × 3 stage migration counts"""
+        sectors = [{"key": key, **self._ecl_entry(*totals)} for key, totals in sector_totals.items()]
+        sectors.sort(key=lambda entry: entry["stressed_ecl"], reverse=True)
+        exposure, baseline, stressed = (sum(totals[i] for totals in sector_totals.values()) for i in range(3))
+        return {
+            **self._ecl_entry(exposure, baseline, stressed),
+            "sicr_threshold": sicr_threshold,
+            "discount_rate": discount_rate,
+            "baseline_stage_counts": [sum(row) for row in migration],
+            "stressed_stage_counts": [sum(column) for column in zip(*migration)],
+            "stage_migration": migration,
+            "sectors": sectors,
+        }
+
+    def ecl_from_columns(
+        self,
+        columns: Dict[str, np.ndarray],
+        result_columns: Dict[str, np.ndarray],
+        sicr_threshold: Optional[float] = None,
+        discount_rate: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        IFRS 9 staged ECL (see ifrs9_ecl.py) with baseline and scenario-adjusted PD / LGD.
+        Baseline PD is the PD at recognition, so baseline exposures are in stage 1 (or 3
+        when defaulted) and the scenario moves them by its relative PD increase.
+        stage_migration[i][j] counts exposures going from stage i + 1 to stage j + 1.
+        """
+        sicr_threshold = IFRS9_SICR_THRESHOLD if sicr_threshold is None else sicr_threshold
+        discount_rate = IFRS9_DISCOUNT_RATE if discount_rate is None else discount_rate
+        exposure = result_columns["exposure"]
+        tenor = columns["tenor"]
+        baseline_pd = result_columns["baseline_pd"] / 100.0
+        adjusted_pd = result_columns["adjusted_pd"] / 100.0
+        baseline_stages = allocate_stages(baseline_pd, baseline_pd, sicr_threshold)
+        stressed_stages = allocate_stages(baseline_pd, adjusted_pd, sicr_threshold)
+        baseline = staged_expected_credit_loss(
+            exposure, baseline_pd, result_columns["baseline_lgd"] / 100.0, tenor, baseline_stages, discount_rate
+        )
+        stressed = staged_expected_credit_loss(
+            exposure, adjusted_pd, result_columns["adjusted_lgd"] / 100.0, tenor, stressed_stages, discount_rate
+        )
+
+        stage_count = len(STAGES)
+        migration = np.bincount(
+            (baseline_stages.astype(np.intp) - 1) * stage_count + stressed_stages - 1,
+            minlength=stage_count * stage_count,
+        ).reshape(stage_count, stage_count)
+        codes = result_columns["sector_code"]
+        size = len(result_columns["sector_names"])
+        sums = [np.bincount(codes, weights=values, minlength=size).tolist() for values in (exposure, baseline, stressed)]
+        return self._ecl_section(
+            {str(label): list(totals) for label, *totals in zip(result_columns["sector_names"], *sums)},
+            migration.tolist(),
+            sicr_threshold,
+            discount_rate,
+        )
+
+    def merge_ecl(self, parts: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine ecl_from_columns of disjoint row chunks (same threshold and discount rate)"""
+        sector_totals: Dict[str, List[float]] = {}
+        migration = [[0] * len(STAGES) for _ in STAGES]
+        for part in parts:
+            for entry in part["sectors"]:
+                totals = sector_totals.setdefault(entry["key"], [0.0, 0.0, 0.0])
+                totals[0] += entry["exposure"]
+                totals[1] += entry["baseline_ecl"]
+                totals[2] += entry["stressed_ecl"]
+            for row, counts in zip(migration, part["stage_migration"]):
+                for column, count in enumerate(counts):
+                    row[column] += count
+        return self._ecl_section(sector_totals, migration, parts[0]["sicr_threshold"], parts[0]["discount_rate"])
+
+    def calculate_scenario_payload(
+        self,
+        columns: Dict[str, np.ndarray],
+        scenario_type: str,
+        group_by: Sequence[str] = (),
+        tenor_buckets: Optional[Sequence[int]] = None,
+        include_rows: bool = True,
+        top_k: Optional[int] = None,
+        top_k_by: str = "loss_increase",
+        include_concentration: bool = False,
+        include_contributions: bool = False,
+        include_concentration_parts: bool = False,
+        include_capital: bool = False,
+        include_ecl: bool = False,
+        ecl_sicr_threshold: Optional[float] = None,
+        ecl_discount_rate: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        ScenarioResponse-shaped dict for a columnar portfolio, without building
+        pydantic objects. Used by the API fast response path; raises ValueError on bad input.
+        group_by adds server-side rollups (see group_totals); include_rows=False leaves
+        `results` empty so the response size depends on the number of groups only.
+        top_k adds the K largest rows by top_k_by (partial selection, no full sort).
+        include_concentration / include_contributions add the `concentration` section
+        (see concentration_metrics), computed from the same result columns; chunked jobs
+        ask for include_concentration_parts instead and merge them (merge_concentration).
+        include_capital adds IRB capital / RWA before and after the scenario (`capital`),
+        include_ecl IFRS 9 staged ECL and stage migration (`ecl`, see ecl_from_columns).
+        """
+        logger.info(f"Starting vectorized scenario calculation for {column_length(columns)} entries with scenario type: {scenario_type}")
+        result_columns = self.calculate_columns(columns, scenario_type)
+        payload = self.summarize_columns(result_columns, scenario_type)
+        payload["results"] = self.result_rows(result_columns) if include_rows else []
+        if group_by:
+            payload["groups"] = self.group_totals(columns, result_columns, group_by, tenor_buckets)
+        if top_k:
+            payload["top_contributors"] = self.top_contributors(columns, result_columns, top_k, top_k_by)
+        if include_concentration or include_contributions:
+            payload["concentration"] = self.concentration_from_columns(columns, result_columns, include_contributions)
+        if include_concentration_parts:
+            payload["concentration_parts"] = self.concentration_parts(columns, result_columns)
+        if include_capital:
+            payload["capital"] = self.capital_from_columns(columns, result_columns)
+        if include_ecl:
+            payload["ecl"] = self.ecl_from_columns(columns, result_columns, ecl_sicr_threshold, ecl_discount_rate)
+        payload["error"] = None
+        return payload
+
+    def partial_sums(self, columns: Dict[str, np.ndarray], scenario_type: str) -> SectorPartialSums:
+        """SectorPartialSums for a scenario: cells are (sector, geography) pairs when physical multipliers vary by geography"""
+        return SectorPartialSums(
+            columns,
+            by_geography=self.uses_geography(scenario_type),
+            row_factor=self.location_factors(columns, scenario_type),
+        )
+
+    def cell_multiplier_arrays(self, partial_sums: SectorPartialSums) -> Dict[str, np.ndarray]:
+        """Configured sector parameters per partial-sums cell (physical_pd_multiplier from the physical risk matrix)"""
+        configured = self.sector_multiplier_arrays(partial_sums.sector_names)
+        cells = {name: values[partial_sums.cell_sector] for name, values in configured.items()}
+        if partial_sums.by_geography:
+            matrix = self.physical_multiplier_matrix(
+                partial_sums.geography_names, partial_sums.sector_names, configured["physical_pd_multiplier"]
+            )
+            cells["physical_pd_multiplier"] = matrix[partial_sums.cell_geography, partial_sums.cell_sector]
+        return cells
+
+    def _sector_expected_loss(
+        self,
+        partial_sums: SectorPartialSums,
+        configured: Dict[str, np.ndarray],
+        scenario_type: str,
+        factor_scale: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (EL, Σ w·min(LGD, 1), uncapped weight) per cell for configured parameters shaped
+        (..., cells); factor_scale scales the location factors (see SectorPartialSums)
+        """
+        pd_multiplier, transition_lgd_shift, physical_lgd_shift = self.scenario_parameters(
+            configured["transition_pd_multiplier"],
+            configured["physical_pd_multiplier"],
+            configured["lgd_change"],
+            scenario_type,
+        )
+        lgd_sum, uncapped_weight = partial_sums.lgd_sums(transition_lgd_shift + physical_lgd_shift, factor_scale)
+        return pd_multiplier * lgd_sum, lgd_sum, uncapped_weight
+
+    def calculate_sensitivity(
+        self,
+        columns: Dict[str, np.ndarray],
+        scenario_type: str,
+        shocks: Sequence[float],
+        parameters: Sequence[str] = SECTOR_PARAMETER_NAMES,
+        shock_matrix: Optional[Sequence[Dict[str, Any]]] = None,
+        partial_sums: Optional[SectorPartialSums] = None
+    ) -> Dict[str, Any]:
+        """
+        Sensitivity of total climate-adjusted EL to shocks of each sector's configured
+        transition_pd_multiplier, physical_pd_multiplier and lgd_change.
+
+        Shocks are relative, in percent (10 = parameter × 1.10). The grid shocks one
+        (sector, parameter) at a time for every value in `shocks`; each shock_matrix row
+        ({"name": ..., "shocks": {sector: {parameter: shock}}}) shocks several at once.
+        Gradients are analytic: ∂EL/∂multiplier per unit and ∂EL/∂lgd_change per
+        percentage point, at the configured parameters.
+
+        Everything is evaluated from per-sector partial sums (pass
+        `partial_sums(columns, scenario_type)` to reuse them across calls), so the cost
+        does not grow with the number of shocks × rows. Where physical multipliers vary
+        by geography, a sector shock scales all of the sector's (sector, geography)
+        cells, and the reported physical_pd_multiplier is their exposure-weighted average.
+        """
+        for parameter in parameters:
+            if parameter not in SECTOR_PARAMETER_NAMES:
+                raise ValueError(f"Invalid sector parameter: {parameter}")
+
+        sums = partial_sums or self.partial_sums(columns, scenario_type)
+        sector_names = sums.sector_names
+        configured = self.cell_multiplier_arrays(sums)
+        cell_el, lgd_sum, uncapped_weight = self._sector_expected_loss(sums, configured, scenario_type)
+        sector_el = sums.sector_totals(cell_el)
+        total_el = float(sector_el.sum())
+
+        # ∂EL_s/∂m_T = ∂m/∂m_T × Σ w·min(LGD, 1); ∂EL_s/∂c = m × ∂Δ/∂c × Σ_uncapped w
+        transition = configured["transition_pd_multiplier"]
+        physical = configured["physical_pd_multiplier"]
+        if scenario_type == "transition":
+            dm_dtransition, dm_dphysical, dshift_dlgd_change = np.ones_like(physical), np.zeros_like(transition), 0.01
+            pd_multiplier = transition
+        elif scenario_type == "physical":
+            dm_dtransition, dm_dphysical, dshift_dlgd_change = np.zeros_like(physical), np.ones_like(transition), 0.01
+            pd_multiplier = physical
+        else:
+            dm_dtransition, dm_dphysical, dshift_dlgd_change = physical, transition, 0.02
+            pd_multiplier = transition * physical
+        # Per sector: the sum over its cells (a unit change of every cell's parameter)
+        gradients = {
+            "transition_pd_multiplier": sums.sector_totals(dm_dtransition * lgd_sum),
+            "physical_pd_multiplier": sums.sector_totals(dm_dphysical * lgd_sum),
+            "lgd_change": sums.sector_totals(pd_multiplier * dshift_dlgd_change * uncapped_weight),
+        }
+
+        sectors = [
+            {
+                "sector": name,
+                "exposure": exposure,
+                "baseline_expected_loss": baseline,
+                "climate_adjusted_expected_loss": el,
+                **{parameter: value for parameter, value in zip(SECTOR_PARAMETER_NAMES, values)},
+                "gradient": dict(zip(SECTOR_PARAMETER_NAMES, sector_gradients)),
+            }
+            for name, exposure, baseline, el, values, sector_gradients in zip(
+                sector_names,
+                sums.exposure.tolist(),
+                sums.baseline_expected_loss.tolist(),
+                sector_el.tolist(),
+                zip(*(sums.sector_average(configured[parameter]).tolist() for parameter in SECTOR_PARAMETER_NAMES)),
+                zip(*(gradients[parameter].tolist() for parameter in SECTOR_PARAMETER_NAMES)),
+            )
+        ]
+
+        # Grid: (shock, sector) planes per parameter; only the shocked sector's EL changes
+        shock_values = [float(shock) for shock in shocks]
+        factors = 1.0 + np.asarray(shock_values, dtype=np.float64)[:, None] / 100.0
+        grid: List[Dict[str, Any]] = []
+        for parameter in parameters:
+            shocked = {name: np.broadcast_to(values, factors.shape[:1] + values.shape) for name, values in configured.items()}
+            shocked[parameter] = configured[parameter] * factors
+            shocked_el, _, _ = self._sector_expected_loss(sums, shocked, scenario_type)
+            shocked_total = total_el - sector_el + sums.sector_totals(shocked_el)
+            for sector_index, name in enumerate(sector_names):
+                for shock, total in zip(shock_values, shocked_total[:, sector_index].tolist()):
+                    grid.append({
+                        "sector": name,
+                        "parameter": parameter,
+                        "shock": shock,
+                        "total_climate_adjusted_expected_loss": total,
+                        "change": total - total_el,
+                    })
+
+        matrix_results: List[Dict[str, Any]] = []
+        if shock_matrix:
+            sector_index = {name: index for index, name in enumerate(sector_names)}
+            shocked = {name: np.tile(values, (len(shock_matrix), 1)) for name, values in configured.items()}
+            for row_index, row in enumerate(shock_matrix):
+                for sector, sector_shocks in row["shocks"].items():
+                    if sector not in sector_index:
+                        raise ValueError(f"Shock matrix row {row_index}: sector '{sector}' is not in the portfolio")
+                    for parameter, shock in sector_shocks.items():
+                        if parameter not in SECTOR_PARAMETER_NAMES:
+                            raise ValueError(f"Shock matrix row {row_index}: invalid sector parameter '{parameter}'")
+                        shocked[parameter][row_index, sums.cell_sector == sector_index[sector]] *= 1.0 + shock / 100.0
+            shocked_el, _, _ = self._sector_expected_loss(sums, shocked, scenario_type)
+            for row_index, (row, total) in enumerate(zip(shock_matrix, shocked_el.sum(axis=1).tolist())):
+                matrix_results.append({
+                    "name": row.get("name") or f"shock_{row_index}",
+                    "total_climate_adjusted_expected_loss": total,
+                    "change": total - total_el,
+                })
+
+        total_baseline_expected_loss = float(sums.baseline_expected_loss.sum())
+        return {
+            "success": True,
+            "scenario_type": scenario_type,
+            "total_exposure": float(sums.exposure.sum()),
+            "total_baseline_expected_loss": total_baseline_expected_loss,
+            "total_climate_adjusted_expected_loss": total_el,
+            "sectors": sectors,
+            "grid": grid,
+            "shock_matrix_results": matrix_results,
+            "error": None,
+        }
+
+    def scaled_sector_parameters(
+        self,
+        configured: Dict[str, np.ndarray],
+        scale: np.ndarray,
+        sector_weights: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Configured parameters scaled towards / away from "no climate effect":
+        m(λ) = 1 + λ·w_s·(m − 1) (floored at 0) and lgd_change(λ) = λ·w_s·lgd_change.
+        λ = 0 is the baseline, λ = 1 (with unit weights) the configured scenario.
+        `scale` shaped (k,) gives parameters shaped (k, sectors) — or (k, cells) for
+        cell_multiplier_arrays parameters with per-cell weights.
+        """
+        sector_scale = np.asarray(scale, dtype=np.float64)[:, None] * sector_weights
+        return {
+            "transition_pd_multiplier": np.maximum(1.0 + sector_scale * (configured["transition_pd_multiplier"] - 1.0), 0.0),
+            "physical_pd_multiplier": np.maximum(1.0 + sector_scale * (configured["physical_pd_multiplier"] - 1.0), 0.0),
+            "lgd_change": sector_scale * configured["lgd_change"],
+        }
+
+    def solve_reverse_stress(
+        self,
+        columns: Dict[str, np.ndarray],
+        scenario_type: str,
+        target_loss_increase_percentage: float,
+        sector_weights: Optional[Dict[str, float]] = None,
+        tolerance: float = 1e-9,
+        max_scale: float = REVERSE_STRESS_MAX_SCALE,
+        partial_sums: Optional[SectorPartialSums] = None
+    ) -> Dict[str, Any]:
+        """
+        Reverse stress test: the smallest scale λ ≥ 0 of the sector multipliers
+        (see scaled_sector_parameters) at which the portfolio loss increase over
+        baseline EL reaches target_loss_increase_percentage.
+
+        sector_weights makes the scaling sector-weighted (unlisted sectors weigh 1.0,
+        0 keeps a sector at baseline). The first crossing is bracketed by scanning
+        REVERSE_STRESS_SCAN_POINTS scales at once, widening the range up to max_scale,
+        then refined by bisection. Every EL evaluation uses per-sector partial sums,
+        so an iteration costs O(sectors) whatever the number of exposures
+        (O(sector, geography cells) when physical multipliers vary by geography).
+        """
+        if target_loss_increase_percentage <= 0:
+            raise ValueError("Target loss increase percentage must be positive")
+
+        sums = partial_sums or self.partial_sums(columns, scenario_type)
+        sector_names = sums.sector_names
+        configured = self.cell_multiplier_arrays(sums)
+
+        sector_weights = sector_weights or {}
+        unknown = [sector for sector in sector_weights if sector not in set(sector_names)]
+        if unknown:
+            raise ValueError(f"Sector weights given for sectors not in the portfolio: {', '.join(unknown)}")
+        weights = np.array([sector_weights.get(name, 1.0) for name in sector_names], dtype=np.float64)
+        cell_weights = weights[sums.cell_sector]
+
+        total_baseline_expected_loss = float(sums.baseline_expected_loss.sum())
+        if total_baseline_expected_loss <= 0:
+            raise ValueError("Baseline expected loss is zero; a loss increase percentage is undefined")
+        target_el = total_baseline_expected_loss * (1.0 + target_loss_increase_percentage / 100.0)
+
+        def total_el(scales: np.ndarray) -> np.ndarray:
+            # Location factors scale with λ like the multipliers: f(λ) = 1 + λ·w_s·(f − 1)
+            sector_el, _, _ = self._sector_expected_loss(
+                sums,
+                self.scaled_sector_parameters(configured, scales, cell_weights),
+                scenario_type,
+                scales[:, None] * cell_weights,
+            )
+            return sector_el.sum(axis=-1)
+
+        evaluations = 0
+        upper = 1.0
+        while True:
+            scales = np.linspace(0.0, upper, REVERSE_STRESS_SCAN_POINTS + 1)
+            shortfall = total_el(scales) - target_el
+            evaluations += len(scales)
+            reached = np.flatnonzero(shortfall >= 0)
+            if reached.size:
+                break
+            if upper >= max_scale:
+                best = float(shortfall.max() + target_el)
+                raise ValueError(
+                    f"Target loss increase of {target_loss_increase_percentage}% is not reachable with scale up to "
+                    f"{max_scale:g} (highest reached: {(best / total_baseline_expected_loss - 1.0) * 100.0:.2f}%)"
+                )
+            upper = min(upper * 4.0, max_scale)
+
+        # shortfall[0] < 0 (scale 0 is the baseline), so the first crossing has a lower neighbour
+        first = int(reached[0])
+        low, high = float(scales[first - 1]), float(scales[first])
+        iterations = 0
+        while high - low > tolerance * max(high, 1.0) and iterations < 200:
+            middle = 0.5 * (low + high)
+            if total_el(np.array([middle]))[0] >= target_el:
+                high = middle
+            else:
+                low = middle
+            iterations += 1
+        evaluations += iterations
+
+        # Report at the upper end of the bracket, which is guaranteed to reach the target
+        solved = self.scaled_sector_parameters(configured, np.array([high]), cell_weights)
+        cell_el, _, _ = self._sector_expected_loss(sums, solved, scenario_type, high * cell_weights[None, :])
+        sector_el = sums.sector_totals(cell_el[0])
+        total = float(sector_el.sum())
+        configured_el, _, _ = self._sector_expected_loss(sums, configured, scenario_type)
+
+        return {
+            "success": True,
+            "scenario_type": scenario_type,
+            "target_loss_increase_percentage": target_loss_increase_percentage,
+            "scale": high,
+            "achieved_loss_increase_percentage": (total / total_baseline_expected_loss - 1.0) * 100.0,
+            "total_exposure": float(sums.exposure.sum()),
+            "total_baseline_expected_loss": total_baseline_expected_loss,
+            "total_climate_adjusted_expected_loss": total,
+            # The scenario as configured (λ = 1, unit weights), for comparison
+            "configured_loss_increase_percentage": (float(configured_el.sum()) / total_baseline_expected_loss - 1.0) * 100.0,
+            "iterations": iterations,
+            "evaluations": evaluations,
+            "sectors": [
+                {
+                    "sector": name,
+                    "weight": weight,
+                    **{parameter: value for parameter, value in zip(SECTOR_PARAMETER_NAMES, values)},
+                    "climate_adjusted_expected_loss": el,
+                }
+                for name, weight, values, el in zip(
+                    sector_names,
+                    weights.tolist(),
+                    zip(*(sums.sector_average(solved[parameter][0]).tolist() for parameter in SECTOR_PARAMETER_NAMES)),
+                    sector_el.tolist(),
+                )
+            ],
+            "error": None,
+        }
+
     def calculate_scenario(self, portfolio_entries: List[PortfolioEntry], scenario_type: str) -> ScenarioResponse:
         """
         Calculate climate stress testing scenario
@@ -370,97 +1335,12 @@ class ScenarioEngine:
         try:
             logger.info(f"Starting scenario calculation for {len(portfolio_entries)} entries with scenario type: {scenario_type}")
             
-            results = []
-            total_exposure = 0.0
-            total_baseline_expected_loss = 0.0
-            total_climate_adjusted_expected_loss = 0.0
-            
-            for i, entry in enumerate(portfolio_entries):
-                logger.debug(f"Processing entry {i+1}: {entry.company} (Sector: {entry.sector}, Amount: {entry.amount})")
-                # Get sector-specific multipliers
-                multipliers = self.get_sector_multipliers(entry.sector)
-                logger.debug(f"  Using multipliers for {entry.sector}: {multipliers}")
-                
-                # Calculate PD multiplier based on scenario type
-                if scenario_type == "transition":
-                    pd_multiplier = multipliers["transition_pd_multiplier"]
-                    # LGD_T = LGD₀ + ΔLGD_T (absolute addition)
-                    lgd_change_transition = multipliers["lgd_change"] / 100.0
-                    lgd_change_physical = 0.0
-                elif scenario_type == "physical":
-                    pd_multiplier = multipliers["physical_pd_multiplier"]
-                    # LGD_P = LGD₀ + ΔLGD_P (absolute addition)
-                    lgd_change_transition = 0.0
-                    lgd_change_physical = multipliers["lgd_change"] / 100.0
-                elif scenario_type == "combined":
-                    # PD_C = PD₀ × m_T × m_P
-                    pd_multiplier = multipliers["transition_pd_multiplier"] * multipliers["physical_pd_multiplier"]
-                    # LGD_C = LGD₀ + ΔLGD_T + ΔLGD_P (sum of both changes)
-                    lgd_change_transition = multipliers["lgd_change"] / 100.0
-                    lgd_change_physical = multipliers["lgd_change"] / 100.0
-                else:
-                    raise ValueError(f"Invalid scenario type: {scenario_type}")
-                
-                # Convert percentages to decimals
-                baseline_pd_decimal = entry.probability_of_default / 100.0
-                baseline_lgd_decimal = entry.loss_given_default / 100.0
-                
-                # Calculate adjusted values
-                # PD Multiplier is applied multiplicatively: PD = PD₀ × m
-                adjusted_pd = baseline_pd_decimal * pd_multiplier
-                
-                # LGD Change is applied as absolute addition (not percentage increase)
-                # Formula follows: LGD = LGD₀ + ΔLGD (for transition/physical)
-                # For combined: LGD_C = LGD₀ + ΔLGD_T + ΔLGD_P
-                adjusted_lgd = baseline_lgd_decimal + lgd_change_transition + lgd_change_physical
-                
-                # Ensure LGD doesn't exceed 100%
-                adjusted_lgd = min(adjusted_lgd, 1.0)
-                
-                # Calculate expected losses
-                baseline_expected_loss = entry.amount * baseline_pd_decimal * baseline_lgd_decimal
-                climate_adjusted_expected_loss = entry.amount * adjusted_pd * adjusted_lgd
-                
-                # Calculate increases
-                loss_increase = climate_adjusted_expected_loss - baseline_expected_loss
-                loss_increase_percentage = (loss_increase / baseline_expected_loss * 100.0) if baseline_expected_loss > 0 else 0.0
-                
-                # Create result
-                result = ScenarioResult(
-                    company=entry.company,
-                    sector=entry.sector,
-                    exposure=entry.amount,
-                    baseline_pd=entry.probability_of_default,
-                    baseline_lgd=entry.loss_given_default,
-                    pd_multiplier=pd_multiplier,
-                    adjusted_pd=adjusted_pd * 100.0,  # Convert back to percentage
-                    lgd_change=multipliers["lgd_change"],
-                    adjusted_lgd=adjusted_lgd * 100.0,  # Convert back to percentage
-                    climate_adjusted_expected_loss=climate_adjusted_expected_loss,
-                    baseline_expected_loss=baseline_expected_loss,
-                    loss_increase=loss_increase,
-                    loss_increase_percentage=loss_increase_percentage
-                )
-                
-                results.append(result)
-                
-                # Accumulate totals
-                total_exposure += entry.amount
-                total_baseline_expected_loss += baseline_expected_loss
-                total_climate_adjusted_expected_loss += climate_adjusted_expected_loss
-            
-            # Calculate total increases
-            total_loss_increase = total_climate_adjusted_expected_loss - total_baseline_expected_loss
-            total_loss_increase_percentage = (total_loss_increase / total_baseline_expected_loss * 100.0) if total_baseline_expected_loss > 0 else 0.0
+            columns = portfolio_entries_to_columns(portfolio_entries)
+            result_columns = self.calculate_columns(columns, scenario_type)
+            results = [ScenarioResult(**row) for row in self.result_rows(result_columns)]
             
             return ScenarioResponse(
-                success=True,
-                scenario_type=scenario_type,
-                total_exposure=total_exposure,
-                total_baseline_expected_loss=total_baseline_expected_loss,
-                total_climate_adjusted_expected_loss=total_climate_adjusted_expected_loss,
-                total_loss_increase=total_loss_increase,
-                total_loss_increase_percentage=total_loss_increase_percentage,
+                **self.summarize_columns(result_columns, scenario_type),
                 results=results
             )
             
@@ -0,0 +1,241 @@
+"""
+Stateful scenario sessions: incremental recomputation on exposure deltas.
+
+A session holds one portfolio for one scenario type. It keeps every exposure's
+ScenarioResult fields in columnar arrays plus running portfolio totals, under a version
+number. Add / update / remove deltas recompute only the changed rows and adjust
+the totals by the difference, so editing one exposure costs O(changed rows).
+To bound floating-point drift, the totals are re-summed exactly every
+SESSION_RESUM_INTERVAL changed rows.
+
+Sessions live in process memory (LRU-capped, idle sessions expire), so a
+multi-worker deployment needs sticky routing per session id. Losing a session only
+means the client has to create it again.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .columnar import portfolio_entries_to_columns
+from .models import PortfolioEntry
+from .scenario_engine import SCENARIO_RESULT_FIELDS, ScenarioEngine
+
+logger = logging.getLogger(__name__)
+
+SESSION_MAX_COUNT = int(os.getenv("SCENARIO_SESSION_MAX", "100"))
+SESSION_TTL_SECONDS = int(os.getenv("SCENARIO_SESSION_TTL_SECONDS", "3600"))
+SESSION_RESUM_INTERVAL = 10000
+
+# Result fields summed into the running totals
+TOTAL_FIELDS = ("exposure", "baseline_expected_loss", "climate_adjusted_expected_loss")
+
+
+class SessionVersionConflict(Exception):
+    """The delta was based on an older session version"""
+
+
+class ScenarioSession:
+    """One portfolio's per-exposure scenario results and running totals"""
+
+    def __init__(self, engine: ScenarioEngine, scenario_type: str, entries: Sequence[PortfolioEntry]):
+        self.session_id = str(uuid.uuid4())
+        self.engine = engine
+        self.scenario_type = scenario_type
+        self.version = 1
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+        ids = [entry.id for entry in entries]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Portfolio entry ids must be unique within a scenario session")
+
+        self._row_by_id: Dict[str, int] = {entry_id: row for row, entry_id in enumerate(ids)}
+        self._ids: List[str] = ids
+        self._results: Dict[str, np.ndarray] = {}
+        self._size = 0
+        self._changed_since_resum = 0
+        self.totals: Dict[str, float] = {name: 0.0 for name in TOTAL_FIELDS}
+
+        if entries:
+            result_columns = self._calculate(entries)
+            self._size = len(entries)
+            self._results = {name: result_columns[name].copy() for name in SCENARIO_RESULT_FIELDS}
+        else:
+            self._results = {
+                name: np.empty(0, dtype=object if name in ("company", "sector") else np.float64)
+                for name in SCENARIO_RESULT_FIELDS
+            }
+        self._resum()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _calculate(self, entries: Sequence[PortfolioEntry]) -> Dict[str, np.ndarray]:
+        return self.engine.calculate_columns(portfolio_entries_to_columns(entries), self.scenario_type)
+
+    def _resum(self) -> None:
+        for name in TOTAL_FIELDS:
+            self.totals[name] = float(self._results[name][:self._size].sum())
+        self._changed_since_resum = 0
+
+    def _adjust_totals(self, rows: np.ndarray, sign: float) -> None:
+        for name in TOTAL_FIELDS:
+            self.totals[name] += sign * float(self._results[name][rows].sum())
+
+    def _reserve(self, size: int) -> None:
+        """Grow the result arrays geometrically so appends are amortized O(1)"""
+        capacity = len(self._results["exposure"])
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, 64)
+        for name, column in self._results.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._results[name] = grown
+
+    def _remove_rows(self, entry_ids: Sequence[str]) -> None:
+        for entry_id in entry_ids:
+            row = self._row_by_id.pop(entry_id)
+            self._adjust_totals(np.array([row]), -1.0)
+            last = self._size - 1
+            if row != last:
+                # Move the last row into the hole
+                for column in self._results.values():
+                    column[row] = column[last]
+                moved_id = self._ids[last]
+                self._ids[row] = moved_id
+                self._row_by_id[moved_id] = row
+            self._ids.pop()
+            self._size -= 1
+
+    def apply_delta(
+        self,
+        upsert: Sequence[PortfolioEntry],
+        remove: Sequence[str],
+        expected_version: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Apply removals, then add/update `upsert` entries (matched by id).
+        Returns the recomputed rows (with ids); bumps the version.
+        """
+        if expected_version is not None and expected_version != self.version:
+            raise SessionVersionConflict(
+                f"Session is at version {self.version}, delta was based on version {expected_version}"
+            )
+
+        upsert_ids = [entry.id for entry in upsert]
+        if len(set(upsert_ids)) != len(upsert_ids):
+            raise ValueError("Duplicate ids in upsert")
+        unknown = [entry_id for entry_id in remove if entry_id not in self._row_by_id]
+        if unknown:
+            raise ValueError(f"Unknown exposure id(s): {', '.join(unknown[:10])}")
+        overlap = set(remove) & set(upsert_ids)
+        if overlap:
+            raise ValueError(f"Exposure id(s) both removed and upserted: {', '.join(sorted(overlap)[:10])}")
+
+        # Compute first so a failing calculation leaves the session untouched
+        result_columns = self._calculate(upsert) if upsert else None
+
+        self._remove_rows(list(dict.fromkeys(remove)))
+
+        changed: List[Dict[str, Any]] = []
+        if upsert:
+            existing = [self._row_by_id.get(entry_id) for entry_id in upsert_ids]
+            updated_rows = np.array([row for row in existing if row is not None], dtype=np.intp)
+            self._adjust_totals(updated_rows, -1.0)
+
+            added = sum(1 for row in existing if row is None)
+            self._reserve(self._size + added)
+            target_rows = np.empty(len(upsert), dtype=np.intp)
+            for position, (entry_id, row) in enumerate(zip(upsert_ids, existing)):
+                if row is None:
+                    row = self._size
+                    self._row_by_id[entry_id] = row
+                    self._ids.append(entry_id)
+                    self._size += 1
+                target_rows[position] = row
+
+            for name in SCENARIO_RESULT_FIELDS:
+                self._results[name][target_rows] = result_columns[name]
+            self._adjust_totals(target_rows, 1.0)
+
+            changed = [
+                {"id": entry_id, **row}
+                for entry_id, row in zip(upsert_ids, self.engine.result_rows(result_columns))
+            ]
+
+        self._changed_since_resum += len(upsert) + len(remove)
+        if self._changed_since_resum >= SESSION_RESUM_INTERVAL:
+            self._resum()
+
+        self.version += 1
+        return changed
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """All current rows (with ids), in storage order"""
+        active = {name: column[:self._size] for name, column in self._results.items()}
+        return [{"id": entry_id, **row} for entry_id, row in zip(self._ids, self.engine.result_rows(active))]
+
+    def payload(self, results: List[Dict[str, Any]], removed: Sequence[str] = ()) -> Dict[str, Any]:
+        summary = self.engine.summarize_totals(
+            self.totals["exposure"],
+            self.totals["baseline_expected_loss"],
+            self.totals["climate_adjusted_expected_loss"],
+            self.scenario_type,
+        )
+        return {
+            "session_id": self.session_id,
+            "version": self.version,
+            "entry_count": self._size,
+            **summary,
+            "results": results,
+            "removed": list(removed),
+            "error": None,
+        }
+
+
+class ScenarioSessionStore:
+    """Process-local session registry with LRU eviction and idle expiry"""
+
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, ScenarioSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for session_id in [sid for sid, session in self._sessions.items() if session.last_used < cutoff]:
+            del self._sessions[session_id]
+        while len(self._sessions) > self.max_sessions:
+            session_id, _ = self._sessions.popitem(last=False)
+            logger.info(f"Evicted scenario session {session_id}")
+
+    def create(self, engine: ScenarioEngine, scenario_type: str, entries: Sequence[PortfolioEntry]) -> ScenarioSession:
+        session = ScenarioSession(engine, scenario_type, entries)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._expire()
+        logger.info(f"Created scenario session {session.session_id} with {session.size} entries")
+        return session
+
+    def get(self, session_id: str) -> Optional[ScenarioSession]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
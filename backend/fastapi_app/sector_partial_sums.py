@@ -0,0 +1,146 @@
+"""
+Per-sector partial sums for fast re-evaluation of portfolio expected loss.
+
+Every exposure in a cell shares the cell's PD multiplier m and LGD shift Δ, so
+
+    EL_c(m, Δ) = m × Σ_{i ∈ c} w_i × min(LGD₀_i + Δ, 1),    w_i = EAD_i × PD₀_i
+
+A cell is a sector, or a (sector, geography) pair when physical multipliers vary by
+geography (see physical_risk_matrix.py); sector results are sums over the sector's cells.
+Per-row location factors f_i (see hazard_rasters.py) are folded into the weights:
+w_i × (1 + s × (f_i − 1)), where s = 1 applies them in full and s = 0 ignores them.
+LGDs are sorted within each cell and prefix sums of w and w × LGD₀ are kept. The
+rows still below the LGD cap are then a prefix of the sorted order, found with one
+binary search, and each EL_c evaluation costs O(log n_c) whatever the portfolio size.
+Build once per portfolio (O(n log n)), then evaluate as many shocked parameter sets as
+needed: sensitivity grids, shock matrices, reverse stress iterations.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .columnar import factorize
+
+
+class SectorPartialSums:
+    """
+    Sorted LGDs and prefix sums per cell of a columnar portfolio (see columnar.py).
+    Sector and geography order is first appearance, as in ScenarioEngine.calculate_columns.
+    """
+
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        by_geography: bool = False,
+        row_factor: Optional[np.ndarray] = None
+    ):
+        sector_codes, sector_names = factorize(columns["sector"])
+        sector_count = len(sector_names)
+        amount = columns["amount"]
+        baseline_pd = columns["probability_of_default"] / 100.0
+        baseline_lgd = columns["loss_given_default"] / 100.0
+        weight = amount * baseline_pd
+
+        self.sector_names: List[str] = sector_names
+        self.exposure = np.bincount(sector_codes, weights=amount, minlength=sector_count)
+        self.baseline_expected_loss = np.bincount(
+            sector_codes, weights=weight * baseline_lgd, minlength=sector_count
+        )
+
+        self.by_geography = by_geography
+        if by_geography:
+            geography_codes, self.geography_names = factorize(columns["geography"])
+            geography_count = len(self.geography_names)
+            # Only the (sector, geography) pairs present in the portfolio become cells
+            cell_keys, cell_codes = np.unique(sector_codes * geography_count + geography_codes, return_inverse=True)
+            self.cell_sector = cell_keys // geography_count
+            self.cell_geography = cell_keys % geography_count
+        else:
+            self.geography_names = []
+            cell_codes = sector_codes
+            self.cell_sector = np.arange(sector_count)
+            self.cell_geography = np.zeros(sector_count, dtype=np.intp)
+        cell_count = len(self.cell_sector)
+        self.cell_exposure = np.bincount(cell_codes, weights=amount, minlength=cell_count)
+
+        # Rows grouped by cell, ascending LGD within each cell
+        order = np.lexsort((baseline_lgd, cell_codes))
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(cell_codes, minlength=cell_count))))
+        sorted_lgd = baseline_lgd[order]
+        sorted_weight = weight[order]
+        # Weight added by the location factors at s = 1
+        self.has_row_factor = row_factor is not None
+        sorted_extra = (weight * (row_factor - 1.0))[order] if self.has_row_factor else None
+
+        self._lgd: List[np.ndarray] = []
+        self._cum_weight: List[np.ndarray] = []
+        self._cum_weighted_lgd: List[np.ndarray] = []
+        self._cum_extra: List[np.ndarray] = []
+        self._cum_extra_lgd: List[np.ndarray] = []
+        for cell in range(cell_count):
+            rows = slice(bounds[cell], bounds[cell + 1])
+            self._lgd.append(sorted_lgd[rows])
+            # Leading zero: prefix k covers the k lowest-LGD rows
+            self._cum_weight.append(np.concatenate(([0.0], np.cumsum(sorted_weight[rows]))))
+            self._cum_weighted_lgd.append(np.concatenate(([0.0], np.cumsum(sorted_weight[rows] * sorted_lgd[rows]))))
+            if self.has_row_factor:
+                self._cum_extra.append(np.concatenate(([0.0], np.cumsum(sorted_extra[rows]))))
+                self._cum_extra_lgd.append(np.concatenate(([0.0], np.cumsum(sorted_extra[rows] * sorted_lgd[rows]))))
+
+    @property
+    def sector_count(self) -> int:
+        return len(self.sector_names)
+
+    @property
+    def cell_count(self) -> int:
+        return len(self.cell_sector)
+
+    def sector_totals(self, cell_values: np.ndarray) -> np.ndarray:
+        """Values shaped (..., cells) summed per sector: (..., sectors)"""
+        if not self.by_geography:
+            return cell_values
+        indicator = np.zeros((self.cell_count, self.sector_count))
+        indicator[np.arange(self.cell_count), self.cell_sector] = 1.0
+        return cell_values @ indicator
+
+    def sector_average(self, cell_values: np.ndarray) -> np.ndarray:
+        """Exposure-weighted sector average of values shaped (..., cells)"""
+        if not self.by_geography:
+            return cell_values
+        totals = self.sector_totals(cell_values * self.cell_exposure)
+        return np.divide(totals, self.exposure, out=np.zeros_like(totals), where=self.exposure > 0)
+
+    def lgd_sums(self, lgd_shift: np.ndarray, factor_scale: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        For LGD shifts shaped (..., cells), returns two arrays of the same shape:
+        Σ w × min(LGD₀ + Δ, 1) and Σ w over the rows still below the cap
+        (the derivative of the first with respect to Δ).
+        factor_scale (same shape, default 1) is s in the location-factor weights.
+        """
+        lgd_shift = np.asarray(lgd_shift, dtype=np.float64)
+        if self.has_row_factor:
+            factor_scale = np.broadcast_to(1.0 if factor_scale is None else np.asarray(factor_scale, dtype=np.float64), lgd_shift.shape)
+        lgd_sum = np.empty_like(lgd_shift)
+        uncapped_weight = np.empty_like(lgd_shift)
+        for cell in range(self.cell_count):
+            shift = lgd_shift[..., cell]
+            cum_weight = self._cum_weight[cell]
+            # Rows with LGD₀ + Δ < 1 are uncapped; they are a prefix of the sorted LGDs
+            uncapped = np.searchsorted(self._lgd[cell], 1.0 - shift, side="left")
+            below = cum_weight[uncapped]
+            total = cum_weight[-1]
+            weighted_lgd = self._cum_weighted_lgd[cell][uncapped]
+            if self.has_row_factor:
+                scale = factor_scale[..., cell]
+                below = below + scale * self._cum_extra[cell][uncapped]
+                total = total + scale * self._cum_extra[cell][-1]
+                weighted_lgd = weighted_lgd + scale * self._cum_extra_lgd[cell][uncapped]
+            lgd_sum[..., cell] = weighted_lgd + shift * below + (total - below)
+            uncapped_weight[..., cell] = below
+        return lgd_sum, uncapped_weight
+
+    def expected_loss(self, pd_multiplier: np.ndarray, lgd_shift: np.ndarray) -> np.ndarray:
+        """Climate-adjusted EL per cell for parameters shaped (..., cells)"""
+        lgd_sum, _ = self.lgd_sums(lgd_shift)
+        return np.asarray(pd_multiplier, dtype=np.float64) * lgd_sum
@@ -7,7 +7,10 @@ Migrated from: src/pages/finance_facilitated/config/sharedFormulaUtils.ts
 No formulas or working logic has been changed - only converted from TypeScript to Python.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
 from .finance_models import FormulaInput, CalculationStep
 
 
@@ -243,40 +246,107 @@ def validate_financial_inputs(inputs: Dict[str, Any], company_type: str) -> List
     return errors
 
 
+# Denominator inputs in order of preference: company-value keys by company type,
+# then the asset-class specific values
+COMPANY_DENOMINATOR_CANDIDATES: Dict[str, Tuple[str, ...]] = {
+    'listed': ('evic', 'total_equity_plus_debt', 'total_assets'),
+    'unlisted': ('total_equity_plus_debt', 'evic', 'total_assets'),
+}
+FORMULA_SPECIFIC_DENOMINATORS: Tuple[str, ...] = (
+    'property_value_at_origination',  # Commercial real estate, mortgage
+    'total_value_at_origination',     # Motor vehicle loans
+    'total_project_equity_plus_debt', # Project finance
+    'ppp_adjusted_gdp'                # Sovereign debt
+)
+
+
+def _is_positive_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
+class DenominatorPlan:
+    """
+    Fixed denominator strategy for one (formula, company type): the input keys to try
+    in order, the first positive one wins. Built once when the formula registry loads.
+    """
+
+    __slots__ = ('keys',)
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys: Tuple[str, ...] = tuple(keys)
+
+    def resolve(self, inputs: Dict[str, Any]) -> float:
+        for key in self.keys:
+            value = inputs.get(key)
+            if _is_positive_number(value):
+                return value
+        available_keys = [key for key, value in inputs.items() if _is_positive_number(value)]
+        raise ValueError(f"No valid denominator found. Available inputs: {available_keys}")
+
+    def resolve_columns(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """Vectorized resolve over columnar inputs (missing keys are skipped); NaN where nothing is positive"""
+        denominator: Optional[np.ndarray] = None
+        for key in reversed(self.keys):
+            if key not in columns:
+                continue
+            values = np.asarray(columns[key], dtype=np.float64)
+            if denominator is None:
+                denominator = np.full(len(values), np.nan)
+            denominator = np.where(np.isfinite(values) & (values > 0), values, denominator)
+        if denominator is None:
+            raise ValueError(f"No denominator columns found, expected one of: {list(self.keys)}")
+        return denominator
+
+
+def build_denominator_plan(company_type: str, formula_inputs: Optional[Sequence[str]] = None) -> DenominatorPlan:
+    """
+    Plan for a company type ('listed' or anything else: unlisted). The company-value
+    keys always keep the company-type order of get_denominator_for_company_type.
+    With formula_inputs, asset-class keys the formula does not declare are dropped, and
+    a formula that declares only asset-class keys (e.g. a mortgage's property value)
+    drops the company-value keys too, so an EVIC inherited from a counterparty profile
+    is never picked for it.
+    """
+    company_keys = COMPANY_DENOMINATOR_CANDIDATES['listed' if company_type == 'listed' else 'unlisted']
+    if formula_inputs is None:
+        return DenominatorPlan(company_keys + FORMULA_SPECIFIC_DENOMINATORS)
+    declared_asset_keys = tuple(key for key in FORMULA_SPECIFIC_DENOMINATORS if key in formula_inputs)
+    declares_company_key = any(key in formula_inputs for key in company_keys)
+    if not declares_company_key and not declared_asset_keys:
+        # No declared denominator: same candidates as get_denominator_for_company_type
+        return DenominatorPlan(company_keys + FORMULA_SPECIFIC_DENOMINATORS)
+    if not declares_company_key:
+        return DenominatorPlan(declared_asset_keys)
+    return DenominatorPlan(company_keys + declared_asset_keys)
+
+
+_COMPANY_DENOMINATOR_PLANS: Dict[str, DenominatorPlan] = {
+    company_type: build_denominator_plan(company_type) for company_type in COMPANY_DENOMINATOR_CANDIDATES
+}
+
+
 def get_denominator_for_company_type(inputs: Dict[str, Any], company_type: str) -> float:
     """
     Get the appropriate denominator based on company type and available inputs
     """
-    # Try different denominator types in order of preference
-    denominator_candidates = []
-    
-    if company_type == 'listed':
-        # For listed companies, try EVIC first
-        denominator_candidates = ['evic', 'total_equity_plus_debt', 'total_assets']
-    else:
-        # For unlisted companies, try total_equity_plus_debt first
-        denominator_candidates = ['total_equity_plus_debt', 'evic', 'total_assets']
-    
-    # Also check for formula-specific denominators
-    formula_specific_denominators = [
-        'property_value_at_origination',  # Commercial real estate, mortgage
-        'total_value_at_origination',     # Motor vehicle loans
-        'total_project_equity_plus_debt', # Project finance
-        'ppp_adjusted_gdp'                # Sovereign debt
-    ]
-    
-    # Add formula-specific denominators to the list
-    denominator_candidates.extend(formula_specific_denominators)
-    
-    # Find the first available denominator
-    for denominator_key in denominator_candidates:
-        value = inputs.get(denominator_key, 0)
-        if value > 0:
-            return value
-    
-    # If no denominator found, raise an error
-    available_keys = [k for k, v in inputs.items() if v > 0]
-    raise ValueError(f"No valid denominator found. Available inputs: {available_keys}")
+    plan = _COMPANY_DENOMINATOR_PLANS['listed' if company_type == 'listed' else 'unlisted']
+    return plan.resolve(inputs)
+
+
+def select_denominator_columns(
+    columns: Dict[str, np.ndarray],
+    plans: Sequence[DenominatorPlan],
+    plan_codes: np.ndarray
+) -> np.ndarray:
+    """Denominator per row of a columnar batch, where row i uses plans[plan_codes[i]]"""
+    denominator = np.full(len(plan_codes), np.nan)
+    for code, plan in enumerate(plans):
+        rows = plan_codes == code
+        if rows.any():
+            denominator[rows] = plan.resolve_columns(
+                {key: np.asarray(columns[key])[rows] for key in plan.keys if key in columns}
+            )
+    return denominator
 
 
 def format_calculation_step(step_name: str, value: float, formula: str) -> CalculationStep:
@@ -0,0 +1,45 @@
+-- Background calculation jobs (long scenario / emission batch runs)
+-- Run against database rethinkcarbon before using /jobs/*.
+--
+-- Jobs are claimed by local workers (python -m fastapi_app.job_worker) with
+-- SELECT ... FOR UPDATE SKIP LOCKED, so no external broker is needed.
+-- Each finished chunk is checkpointed in calculation_job_chunks; a worker that
+-- picks up a job whose lease expired skips chunks that are already done.
+
+CREATE EXTENSION IF NOT EXISTS "pgcrypto";
+
+CREATE TABLE IF NOT EXISTS public.calculation_jobs (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  kind TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued'
+    CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+  priority INTEGER NOT NULL DEFAULT 0,
+  payload JSONB NOT NULL,
+  chunk_size INTEGER NOT NULL,
+  total_chunks INTEGER NOT NULL,
+  completed_chunks INTEGER NOT NULL DEFAULT 0,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 5,
+  run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+  locked_by TEXT,
+  lease_expires_at TIMESTAMPTZ,
+  result JSONB,
+  error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  started_at TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ
+);
+
+-- Claim query scans runnable jobs in priority order
+CREATE INDEX IF NOT EXISTS idx_calculation_jobs_runnable
+  ON public.calculation_jobs (priority DESC, created_at)
+  WHERE status IN ('queued', 'running');
+
+CREATE TABLE IF NOT EXISTS public.calculation_job_chunks (
+  job_id UUID NOT NULL REFERENCES public.calculation_jobs(id) ON DELETE CASCADE,
+  chunk_index INTEGER NOT NULL,
+  result JSONB NOT NULL,
+  completed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (job_id, chunk_index)
+);
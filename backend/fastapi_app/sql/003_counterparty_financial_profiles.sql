@@ -0,0 +1,25 @@
+-- Counterparty financial profiles: one row of balance-sheet data per organization,
+-- counterparty and reporting year. Run against database rethinkcarbon before using
+-- /counterparties/*. Counterparty ids are chosen by clients, so each organization has
+-- its own namespace and batches only read the caller's organization's profiles.
+--
+-- evic and total_equity_plus_debt are computed once when a profile is written, so
+-- batch items that reference a counterparty by id reuse the same denominators.
+
+CREATE TABLE IF NOT EXISTS public.counterparty_financial_profiles (
+  organization_id UUID NOT NULL,
+  counterparty_id VARCHAR(128) NOT NULL,
+  reporting_year INTEGER NOT NULL,
+  share_price DOUBLE PRECISION,
+  outstanding_shares DOUBLE PRECISION,
+  total_debt DOUBLE PRECISION,
+  minority_interest DOUBLE PRECISION,
+  preferred_stock DOUBLE PRECISION,
+  total_equity DOUBLE PRECISION,
+  total_assets DOUBLE PRECISION,
+  evic DOUBLE PRECISION,
+  total_equity_plus_debt DOUBLE PRECISION,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (organization_id, counterparty_id, reporting_year)
+);
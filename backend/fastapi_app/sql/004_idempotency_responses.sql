@@ -0,0 +1,23 @@
+-- Stored responses for Idempotency-Key retries of POST calculation endpoints.
+-- Run against database rethinkcarbon to share replays across API processes;
+-- without DATABASE_URL each process keeps its own in-memory store.
+--
+-- idempotency_key is a SHA-256 of the caller's tenant (organization, user or client
+-- IP), method, path and the client's Idempotency-Key, so keys are scoped per caller.
+-- request_fingerprint hashes the query string, Accept header and body.
+--
+-- status_code is NULL while the first request is still running (a concurrent retry
+-- gets 409). Rows past expires_at are ignored and pruned by the API.
+
+CREATE TABLE IF NOT EXISTS public.idempotency_responses (
+  idempotency_key VARCHAR(64) PRIMARY KEY,
+  request_fingerprint VARCHAR(64) NOT NULL,
+  status_code INTEGER,
+  headers JSONB,
+  body BYTEA,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_responses_expires_at
+  ON public.idempotency_responses (expires_at);